@@ -0,0 +1,51 @@
+"""
+Lazily loaded assets.
+
+config.py describes fonts and icons with LazyRegistry instead of loading them
+at import, so importing config (which everything does) costs nothing until
+an asset is actually drawn. The registries behave like read-only dicts:
+`key in registry`, iteration and len() never load anything, and
+`registry[key]` loads that one entry the first time and keeps it.
+"""
+
+from collections.abc import Mapping
+import threading
+import startup
+
+
+class LazyRegistry(Mapping):
+
+    def __init__(self, name, keys, load, kind='asset'):
+        self.name = name
+        self.kind = kind        # Label in the startup report
+        self._keys = list(keys)
+        self._known = set(self._keys)
+        self._load = load
+        self._loaded = {}
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key):
+        try:
+            return self._loaded[key]
+        except KeyError:
+            pass
+        if key not in self._known:
+            raise KeyError(key)
+        with self._lock:
+            if key not in self._loaded:
+                with startup.timed(self.kind, f"{self.name}[{key!r}]"):
+                    self._loaded[key] = self._load(key)
+            return self._loaded[key]
+
+    def __contains__(self, key):
+        return key in self._known
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def loaded(self):
+        """The entries loaded so far (loads nothing)."""
+        return dict(self._loaded)
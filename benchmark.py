@@ -0,0 +1,447 @@
+"""
+Headless end-to-end benchmark.
+
+Boots Pypboy under the SDL dummy video/audio drivers, serves GeoLocation and
+Maps requests from benchmarks/fixtures, drives time with a virtual clock and
+replays scripted scenarios. Prints FPS, frame-time percentiles and peak RSS
+per scenario as JSON, so runs can be diffed between commits.
+
+    python benchmark.py                          # every scenario
+    python benchmark.py -s map -s radio          # selected scenarios
+    python benchmark.py -D RENDER_DIRTY_RECTS=True -o dirty.json
+    python benchmark.py --script my_scenario.json
+    python benchmark.py --record                 # refresh fixtures from the network
+
+Each scenario runs in a fresh process, so peak RSS and module state do not
+leak between scenarios. Frames are not paced: each one advances the virtual
+clock by 1/FRAME_RATE_ACTIVE and the next starts straight away.
+"""
+
+import ast
+import asyncio
+import json
+import optparse
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(ROOT, 'benchmarks', 'fixtures')
+
+# URL fragment -> fixture file
+FIXTURES = (
+    ('/api/0.6/map', 'osm_map.xml'),
+    ('nominatim', 'nominatim_reverse.json'),
+)
+
+# Scenario steps:
+#   ["frames", n]                      run n frames with no input
+#   ["action", name]                   press the key bound to an action (knob_N, dial_up, ...)
+#   ["drag", x, y, dx, dy, frames, n]  press at (x, y), move (dx, dy) per frame, release;
+#                                      n (default 1) motion events per frame, like a fast touchscreen
+#   ["wait_maps", max_frames]          run frames until every map has finished loading
+SCENARIOS = {
+    'idle': [
+        ['frames', 300],
+    ],
+    'navigate': [
+        ['frames', 30],
+        ['action', 'knob_2'], ['frames', 15],
+        ['action', 'dial_down'], ['frames', 5],
+        ['action', 'dial_down'], ['frames', 5],
+        ['action', 'knob_3'], ['frames', 15],
+        ['action', 'module_items'], ['frames', 15],
+        ['action', 'knob_1'], ['frames', 10],
+        ['action', 'dial_down'], ['frames', 5],
+        ['action', 'dial_up'], ['frames', 5],
+        ['action', 'knob_4'], ['frames', 15],
+        ['action', 'module_data'], ['frames', 15],
+        ['action', 'knob_3'], ['frames', 15],
+        ['action', 'module_stats'], ['frames', 15],
+        ['action', 'knob_1'], ['frames', 30],
+    ],
+    'map': [
+        ['action', 'module_data'],
+        ['action', 'knob_1'],
+        ['wait_maps', 600],
+        ['drag', 240, 160, 4, 2, 30], ['frames', 10],
+        ['drag', 240, 160, -6, -3, 30], ['frames', 10],
+        ['action', 'zoom_in'], ['frames', 5],
+        ['action', 'zoom_in'], ['frames', 5],
+        ['drag', 240, 160, 3, -3, 20], ['frames', 10],
+        ['action', 'zoom_out'], ['frames', 5],
+        ['action', 'zoom_out'], ['frames', 5],
+        ['action', 'zoom_out'], ['frames', 10],
+        ['action', 'knob_2'],
+        ['drag', 240, 160, -8, 4, 30], ['frames', 10],
+        ['action', 'zoom_in'], ['frames', 10],
+        ['drag', 240, 160, 8, -4, 30], ['frames', 10],
+        ['drag', 240, 160, -8, -8, 30, 8], ['frames', 30],
+    ],
+    'radio': [
+        ['action', 'module_data'],
+        ['action', 'knob_5'], ['frames', 15],
+        ['action', 'dial_down'], ['frames', 90],
+        ['action', 'dial_down'], ['frames', 90],
+        ['action', 'dial_down'], ['frames', 90],
+        ['action', 'dial_up'], ['frames', 60],
+        ['action', 'dial_up'], ['frames', 15],
+        ['action', 'dial_up'], ['frames', 30],
+    ],
+}
+
+
+class FixtureResponse(object):
+    """The parts of requests.Response the app uses."""
+
+    def __init__(self, url, text, status_code=200):
+        self.url = url
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.status_code = status_code
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} for {self.url}")
+
+
+class FixtureServer(object):
+    """Stands in for the fetch service's session; replays (or, when recording, captures) fixtures."""
+
+    def __init__(self, directory=FIXTURES_DIR, record=False):
+        self.directory = directory
+        self.record = record
+        self.served = {}
+
+    def _fixture(self, url):
+        for fragment, filename in FIXTURES:
+            if fragment in url:
+                return filename
+        return None
+
+    def get(self, url, params=None, **kwargs):
+        filename = self._fixture(url)
+        self.served[filename] = self.served.get(filename, 0) + 1
+        path = os.path.join(self.directory, filename) if filename else None
+        if self.record:
+            import requests
+            response = requests.get(url, params=params, **kwargs)
+            if filename and response.ok:
+                with open(path, 'w') as f:
+                    f.write(response.text)
+                print(f"[Benchmark] Recorded {filename} ({len(response.text)} bytes)")
+            return response
+        if path is None or not os.path.exists(path):
+            return FixtureResponse(url, '', 404)
+        with open(path) as f:
+            return FixtureResponse(url, f.read())
+
+
+def boot(overrides, scratch, record=False):
+    """Import the app headless with fixtures and a virtual clock installed."""
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    import pygame
+    import config
+    import game.clock
+    config.GPIO_AVAILABLE = False
+    config.IS_RASPBERRY_PI = False
+    config.SHOW_CURSOR = False
+    config.LOAD_CACHED_MAP = False
+    config.PROFILER_ENABLED = True
+    config.CRT_LUT_CACHE = os.path.join(scratch, 'crt.cache')
+    for name, value in overrides.items():
+        setattr(config, name, value)
+
+    import pypboy.data
+    import pypboy.fetch
+    import pypboy.tiles
+    server = FixtureServer(record=record)
+    pypboy.fetch.service.session = server
+    # Keep the benchmark from touching the user's caches
+    pypboy.tiles.store.directory = os.path.join(scratch, 'map_tiles')
+    pypboy.data.GeoLocation.CACHE_FILE = os.path.join(scratch, 'location.cache')
+
+    clock = game.clock.VirtualClock()
+    game.clock.install(clock)
+
+    try:
+        pygame.mixer.init(44100, -16, 2, 2048)
+        config.SOUND_ENABLED = True
+    except Exception:
+        config.SOUND_ENABLED = False
+    return clock, server
+
+
+def maps_loading(boy):
+    for module in boy.modules.loaded().values():
+        for submodule in module.built_submodules():
+            mapgrid = getattr(submodule, 'mapgrid', None)
+            if mapgrid is not None and mapgrid.is_fetching():
+                return True
+    return False
+
+
+def map_memory(boy):
+    """Bytes held by each built map, by submodule label."""
+    usage = {}
+    for module in boy.modules.loaded().values():
+        for submodule in module.built_submodules():
+            mapgrid = getattr(submodule, 'mapgrid', None)
+            if mapgrid is not None:
+                usage[submodule.label] = mapgrid.memory()
+    return usage
+
+
+def map_stages(boy):
+    """Tiles and bytes fetched by each progressive stage of each built map, by submodule label."""
+    stages = {}
+    for module in boy.modules.loaded().values():
+        for submodule in module.built_submodules():
+            mapgrid = getattr(submodule, 'mapgrid', None)
+            if mapgrid is not None:
+                stages[submodule.label] = mapgrid.stages
+    return stages
+
+
+def frame_budget(script):
+    """Upper bound on the frames a script can run."""
+    total = 0
+    for step in script:
+        if step[0] in ('frames', 'wait_maps'):
+            total += step[1]
+        elif step[0] == 'drag':
+            total += step[5] + 2
+        else:
+            total += 1
+    return total
+
+
+def run_scenario(name, script, overrides, scratch):
+    clock, server = boot(overrides, scratch)
+    import config
+    import numpy as np
+    import pygame
+    import game.tasks
+    import game.textcache
+    config.PROFILER_FRAMES = frame_budget(script)
+
+    started = time.perf_counter()
+    from pypboy.core import Pypboy
+    boy = Pypboy('Pip-Boy 3000', config.WIDTH, config.HEIGHT)
+    boy.running = True
+    startup = time.perf_counter() - started
+
+    keys = {}
+    for key, action in config.ACTIONS.items():
+        keys.setdefault(action, key)
+    dt = 1.0 / getattr(config, 'FRAME_RATE_ACTIVE', 30)
+    frame_times = []
+
+    def frame(*events):
+        for event in events:
+            pygame.event.post(event)
+        boy.profiler.frame_start()
+        start = time.perf_counter()
+        boy.step()
+        if boy.loop is not None:
+            # ENGINE_ASYNCIO: give the tasks on the engine's loop their turn
+            boy.loop.run_until_complete(asyncio.sleep(0))
+        frame_times.append(time.perf_counter() - start)
+        boy.profiler.frame_end()
+        clock.advance(dt)
+
+    wall_start = time.perf_counter()
+    for step in script:
+        kind = step[0]
+        if kind == 'frames':
+            for i in range(step[1]):
+                frame()
+        elif kind == 'action':
+            if step[1] in keys:
+                frame(pygame.event.Event(pygame.KEYDOWN, key=keys[step[1]], mod=0, unicode='', scancode=0))
+            else:
+                boy.handle_action(step[1])
+                frame()
+        elif kind == 'drag':
+            x, y, dx, dy, frames = step[1:6]
+            per_frame = step[6] if len(step) > 6 else 1
+            frame(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(x, y), button=1))
+            for i in range(frames):
+                motion = []
+                for j in range(per_frame):
+                    rel = (dx * (j + 1) // per_frame - dx * j // per_frame,
+                           dy * (j + 1) // per_frame - dy * j // per_frame)
+                    x += rel[0]
+                    y += rel[1]
+                    motion.append(pygame.event.Event(pygame.MOUSEMOTION, pos=(x, y), rel=rel, buttons=(1, 0, 0)))
+                frame(*motion)
+            frame(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(x, y), button=1))
+        elif kind == 'wait_maps':
+            for i in range(step[1]):
+                if not maps_loading(boy):
+                    break
+                frame()
+        else:
+            raise ValueError(f"Unknown step {step!r}")
+    wall = time.perf_counter() - wall_start
+
+    clock.release()
+    # Tile writes still on the pool would land in scratch as it is removed
+    game.tasks.runner.shutdown(wait=True)
+    frame_ms = np.array(frame_times) * 1000.0
+    p50, p95, p99 = np.percentile(frame_ms, (50, 95, 99))
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024  # Bytes on macOS, kilobytes elsewhere
+    stages = {
+        stage: {'p50': round(s50, 3), 'p95': round(s95, 3), 'p99': round(s99, 3)}
+        for stage, (s50, s95, s99) in boy.profiler.percentiles().items()
+    }
+    return {
+        'scenario': name,
+        'frames': len(frame_times),
+        'simulated_seconds': round(len(frame_times) * dt, 3),
+        'wall_seconds': round(wall, 3),
+        'speedup': round(len(frame_times) * dt / wall, 2) if wall else None,
+        'startup_seconds': round(startup, 3),
+        'interactive_seconds': round(startup + frame_times[0], 3),
+        'fps': round(len(frame_times) / (frame_ms.sum() / 1000.0), 2),
+        'frame_ms': {
+            'mean': round(float(frame_ms.mean()), 3),
+            'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3),
+            'p99': round(float(p99), 3),
+            'max': round(float(frame_ms.max()), 3),
+        },
+        'stages_ms': stages,
+        'text_cache': game.textcache.cache.stats(),
+        'pointer': boy.pointer.stats(),
+        'timestep': boy.timestep.stats(),
+        'map_memory': map_memory(boy),
+        'map_stages': map_stages(boy),
+        'peak_rss_kb': rss,
+        'requests': server.served,
+    }
+
+
+def record_fixtures():
+    """Fetch fresh responses for MAP_FOCUS through the app's own request code."""
+    with tempfile.TemporaryDirectory() as scratch:
+        boot({}, scratch, record=True)
+        import config
+        import pypboy.data
+        import pypboy.tiles
+        longitude, latitude = config.MAP_FOCUS
+        pypboy.data.GeoLocation()._fetch_from_api(longitude, latitude)
+        # Replay serves this for every tile request
+        store = pypboy.tiles.store
+        pypboy.data.Maps().download(store.tile_bounds(*store.tile(longitude, latitude)))
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def parse_overrides(definitions):
+    overrides = {}
+    for definition in definitions:
+        name, _, value = definition.partition('=')
+        try:
+            overrides[name] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            overrides[name] = value
+    return overrides
+
+
+def main():
+    parser = optparse.OptionParser(usage='python %prog [-s scenario ...] [-D NAME=VALUE ...] [-o out.json]')
+    parser.add_option('-s', '--scenario', action='append', dest='scenarios', default=[],
+                      help="Scenario to run (repeatable): " + ", ".join(SCENARIOS))
+    parser.add_option('--script', dest='script', default=None,
+                      help="JSON file with a custom step list, run as scenario 'script'")
+    parser.add_option('-D', '--define', action='append', dest='defines', default=[],
+                      help="Override a config value for every scenario, e.g. RENDER_DIRTY_RECTS=True")
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help="Write the JSON report here instead of stdout")
+    parser.add_option('--record', action='store_true', dest='record', default=False,
+                      help="Refresh the fixtures from the network and exit")
+    parser.add_option('--child', dest='child', default=None, help=optparse.SUPPRESS_HELP)
+    parser.add_option('--result', dest='result', default=None, help=optparse.SUPPRESS_HELP)
+    options, args = parser.parse_args()
+
+    if options.record:
+        record_fixtures()
+        return
+
+    scenarios = dict(SCENARIOS)
+    if options.script:
+        with open(options.script) as f:
+            scenarios['script'] = json.load(f)
+    overrides = parse_overrides(options.defines)
+
+    if options.child:
+        with tempfile.TemporaryDirectory() as scratch:
+            result = run_scenario(options.child, scenarios[options.child], overrides, scratch)
+        with open(options.result, 'w') as f:
+            json.dump(result, f)
+        # Don't wait on the radio or map threads
+        os._exit(0)
+
+    names = options.scenarios or (['script'] if options.script else list(SCENARIOS))
+    for name in names:
+        if name not in scenarios:
+            parser.error(f"unknown scenario '{name}'")
+
+    os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'  # Keep stdout valid JSON
+    import pygame
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'machine': platform.machine(),
+        'config': overrides,
+        'scenarios': [],
+    }
+    for name in names:
+        print(f"[Benchmark] {name}", file=sys.stderr)
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            result_file = f.name
+        command = [sys.executable, os.path.abspath(__file__), '--child', name, '--result', result_file]
+        if options.script:
+            command += ['--script', options.script]
+        for definition in options.defines:
+            command += ['-D', definition]
+        # App output goes to stderr so stdout stays valid JSON
+        subprocess.run(command, stdout=sys.stderr, check=True)
+        with open(result_file) as f:
+            report['scenarios'].append(json.load(f))
+        os.remove(result_file)
+
+    output = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
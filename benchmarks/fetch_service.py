@@ -0,0 +1,253 @@
+"""
+Fetch service against a local stand-in for the OSM API and Nominatim.
+
+StandInServer answers like the real servers, from the recorded fixtures
+(benchmarks/fixtures): gzip when the client accepts it, ETag and
+Last-Modified on every response, and a 304 for a matching conditional
+request. Latency and failures are injected:
+
+- --latency S, plus up to --jitter S more, per request
+- --fail P: answer 503 with probability P
+- --drop P: close the connection without answering, with probability P
+
+Without --serve, the script runs the checks and prints a JSON report:
+
+- pooled: --requests map requests through pypboy.fetch.FetchService from 8
+  threads. Reports how many connections were opened, the most requests in
+  flight at once, and the retries and failures.
+- unpooled: the same with bare requests.get and no retries, the way
+  fetching worked before the service.
+- revalidate: a request, then a conditional one with its validators.
+  Expects a 304 with no body.
+
+    python benchmarks/fetch_service.py
+    python benchmarks/fetch_service.py --fail 0.3 --drop 0.1 --requests 64 -o fetch.json
+    python benchmarks/fetch_service.py --serve --port 8088 --latency 0.5
+        # then: OSM_API_URL=http://127.0.0.1:8088/api/0.6/map \\
+        #       NOMINATIM_URL=http://127.0.0.1:8088/reverse python main.py
+"""
+
+import concurrent.futures
+import email.utils
+import gzip
+import hashlib
+import http.server
+import json
+import optparse
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT, 'benchmarks', 'fixtures')
+ROUTES = (
+    ('/api/0.6/map', 'osm_map.xml', 'text/xml; charset=utf-8'),
+    ('/reverse', 'nominatim_reverse.json', 'application/json'),
+)
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # Keep-alive, as the real servers
+
+    def setup(self):
+        super(StandInHandler, self).setup()
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.enter()
+        try:
+            self._answer(server)
+        finally:
+            server.leave()
+
+    def _answer(self, server):
+        server.count('requests')
+        time.sleep(server.latency + random.uniform(0, server.jitter))
+        roll = random.random()
+        if roll < server.drop:
+            server.count('dropped')
+            self.close_connection = True
+            return
+        if roll < server.drop + server.fail:
+            server.count('failed')
+            self._send(503, b'Service unavailable', 'text/plain')
+            return
+        route = next((route for route in ROUTES if self.path.startswith(route[0])), None)
+        if route is None:
+            self._send(404, b'Not found', 'text/plain')
+            return
+        body, etag, modified = server.fixture(route[1])
+        if self.headers.get('If-None-Match') == etag or (
+                'If-None-Match' not in self.headers and self.headers.get('If-Modified-Since') == modified):
+            server.count('not_modified')
+            self._send(304, b'', route[2], {'ETag': etag, 'Last-Modified': modified})
+            return
+        headers = {'ETag': etag, 'Last-Modified': modified}
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, 6)
+            headers['Content-Encoding'] = 'gzip'
+        self._send(200, body, route[2], headers)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count('bytes_sent', len(body))
+
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    """The OSM API and Nominatim, served from fixtures on 127.0.0.1."""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, fail=0.0, drop=0.0, fixtures=FIXTURES_DIR):
+        super(StandInServer, self).__init__(('127.0.0.1', port), StandInHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.fail = fail
+        self.drop = drop
+        self.fixtures = fixtures
+        self._lock = threading.Lock()
+        self._cache = {}
+        self.in_flight = 0
+        self.stats = {'connections': 0, 'requests': 0, 'dropped': 0, 'failed': 0, 'not_modified': 0,
+                      'bytes_sent': 0, 'most_in_flight': 0}
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.server_address[1]
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.stats['most_in_flight'] = max(self.stats['most_in_flight'], self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def fixture(self, name):
+        """(body, ETag, Last-Modified) of a fixture file."""
+        if name not in self._cache:
+            path = os.path.join(self.fixtures, name)
+            with open(path, 'rb') as f:
+                body = f.read()
+            self._cache[name] = (body, '"%s"' % hashlib.sha1(body).hexdigest()[:16],
+                                 email.utils.formatdate(os.path.getmtime(path), usegmt=True))
+        return self._cache[name]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='stand-in', daemon=True).start()
+        return self
+
+    def reset(self):
+        with self._lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+
+
+def run_pooled(server, requests_count, connections):
+    from pypboy.fetch import FetchService
+    service = FetchService(connections=connections, timeout=10, retries=5, backoff=0.05, max_backoff=0.5)
+    url = server.url + '/api/0.6/map?bbox=%f,%f,%f,%f'
+    server.reset()
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(service.get, url % (i, 0, i + 1, 1)) for i in range(requests_count)]
+        errors = sum(1 for future in futures if future.exception() is not None)
+    return dict(seconds=round(time.perf_counter() - started, 3), errors=errors, service=service.stats(),
+                server=dict(server.stats))
+
+
+def run_unpooled(server, requests_count):
+    import requests
+    url = server.url + '/api/0.6/map?bbox=%f,%f,%f,%f'
+    server.reset()
+
+    def get(i):
+        response = requests.get(url % (i, 0, i + 1, 1), timeout=10)
+        response.raise_for_status()
+        return response.content
+
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(get, i) for i in range(requests_count)]
+        errors = sum(1 for future in futures if future.exception() is not None)
+    return dict(seconds=round(time.perf_counter() - started, 3), errors=errors, server=dict(server.stats))
+
+
+def run_revalidate(server):
+    from pypboy.fetch import FetchService
+    service = FetchService(connections=1, timeout=10, retries=5, backoff=0.05, max_backoff=0.5)
+    url = server.url + '/api/0.6/map?bbox=0,0,1,1'
+    first = service.get(url)
+    second = service.get(url, validators=first.validators)
+    return {
+        'first_status': first.status,
+        'first_bytes': len(first.content),
+        'validators': first.validators,
+        'second_status': second.status,
+        'second_bytes': len(second.content),
+        'not_modified': second.not_modified,
+    }
+
+
+def main():
+    parser = optparse.OptionParser(usage='python %prog [--serve] [--latency S] [--fail P] [--drop P] [-o out.json]')
+    parser.add_option('--serve', action='store_true', default=False, help="Only run the stand-in server")
+    parser.add_option('--port', type='int', default=0)
+    parser.add_option('--latency', type='float', default=0.05)
+    parser.add_option('--jitter', type='float', default=0.05)
+    parser.add_option('--fail', type='float', default=0.2)
+    parser.add_option('--drop', type='float', default=0.05)
+    parser.add_option('--requests', type='int', default=32)
+    parser.add_option('--connections', type='int', default=4)
+    parser.add_option('-o', '--output', dest='output', default=None)
+    options, args = parser.parse_args()
+
+    server = StandInServer(options.port, options.latency, options.jitter, options.fail, options.drop)
+    if options.serve:
+        print(f"[StandIn] Serving {server.url}/api/0.6/map and {server.url}/reverse", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    server.start()
+    random.seed(1)
+    report = {
+        'latency': options.latency, 'jitter': options.jitter, 'fail': options.fail, 'drop': options.drop,
+        'requests': options.requests,
+        'pooled': run_pooled(server, options.requests, options.connections),
+        'unpooled': run_unpooled(server, options.requests),
+    }
+    server.fail = server.drop = 0.0
+    report['revalidate'] = run_revalidate(server)
+    server.shutdown()
+
+    output = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Way level-of-detail benchmark.
+
+Builds pypboy.lod.WayLevels over a synthetic world-map area (or a real OSM
+XML file) and, for each level, draws every way on a world-map-sized
+surface the way the map does (pygame.draw.lines, 2 pixels wide):
+
+- ways / points: what is left at the level
+- raster_ms: transposing and drawing all of them
+- changed: fraction of the surface's pixels that differ from level 0
+
+It also lists the level the world map picks at each zoom level.
+
+The synthetic area is a mix of long, densely sampled roads (a vertex every
+metre or two, as OSM curves are), short service roads and footpaths, and
+small closed building outlines.
+
+    python benchmarks/map_lod.py
+    python benchmarks/map_lod.py --ways 50000 -o lod.json
+    python benchmarks/map_lod.py --osm export.osm --radius 0.05
+"""
+
+import json
+import optparse
+import os
+import sys
+import time
+import numpy as np
+import pygame
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from pypboy.data import Maps
+from pypboy.geometry import GeometryBuilder, parse_osm
+from pypboy.lod import WayLevels
+
+SIZE = getattr(config, 'WORLD_MAP_SURFACE_SIZE', 960)
+RADIUS = getattr(config, 'WORLD_MAP_RADIUS', 0.12)
+ZOOMS = (0.5, 1.0, 1.5, 2.0, 3.0)
+# (highway class, share of ways, points, step in degrees)
+KINDS = (
+    ('primary', 0.05, (200, 800), 1.5e-5),
+    ('residential', 0.25, (40, 200), 1.5e-5),
+    ('service', 0.15, (5, 30), 1e-5),
+    ('footway', 0.15, (5, 40), 1e-5),
+    (None, 0.40, (5, 5), 0),            # Buildings
+)
+
+
+def synthesize(ways, radius, seed=1):
+    """A MapGeometry of about ways ways within radius degrees of (0, 0)."""
+    rng = np.random.default_rng(seed)
+    builder = GeometryBuilder((0.0, 0.0))
+    for highway, share, (low, high), step in KINDS:
+        for _ in range(int(ways * share)):
+            start = rng.uniform(-radius, radius, 2)
+            if highway is None:
+                side = rng.uniform(1e-4, 3e-4)
+                corners = np.array([(0, 0), (side, 0), (side, side), (0, side), (0, 0)])
+                builder.add_way(start + corners)
+                continue
+            # A smooth random walk: the heading drifts a little at each vertex
+            count = int(rng.integers(low, high + 1))
+            heading = rng.uniform(0, 2 * np.pi) + np.cumsum(rng.normal(0, 0.05, count))
+            steps = np.stack([np.cos(heading), np.sin(heading)], axis=1) * step
+            builder.add_way(start + np.cumsum(steps, axis=0), highway)
+    return builder.build()
+
+
+def load_osm(path):
+    with open(path, 'rb') as f:
+        geometry = parse_osm(f)
+    # Centre on the data, as a fetch around MAP_FOCUS would
+    if len(geometry.way_xy):
+        centre = tuple(float(value) for value in geometry.way_xy.mean(axis=0))
+        with open(path, 'rb') as f:
+            geometry = parse_osm(f, centre)
+    return geometry
+
+
+def raster(mapper, level, surface):
+    """Milliseconds to transpose and draw every way of level onto surface."""
+    dimensions, centre = surface.get_size(), (surface.get_width() / 2, surface.get_height() / 2)
+    geometry = mapper.geometry
+    started = time.perf_counter()
+    surface.fill((0, 0, 0))
+    points = mapper._transpose(level.way_xy, dimensions, centre, True).tolist()
+    offsets = level.way_offsets.tolist()
+    for i in range(geometry.way_count):
+        way = points[offsets[i]:offsets[i + 1]]
+        if len(way) >= 2:
+            pygame.draw.lines(surface, (85, 251, 167), False, way, 2)
+    return (time.perf_counter() - started) * 1000
+
+
+def run(geometry, radius, size=SIZE, repeats=3):
+    mapper = Maps()
+    mapper.set_bounds((-radius, -radius, radius, radius))
+    mapper.geometry = geometry
+
+    started = time.perf_counter()
+    levels = WayLevels(geometry, base=getattr(config, 'MAP_LOD_BASE', 2e-6),
+                       count=getattr(config, 'MAP_LOD_LEVELS', 8),
+                       minor_tolerance=getattr(config, 'MAP_LOD_MINOR_TOLERANCE', 5e-5))
+    build = time.perf_counter() - started
+    mapper._levels = levels
+
+    surface = pygame.Surface((size, size))
+    report = []
+    reference = None
+    for index, level in enumerate(levels.levels):
+        raster_ms = min(raster(mapper, level, surface) for _ in range(repeats))
+        pixels = pygame.surfarray.array2d(surface) != 0
+        if reference is None:
+            reference = pixels
+        report.append({
+            'level': index,
+            'tolerance': level.tolerance,
+            'tolerance_px': round(level.tolerance / (2 * radius / size), 3),
+            'ways': level.way_count,
+            'points': level.point_count,
+            'raster_ms': round(raster_ms, 2),
+            'changed': round(float(np.count_nonzero(pixels != reference)) / pixels.size, 5),
+        })
+    tolerance = getattr(config, 'MAP_LOD_TOLERANCE', 0.5)
+    return {
+        'ways': geometry.way_count,
+        'points': len(geometry.way_xy),
+        'surface': size,
+        'radius': radius,
+        'build_ms': round(build * 1000, 1),
+        'levels_kb': round(levels.memory() / 1024.0, 1),
+        'levels': report,
+        'zoom_levels': {str(zoom): mapper.lod_level((size, size), tolerance / zoom) for zoom in ZOOMS},
+    }
+
+
+def main():
+    parser = optparse.OptionParser(usage='python %prog [--ways N | --osm FILE] [--radius DEGREES] [-o out.json]')
+    parser.add_option('--ways', type='int', default=20000, help="Synthetic ways (default 20000)")
+    parser.add_option('--osm', default=None, help="Use the ways of an OSM XML file instead")
+    parser.add_option('--radius', type='float', default=RADIUS, help="Half the drawn area's width, in degrees")
+    parser.add_option('--size', type='int', default=SIZE, help="Surface size in pixels")
+    parser.add_option('-o', '--output', dest='output', default=None)
+    options, args = parser.parse_args()
+
+    geometry = load_osm(options.osm) if options.osm else synthesize(options.ways, options.radius)
+    print(f"[Benchmark] {geometry.way_count} ways, {len(geometry.way_xy)} points", file=sys.stderr)
+    output = json.dumps(run(geometry, options.radius, options.size), indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
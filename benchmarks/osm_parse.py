@@ -0,0 +1,172 @@
+"""
+OSM parse benchmark.
+
+Parses one OSM XML file with the streaming parser Maps uses
+(pypboy.geometry.parse_osm) and with the xmltodict path it replaced, each in
+a fresh process. Reports parse time and the peak RSS growth over the
+process's footprint before parsing, as JSON.
+
+    python benchmarks/osm_parse.py response.osm      # a recorded response
+    python benchmarks/osm_parse.py --ways 20000      # synthetic area of that many ways
+    python benchmarks/osm_parse.py -o parse.json
+
+Without a file, a synthetic area is generated: a street grid with
+OSM-typical tag noise (source, created_by, surface ...) on ways and nodes,
+plus named amenities and addresses.
+"""
+
+import json
+import optparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARSERS = ('iterparse', 'xmltodict')
+AMENITIES = ('cafe', 'bank', 'pharmacy', 'school', 'restaurant', 'fuel', 'post_office', 'library')
+HIGHWAYS = ('residential', 'service', 'primary', 'secondary', 'tertiary', 'footway')
+
+
+def synthesize(path, ways, seed=1):
+    """Write a synthetic OSM document with about `ways` ways of 12 nodes each."""
+    rng = random.Random(seed)
+    node_id = 1
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="osm_parse.py">\n')
+        f.write('<bounds minlat="34.27" minlon="-118.69" maxlat="34.51" maxlon="-118.45"/>\n')
+        way_nodes = []
+        for way in range(ways):
+            refs = []
+            lon, lat = rng.uniform(-118.69, -118.45), rng.uniform(34.27, 34.51)
+            for i in range(12):
+                lon += rng.uniform(-0.0005, 0.0005)
+                lat += rng.uniform(-0.0005, 0.0005)
+                attributes = 'id="%d" lat="%.7f" lon="%.7f" version="3" timestamp="2023-04-01T12:00:00Z" ' \
+                             'changeset="123456" uid="4242" user="mapper"' % (node_id, lat, lon)
+                kind = rng.random()
+                if kind < 0.02:
+                    f.write('<node %s>\n <tag k="name" v="Place %d"/>\n <tag k="amenity" v="%s"/>\n'
+                            ' <tag k="opening_hours" v="Mo-Fr 09:00-17:00"/>\n <tag k="source" v="survey"/>\n</node>\n'
+                            % (attributes, node_id, rng.choice(AMENITIES)))
+                elif kind < 0.05:
+                    f.write('<node %s>\n <tag k="addr:housenumber" v="%d"/>\n <tag k="addr:street" v="Street %d"/>\n'
+                            ' <tag k="addr:postcode" v="91350"/>\n <tag k="building" v="house"/>\n</node>\n'
+                            % (attributes, rng.randint(1, 9999), way))
+                else:
+                    f.write('<node %s/>\n' % attributes)
+                refs.append(node_id)
+                node_id += 1
+            way_nodes.append(refs)
+        for way, refs in enumerate(way_nodes):
+            f.write('<way id="%d" version="2" changeset="123456" uid="4242" user="mapper">\n' % (way + 1))
+            for ref in refs:
+                f.write(' <nd ref="%d"/>\n' % ref)
+            f.write(' <tag k="highway" v="%s"/>\n <tag k="name" v="Street %d"/>\n <tag k="surface" v="asphalt"/>\n'
+                    ' <tag k="lanes" v="2"/>\n <tag k="source" v="tiger"/>\n <tag k="tiger:county" v="Los Angeles, CA"/>\n'
+                    '</way>\n' % (rng.choice(HIGHWAYS), way))
+        f.write('</osm>\n')
+
+
+def parse_xmltodict(map_data, origin):
+    """The path Maps.display_map used before parse_osm: the whole document as nested dicts."""
+    import xmltodict
+    from pypboy.geometry import GeometryBuilder
+    osm = xmltodict.parse(map_data, force_list=('node', 'way', 'nd', 'tag')).get('osm') or {}
+    builder = GeometryBuilder(origin)
+    nodes = {}
+    for node in osm.get('node', ()):
+        lon, lat = float(node['@lon']), float(node['@lat'])
+        nodes[node['@id']] = (lon, lat)
+        if 'tag' not in node:
+            continue
+        tags = {tag['@k']: tag['@v'] for tag in node['tag']}
+        if 'name' in tags:
+            builder.add_poi(lon, lat, tags['name'], tags.get('amenity'))
+        if 'addr:housenumber' in tags and 'addr:street' in tags:
+            builder.add_poi(lon, lat, tags['addr:housenumber'] + " " + tags['addr:street'])
+    for way in osm.get('way', ()):
+        try:
+            builder.add_way([nodes[node_id['@ref']] for node_id in way.get('nd', ())])
+        except KeyError:
+            pass
+    return builder.build()
+
+
+def rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def child(parser, path):
+    sys.path.insert(0, ROOT)
+    import pypboy.geometry
+    import xmltodict
+    origin = (-118.57, 34.39)
+    # The response arrives in memory (requests' response.text), as in Maps
+    with open(path, 'rb') as f:
+        map_data = f.read()
+    baseline = rss_kb()
+    started = time.perf_counter()
+    if parser == 'iterparse':
+        geometry = pypboy.geometry.parse_osm(map_data, origin)
+    else:
+        geometry = parse_xmltodict(map_data, origin)
+    seconds = time.perf_counter() - started
+    return {
+        'parser': parser,
+        'seconds': round(seconds, 3),
+        'peak_rss_growth_kb': rss_kb() - baseline,
+        'baseline_rss_kb': baseline,
+        'ways': geometry.way_count,
+        'points': len(geometry.way_xy),
+        'pois': geometry.poi_count,
+        'geometry_kb': round(geometry.memory()['total'] / 1024.0, 1),
+    }
+
+
+def main():
+    parser = optparse.OptionParser(usage='python %prog [FILE] [--ways N] [-o out.json]')
+    parser.add_option('--ways', type='int', default=20000, help="Size of the synthetic area (without FILE)")
+    parser.add_option('-o', '--output', dest='output', default=None)
+    parser.add_option('--child', dest='child', default=None, help=optparse.SUPPRESS_HELP)
+    options, args = parser.parse_args()
+
+    if options.child:
+        print(json.dumps(child(options.child, args[0])))
+        return
+
+    scratch = None
+    if args:
+        path = args[0]
+    else:
+        scratch = tempfile.NamedTemporaryFile(suffix='.osm', delete=False)
+        scratch.close()
+        path = scratch.name
+        print(f"[Benchmark] Generating {options.ways} ways", file=sys.stderr)
+        synthesize(path, options.ways)
+    try:
+        report = {'file': args[0] if args else f"synthetic, {options.ways} ways",
+                  'file_kb': os.path.getsize(path) // 1024, 'parsers': []}
+        for name in PARSERS:
+            print(f"[Benchmark] {name}", file=sys.stderr)
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name, path],
+                                    check=True, stdout=subprocess.PIPE).stdout
+            report['parsers'].append(json.loads(output.decode().strip().splitlines()[-1]))
+    finally:
+        if scratch is not None:
+            os.remove(path)
+
+    output = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
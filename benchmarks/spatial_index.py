@@ -0,0 +1,141 @@
+"""
+Spatial index benchmark.
+
+Builds pypboy.spatial.SpatialIndex over synthetic areas of increasing size
+(half ways, half POIs, spread over a world-map-sized area) and times the
+queries the map makes, next to a brute-force NumPy scan of every feature:
+
+- rect: ways and POIs inside a local-map-sized viewport (a redraw)
+- nearest: the POI nearest a random point (a tap)
+- radius: POIs within about 100m of a random point
+
+    python benchmarks/spatial_index.py                     # 10k .. 500k features
+    python benchmarks/spatial_index.py --features 20000 --features 200000 -o spatial.json
+"""
+
+import json
+import optparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pypboy.geometry import MapGeometry
+from pypboy.spatial import SpatialIndex
+
+SIZES = (10000, 50000, 100000, 500000)
+EXTENT = 0.12       # Half-width of the area, degrees (WORLD_MAP_RADIUS)
+VIEWPORT = 0.003    # Half-width of a query rect (the local map's radius)
+RADIUS = 0.001
+POINTS_PER_WAY = 8
+
+
+def synthesize(features, seed=1):
+    """A MapGeometry of features / 2 short random-walk ways and as many POIs."""
+    rng = np.random.default_rng(seed)
+    ways = features // 2
+    pois = features - ways
+    starts = rng.uniform(-EXTENT, EXTENT, (ways, 1, 2))
+    steps = rng.uniform(-0.0004, 0.0004, (ways, POINTS_PER_WAY, 2))
+    way_xy = (starts + np.cumsum(steps, axis=1)).reshape(-1, 2).astype(np.float32)
+    return MapGeometry(
+        (0.0, 0.0),
+        way_xy,
+        (np.arange(ways + 1) * POINTS_PER_WAY).astype(np.int32),
+        np.full(ways, -1, dtype=np.int16),
+        np.arange(ways, dtype=np.int64),
+        rng.uniform(-EXTENT, EXTENT, (pois, 2)).astype(np.float32),
+        np.zeros(pois, dtype=np.int32),
+        np.full(pois, -1, dtype=np.int16),
+        np.arange(pois, dtype=np.int64),
+        ['poi'], [], []
+    )
+
+
+def scan_rect(index, rect):
+    boxes, xy = index.way_boxes, index.poi_xy
+    ways = np.flatnonzero((boxes[:, 0] <= rect[2]) & (boxes[:, 2] >= rect[0]) &
+                          (boxes[:, 1] <= rect[3]) & (boxes[:, 3] >= rect[1]))
+    pois = np.flatnonzero((xy[:, 0] >= rect[0]) & (xy[:, 0] <= rect[2]) &
+                          (xy[:, 1] >= rect[1]) & (xy[:, 1] <= rect[3]))
+    return ways, pois
+
+
+def scan_nearest(index, x, y):
+    distances = np.hypot(index.poi_xy[:, 0] - x, index.poi_xy[:, 1] - y)
+    return int(np.argmin(distances))
+
+
+def scan_radius(index, x, y):
+    distances = np.hypot(index.poi_xy[:, 0] - x, index.poi_xy[:, 1] - y)
+    return np.flatnonzero(distances <= RADIUS)
+
+
+def timed(function, queries):
+    """Mean microseconds per call over queries, and the results."""
+    started = time.perf_counter()
+    results = [function(*query) for query in queries]
+    return round((time.perf_counter() - started) / len(queries) * 1e6, 1), results
+
+
+def run(features, queries=200):
+    geometry = synthesize(features)
+    started = time.perf_counter()
+    index = SpatialIndex(geometry)
+    build = time.perf_counter() - started
+
+    rng = np.random.default_rng(2)
+    points = [tuple(point) for point in rng.uniform(-EXTENT, EXTENT, (queries, 2))]
+    rects = [((x - VIEWPORT, y - VIEWPORT, x + VIEWPORT, y + VIEWPORT),) for x, y in points]
+
+    rect_us, found = timed(lambda rect: (index.ways_in(rect), index.pois_in(rect)), rects)
+    rect_scan_us, expected = timed(lambda rect: scan_rect(index, rect), rects)
+    nearest_us, nearest = timed(lambda x, y: index.nearest_poi(x, y)[0], points)
+    nearest_scan_us, nearest_expected = timed(lambda x, y: scan_nearest(index, x, y), points)
+    radius_us, within = timed(lambda x, y: np.sort(index.pois_within(x, y, RADIUS)), points)
+    radius_scan_us, within_expected = timed(lambda x, y: scan_radius(index, x, y), points)
+
+    # The index must agree with the scans
+    for (ways, pois), (scan_ways, scan_pois) in zip(found, expected):
+        assert np.array_equal(ways, scan_ways) and np.array_equal(pois, scan_pois)
+    assert nearest == nearest_expected
+    assert all(np.array_equal(a, b) for a, b in zip(within, within_expected))
+
+    return {
+        'features': features,
+        'cells': index.cols * index.rows,
+        'build_ms': round(build * 1000, 1),
+        'index_kb': round(index.memory() / 1024.0, 1),
+        'rect_hits': round(sum(len(w) + len(p) for w, p in found) / len(found), 1),
+        'rect_us': rect_us,
+        'rect_scan_us': rect_scan_us,
+        'nearest_us': nearest_us,
+        'nearest_scan_us': nearest_scan_us,
+        'radius_us': radius_us,
+        'radius_scan_us': radius_scan_us,
+    }
+
+
+def main():
+    parser = optparse.OptionParser(usage='python %prog [--features N ...] [-o out.json]')
+    parser.add_option('--features', type='int', action='append', dest='sizes', help="Dataset size (repeatable)")
+    parser.add_option('--queries', type='int', default=200)
+    parser.add_option('-o', '--output', dest='output', default=None)
+    options, args = parser.parse_args()
+
+    report = []
+    for features in options.sizes or SIZES:
+        print(f"[Benchmark] {features} features", file=sys.stderr)
+        report.append(run(features, options.queries))
+
+    output = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
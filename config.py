@@ -1,15 +1,36 @@
 import os
 import pygame
-from dotenv import load_dotenv
+import assets
 
-# Load environment variables from .env file
-load_dotenv()
+
+def _find_dotenv():
+    """The nearest .env walking up from this directory (where load_dotenv() would look)."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, '.env')
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+# Load environment variables from .env file (python-dotenv is only imported if there is one)
+_dotenv = _find_dotenv()
+if _dotenv:
+    from dotenv import load_dotenv
+    load_dotenv(_dotenv)
 
 WIDTH = 480
 HEIGHT = 320
 
+# Display size, when it differs from the WIDTH x HEIGHT the UI is laid out at.
+# Scaling is folded into the post-process remap (no extra pass).
 # OUTPUT_WIDTH = 320
 # OUTPUT_HEIGHT = 240
+OUTPUT_ROTATION = 0              # Clockwise: 0, 90, 180, 270 (panel mounted sideways/upside down)
+OUTPUT_SCALE_MODE = 'bilinear'   # 'bilinear' = smooth, 'nearest' = integer-nearest, fastest
 
 # GPS coordinates from .env (longitude, latitude)
 # Default: Santa Clarita, CA
@@ -23,17 +44,51 @@ MAP_FOCUS = (
 # Load map from cache instead of internet
 LOAD_CACHED_MAP = os.getenv('LOAD_CACHED_MAP', 'false').lower() in ('true', '1', 'yes')
 
+# Map data is fetched and cached on disk as zoom/x/y tiles (pypboy.tiles);
+# fill it for offline use with: python -m pypboy.tiles [--center LON,LAT] [--radius DEGREES]
+MAP_TILE_DIR = 'map_tiles'
+MAP_TILE_ZOOM = 14               # Tiles about 2km across; each step up halves that (4x the requests)
+MAP_TILE_BUDGET = 256 * 1024 * 1024  # Bytes on disk before least recently used tiles are dropped
+MAP_TILE_FETCHES = 2             # Tiles downloaded at once
+MAP_CACHE_XML = False            # Also keep each tile's raw OSM response, gzipped, to re-parse from
+MAP_TILE_MAX_AGE = 30 * 86400    # Seconds before a stored tile is revalidated with the server; 0 = never
+
 # Map zoom configuration
 MAP_ZOOM_MIN = 0.5               # Max zoomed out (see more area)
 MAP_ZOOM_MAX = 3.0               # Max zoomed in (see less area)
 MAP_ZOOM_DEFAULT = 1.0           # Starting zoom level
 MAP_ZOOM_STEP = 0.15             # Zoom increment per keypress
 MAP_SMOOTHSCALE = False          # False = faster (scale), True = prettier (smoothscale)
+MAP_ZOOM_MARGIN = 0.5            # Viewports scaled beyond each side of the view, so panning needn't rescale
+MAP_ZOOM_ANIMATION = 0.1         # Seconds to glide one MAP_ZOOM_STEP; 0 = jump
+MAP_VECTOR_ZOOM = True           # Once zooming/panning settles, redraw the view from the data at the zoom level
+MAP_VECTOR_DELAY = 0.15          # Seconds the view must be still before that redraw
+MAP_TAP_RADIUS = 16              # Pixels around a tap searched for a POI to name in the header
+MAP_TAP_SLOP = 6                 # Pixels a press may move and still count as a tap (not a drag)
+MAP_LOD_TOLERANCE = 0.5          # Pixels simplified ways may stray from the data (pypboy.lod)
+MAP_LOD_LEVELS = 8               # Simplified levels, each twice as coarse as the one before
+MAP_LOD_BASE = 2e-6              # Finest level's tolerance in degrees (~0.2m)
+MAP_LOD_MINOR_TOLERANCE = 5e-5   # From this tolerance up, service roads, footpaths etc. are left out
 
 # World map settings (progressive loading)
 WORLD_MAP_SURFACE_SIZE = 960     # 2x screen width for pan area
 WORLD_MAP_RADIUS = 0.12          # Target fetch radius (~27km)
 
+# Network and disk I/O run as asyncio tasks (game.tasks); results are applied once per frame
+ENGINE_ASYNCIO = False           # Run the frame loop itself on asyncio (else tasks get their own thread)
+TASK_WORKERS = 4                 # Threads for blocking calls inside tasks (requests, files, parsing)
+MAP_FETCH_TIMEOUT = 20           # Seconds per map request
+MAP_FETCH_RETRIES = 3            # Retries per map request (see FETCH_BACKOFF)
+MAP_STAGE_TIMEOUT = 120          # Seconds before a whole progressive stage is given up
+GEOCODE_TIMEOUT = 10             # Seconds before the area name lookup is given up
+
+# HTTP requests (pypboy.fetch): one pooled session for OSM and Nominatim
+OSM_API_URL = os.getenv('OSM_API_URL', 'https://api.openstreetmap.org/api/0.6/map')
+NOMINATIM_URL = os.getenv('NOMINATIM_URL', 'https://nominatim.openstreetmap.org/reverse')
+FETCH_CONNECTIONS = 4            # Requests in flight at once (and connections kept open)
+FETCH_BACKOFF = 1.0              # Longest wait (s) before the first retry; doubles per retry, jittered
+FETCH_MAX_BACKOFF = 30           # Cap on the wait between retries
+
 # Platform-specific settings (set by main.py via platform_detect)
 GPIO_AVAILABLE = False
 IS_RASPBERRY_PI = False
@@ -54,7 +109,8 @@ RADIO_WAVEFORM_COLOR = (95, 255, 177)
 RADIO_WAVEFORM_AXIS_COLOR = (60, 180, 120)
 
 EVENTS = {
-    'SONG_END': pygame.USEREVENT + 1
+    'SONG_END': pygame.USEREVENT + 1,
+    'BUTTON': pygame.USEREVENT + 3      # GPIO buttons (game.buttons): pin, action, kind, time, duration
 }
 
 ACTIONS = {
@@ -72,6 +128,8 @@ ACTIONS = {
     pygame.K_MINUS: "zoom_out",
     pygame.K_KP_PLUS: "zoom_in",
     pygame.K_KP_MINUS: "zoom_out",
+    pygame.K_F11: "profiler_dump",
+    pygame.K_F12: "profiler_hud",
 }
 
 # Using GPIO.BCM as mode
@@ -90,46 +148,53 @@ GPIO_ACTIONS = {
     24: "knob_2", #GPIO 24
 #	25: "knob_3" #GPIO 23
 }
+GPIO_HOLD_ACTIONS = {}          # pin: action fired once the button is held (on top of the press action)
+GPIO_REPEAT_ACTIONS = ["dial_up", "dial_down", "zoom_in", "zoom_out"]  # Repeat while held
+GPIO_DEBOUNCE = 0.02            # Seconds the contacts are ignored after a change
+GPIO_HOLD_AFTER = 0.6           # Seconds before a press counts as held
+GPIO_REPEAT_EVERY = 0.15        # Seconds between repeats while held
 
 
-MAP_ICONS = {
-    "camp": 		pygame.image.load('images/map_icons/camp.png'),
-    "factory": 		pygame.image.load('images/map_icons/factory.png'),
-    "metro": 		pygame.image.load('images/map_icons/metro.png'),
-    "misc": 		pygame.image.load('images/map_icons/misc.png'),
-    "monument": 	pygame.image.load('images/map_icons/monument.png'),
-    "vault": 		pygame.image.load('images/map_icons/vault.png'),
-    "settlement": 	pygame.image.load('images/map_icons/settlement.png'),
-    "ruin": 		pygame.image.load('images/map_icons/ruin.png'),
-    "cave": 		pygame.image.load('images/map_icons/cave.png'),
-    "landmark": 	pygame.image.load('images/map_icons/landmark.png'),
-    "city": 		pygame.image.load('images/map_icons/city.png'),
-    "office": 		pygame.image.load('images/map_icons/office.png'),
-    "sewer": 		pygame.image.load('images/map_icons/sewer.png'),
-}
+# Icons and fonts load on first use (see assets.py); `in` and iteration are free
+MAP_ICONS = assets.LazyRegistry('MAP_ICONS', [
+    'camp',
+    'factory',
+    'metro',
+    'misc',
+    'monument',
+    'vault',
+    'settlement',
+    'ruin',
+    'cave',
+    'landmark',
+    'city',
+    'office',
+    'sewer',
+], lambda name: pygame.image.load(f'images/map_icons/{name}.png'))
 
-AMENITIES = {
-    'pub': 				MAP_ICONS['vault'],
-    'nightclub': 		MAP_ICONS['vault'],
-    'bar': 				MAP_ICONS['vault'],
-    'fast_food': 		MAP_ICONS['sewer'],
-#	'cafe': 			MAP_ICONS['sewer'],
-#	'drinking_water': 	MAP_ICONS['sewer'],
-    'restaurant': 		MAP_ICONS['settlement'],
-    'cinema': 			MAP_ICONS['office'],
-    'pharmacy': 		MAP_ICONS['office'],
-    'school': 			MAP_ICONS['office'],
-    'bank': 			MAP_ICONS['monument'],
-    'townhall': 		MAP_ICONS['monument'],
-#	'bicycle_parking': 	MAP_ICONS['misc'],
-#	'place_of_worship': MAP_ICONS['misc'],
-#	'theatre': 			MAP_ICONS['misc'],
-#	'bus_station': 		MAP_ICONS['misc'],
-#	'parking': 			MAP_ICONS['misc'],
-#	'fountain': 		MAP_ICONS['misc'],
-#	'marketplace': 		MAP_ICONS['misc'],
-#	'atm': 				MAP_ICONS['misc'],
+_AMENITY_ICONS = {
+    'pub': 				'vault',
+    'nightclub': 		'vault',
+    'bar': 				'vault',
+    'fast_food': 		'sewer',
+#	'cafe': 			'sewer',
+#	'drinking_water': 	'sewer',
+    'restaurant': 		'settlement',
+    'cinema': 			'office',
+    'pharmacy': 		'office',
+    'school': 			'office',
+    'bank': 			'monument',
+    'townhall': 		'monument',
+#	'bicycle_parking': 	'misc',
+#	'place_of_worship': 'misc',
+#	'theatre': 			'misc',
+#	'bus_station': 		'misc',
+#	'parking': 			'misc',
+#	'fountain': 		'misc',
+#	'marketplace': 		'misc',
+#	'atm': 				'misc',
 }
+AMENITIES = assets.LazyRegistry('AMENITIES', _AMENITY_ICONS, lambda amenity: MAP_ICONS[_AMENITY_ICONS[amenity]])
 
 INVENTORY_OLD = [
 "Ranger Sequoia",
@@ -145,6 +210,36 @@ INVENTORY_OLD = [
 # CRT Barrel Distortion Effect
 CRT_EFFECT_ENABLED = True
 CRT_EFFECT_STRENGTH = 0.05  # 0.0 = no curve, 0.05 = subtle, 0.15 = moderate, 0.25 = strong
+CRT_EFFECT_MODE = 'bilinear'  # 'bilinear' = smooth edges, 'nearest' = fastest (Pi Zero)
+CRT_LUT_CACHE = 'crt.cache'   # Precomputed distortion table, rebuilt when size/strength change
+CRT_WORKERS = 0               # Row bands in parallel: 0 = one per core, 1 = single-threaded
+                              # (falls back to one thread by itself if bands turn out slower)
+
+# Dirty-rect rendering: only changed regions are redrawn, post-processed and pushed.
+# Scrolling scanlines touch every row, so pair with SCANLINES_SCROLL = False to get
+# near-zero cost on static screens.
+RENDER_DIRTY_RECTS = False
+SCANLINES_SCROLL = True
+
+# Frame governor: full rate while animating, throttled when the screen is static
+FRAME_RATE_ACTIVE = 30           # FPS while animating or shortly after input
+FRAME_RATE_IDLE = 4              # FPS when nothing is animating
+FRAME_RATE_DEEP_IDLE = 1         # FPS in deep idle
+IDLE_AFTER = 2.0                 # Seconds without input before idling (if nothing animates)
+DEEP_IDLE_AFTER = 120            # Seconds without input before scanlines and CRT stop; 0 = never
+WARMUP_ENABLED = True            # Build not-yet-opened modules/tabs ahead of time (else on first visit)
+WARMUP_AFTER = 1.0               # Seconds without input before building one per frame
+
+# Animation and input advance in fixed steps, decoupled from the frame rate;
+# slow frames run several steps (and are interpolated) instead of slowing down
+UPDATE_RATE = 60                 # Update steps per second
+MAX_UPDATES_PER_FRAME = 5        # Catch-up cap; time beyond it is dropped
+
+# Frame profiler: per-stage timings, HUD on F12 (action "profiler_hud"),
+# CSV dump on F11 (action "profiler_dump") and on exit while enabled
+PROFILER_ENABLED = False
+PROFILER_HUD = False             # Start with the HUD visible (also enables the profiler)
+PROFILER_FRAMES = 600            # Ring buffer length (20 s at 30 FPS)
 
 # Boot Sequence Configuration
 BOOT_SEQUENCE_ENABLED = True
@@ -155,7 +250,13 @@ BOOT_INITIAL_BLINKS = 3         # Cursor blinks before typing starts
 BOOT_SCROLL_SPEED = 300         # Pixels per second for scroll-up
 BOOT_SKIP_KEYS = [pygame.K_SPACE, pygame.K_RETURN, pygame.K_ESCAPE]
 
-pygame.font.init()
-FONTS = {}
-for x in range(10, 28):
-    FONTS[x] = pygame.font.Font('monofonto.ttf', x)
+# Rendered text (labels, menus, boot text) kept ready to blit, least recently used dropped first
+TEXT_CACHE_BYTES = 2 * 1024 * 1024
+
+def _load_font(size):
+    if not pygame.font.get_init():
+        pygame.font.init()
+    return pygame.font.Font('monofonto.ttf', size)
+
+
+FONTS = assets.LazyRegistry('FONTS', range(10, 28), _load_font)
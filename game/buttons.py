@@ -0,0 +1,216 @@
+"""
+Button input from GPIO pins.
+
+Edges arrive from the GPIO library's interrupt thread (RPi.GPIO
+add_event_detect), so nothing polls the pins every frame and presses shorter
+than a frame still count. A worker thread debounces them, classifies press,
+hold, repeat and release, and posts each one to the pygame event queue as a
+config.EVENTS['BUTTON'] event with the pin, its action, the kind and the
+time.monotonic() of the edge (which also wakes an idle frame governor).
+
+Debouncing is leading-edge: the first edge is taken at once, adding no
+latency, and the pin is then ignored for the debounce window. After the
+window its level is read back, which catches a release (or press) that
+happened inside it.
+
+Backends are pluggable: RPiGPIOBackend for the Pi, MockBackend to drive the
+same path from code on a desktop.
+"""
+
+import threading
+import time
+import pygame
+import config
+
+PRESS = 'press'
+HOLD = 'hold'
+REPEAT = 'repeat'
+RELEASE = 'release'
+
+
+class RPiGPIOBackend(object):
+    """Buttons wired from the pin to ground, using the internal pull-ups."""
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+        self._pins = []
+
+    def setup(self, pin, on_edge):
+        GPIO = self.GPIO
+        GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        GPIO.add_event_detect(pin, GPIO.BOTH, callback=lambda channel: on_edge(channel, time.monotonic()))
+        self._pins.append(pin)
+
+    def is_pressed(self, pin):
+        return self.GPIO.input(pin) == self.GPIO.LOW
+
+    def close(self):
+        for pin in self._pins:
+            self.GPIO.remove_event_detect(pin)
+        self._pins = []
+
+
+class MockBackend(object):
+    """Pins driven from code, with optional contact bounce."""
+
+    def __init__(self):
+        self._pressed = {}
+        self._callbacks = {}
+
+    def setup(self, pin, on_edge):
+        self._pressed[pin] = False
+        self._callbacks[pin] = on_edge
+
+    def is_pressed(self, pin):
+        return self._pressed[pin]
+
+    def set(self, pin, pressed):
+        if self._pressed[pin] != pressed:
+            self._pressed[pin] = pressed
+            self._callbacks[pin](pin, time.monotonic())
+
+    def press(self, pin, bounces=0, bounce_interval=0.001):
+        self._change(pin, True, bounces, bounce_interval)
+
+    def release(self, pin, bounces=0, bounce_interval=0.001):
+        self._change(pin, False, bounces, bounce_interval)
+
+    def _change(self, pin, pressed, bounces, bounce_interval):
+        for i in range(bounces):
+            self.set(pin, pressed)
+            time.sleep(bounce_interval)
+            self.set(pin, not pressed)
+            time.sleep(bounce_interval)
+        self.set(pin, pressed)
+
+    def close(self):
+        pass
+
+
+class _Pin(object):
+
+    def __init__(self, action):
+        self.action = action
+        self.pressed = False
+        self.pressed_at = 0.0
+        self.quiet_until = 0.0      # Edges before this are bounce
+        self.check_at = None        # When to read the level back after a transition
+        self.next_due = None        # Next hold/repeat while pressed
+        self.held = False
+        self.edges = 0
+        self.transitions = 0
+        self.bounces = 0
+        self.bounce_span = 0.0      # Longest stretch of bouncing after a transition
+
+
+class ButtonInput(object):
+
+    def __init__(self, actions, backend, debounce=0.02, hold_after=0.6, repeat_every=0.15, post=None):
+        self.backend = backend
+        self.debounce = debounce
+        self.hold_after = hold_after
+        self.repeat_every = repeat_every   # 0 = hold once, no repeats
+        self.post = post or post_event
+        self._pins = {pin: _Pin(action) for pin, action in actions.items()}
+        self._edges = []
+        self._condition = threading.Condition()
+        self._running = True
+        for pin in self._pins:
+            backend.setup(pin, self._on_edge)
+        self._thread = threading.Thread(target=self._run, name='buttons', daemon=True)
+        self._thread.start()
+
+    def _on_edge(self, pin, at):
+        """Called on the backend's thread; just hands the edge to the worker."""
+        with self._condition:
+            self._edges.append((pin, at))
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._edges and self._running:
+                    deadline = self._next_deadline()
+                    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                    self._condition.wait(timeout)
+                if not self._running:
+                    return
+                edges, self._edges = self._edges, []
+            for pin, at in edges:
+                self._edge(pin, at)
+            self._timers(time.monotonic())
+
+    def _next_deadline(self):
+        deadlines = [
+            due for state in self._pins.values() for due in (state.check_at, state.next_due) if due is not None
+        ]
+        return min(deadlines) if deadlines else None
+
+    def _edge(self, pin, at):
+        state = self._pins[pin]
+        state.edges += 1
+        if at < state.quiet_until:
+            state.bounces += 1
+            state.bounce_span = max(state.bounce_span, at - (state.quiet_until - self.debounce))
+            return
+        self._transition(pin, not state.pressed, at)
+
+    def _timers(self, now):
+        for pin, state in self._pins.items():
+            if state.check_at is not None and now >= state.check_at:
+                state.check_at = None
+                pressed = self.backend.is_pressed(pin)
+                if pressed != state.pressed:
+                    # Changed again inside the debounce window
+                    self._transition(pin, pressed, now)
+            if state.pressed and state.next_due is not None and now >= state.next_due:
+                kind = REPEAT if state.held else HOLD
+                state.held = True
+                self._emit(pin, kind, state.next_due, state.next_due - state.pressed_at)
+                state.next_due = state.next_due + self.repeat_every if self.repeat_every else None
+
+    def _transition(self, pin, pressed, at):
+        state = self._pins[pin]
+        state.pressed = pressed
+        state.transitions += 1
+        state.quiet_until = at + self.debounce
+        state.check_at = state.quiet_until
+        if pressed:
+            state.pressed_at = at
+            state.held = False
+            state.next_due = at + self.hold_after if self.hold_after else None
+            self._emit(pin, PRESS, at, 0.0)
+        else:
+            state.next_due = None
+            self._emit(pin, RELEASE, at, at - state.pressed_at)
+
+    def _emit(self, pin, kind, at, duration):
+        self.post(pin=pin, action=self._pins[pin].action, kind=kind, time=at, duration=duration)
+
+    def stats(self):
+        """Edges seen, accepted transitions and bounces per pin."""
+        return {
+            pin: {
+                'edges': state.edges,
+                'transitions': state.transitions,
+                'bounces': state.bounces,
+                'bounce_span_ms': round(state.bounce_span * 1000, 2),
+            }
+            for pin, state in self._pins.items()
+        }
+
+    def close(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+        self.backend.close()
+
+
+def post_event(**attributes):
+    """Post a BUTTON event (safe from any thread)."""
+    try:
+        pygame.event.post(pygame.event.Event(config.EVENTS['BUTTON'], **attributes))
+    except pygame.error:
+        pass    # Event queue gone (shutting down)
@@ -0,0 +1,79 @@
+"""
+Injectable time source.
+
+Code that reads wall-clock time or sleeps goes through time() and sleep()
+(sleep_async() in coroutines) here instead of the time module, so the
+benchmark harness can install a VirtualClock and replay scenarios faster
+than real time.
+"""
+
+import asyncio
+import time as _time
+import threading
+
+
+class SystemClock(object):
+
+    def time(self):
+        return _time.time()
+
+    def sleep(self, seconds):
+        _time.sleep(seconds)
+
+    async def sleep_async(self, seconds):
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock(object):
+    """Time only moves when advance() is called; sleepers wake once it passes their deadline."""
+
+    def __init__(self, start=None):
+        self._now = _time.time() if start is None else start
+        self._released = False
+        self._condition = threading.Condition()
+
+    def time(self):
+        return self._now
+
+    def sleep(self, seconds):
+        with self._condition:
+            deadline = self._now + seconds
+            while self._now < deadline and not self._released:
+                self._condition.wait()
+
+    async def sleep_async(self, seconds):
+        # Wait for advance() on a pool thread so the loop keeps running
+        await asyncio.get_running_loop().run_in_executor(None, self.sleep, seconds)
+
+    def advance(self, seconds):
+        with self._condition:
+            self._now += seconds
+            self._condition.notify_all()
+
+    def release(self):
+        """Let every pending and future sleep return at once (used at shutdown)."""
+        with self._condition:
+            self._released = True
+            self._condition.notify_all()
+
+
+_clock = SystemClock()
+
+
+def install(clock):
+    """Replace the process-wide clock; returns the previous one."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+def time():
+    return _clock.time()
+
+
+def sleep(seconds):
+    _clock.sleep(seconds)
+
+
+async def sleep_async(seconds):
+    await _clock.sleep_async(seconds)
@@ -1,7 +1,9 @@
 import pygame
-import time
 import config
-import numpy as np
+from game.crt import CRTDistortion
+from game.postprocess import PostProcess, output_transform
+from game.profiler import FrameProfiler
+from game.timestep import FixedTimestep
 
 class Engine(object):
 
@@ -12,144 +14,281 @@ class Engine(object):
         super(Engine, self).__init__(*args, **kwargs)
         #self.window = pygame.display.set_mode((width, height),pygame.FULLSCREEN)
         pygame.init()
-        self.window = pygame.display.set_mode((width, height))
-        self.screen = pygame.display.get_surface()
+        # The UI is laid out at width x height; the display may be another
+        # size or mounted sideways (OUTPUT_WIDTH/HEIGHT, OUTPUT_ROTATION)
+        output_size, self.output_rotation = output_transform(width, height)
+        self.rescale = output_size != (width, height) or self.output_rotation != 0
+        self.window = pygame.display.set_mode(output_size)
+        self.display = pygame.display.get_surface()
+        # What everything draws on: the display itself unless the
+        # post-process pass has to scale it
+        self.screen = self._frame_surface((width, height)) if self.rescale else self.display
         pygame.display.set_caption(title)
         # Show cursor on desktop, hide on Pi (touch mode)
         pygame.mouse.set_visible(config.SHOW_CURSOR)
 
         self.groups = []
         self.root_children = EntityGroup()
+        # Additive post-process layers (scanlines), added per row by self.post
+        self.overlays = EntityGroup()
         self.background = pygame.surface.Surface(self.screen.get_size()).convert()
         self.background.fill((0, 0, 0))
 
-        self.rescale = False
-        self.last_render_time = 0
+        # Animation advances in fixed update(dt) steps; render(alpha) draws
+        # in between them at whatever rate frames can be produced
+        self.timestep = FixedTimestep(
+            rate=getattr(config, 'UPDATE_RATE', 60),
+            max_steps=getattr(config, 'MAX_UPDATES_PER_FRAME', 5)
+        )
+
+        self.profiler = FrameProfiler(
+            enabled=getattr(config, 'PROFILER_ENABLED', False),
+            size=getattr(config, 'PROFILER_FRAMES', 600),
+            hud=getattr(config, 'PROFILER_HUD', False)
+        )
 
         # Initialize CRT barrel distortion effect
         self.crt_enabled = getattr(config, 'CRT_EFFECT_ENABLED', True)
         self.crt_strength = getattr(config, 'CRT_EFFECT_STRENGTH', 0.15)
-        if self.crt_enabled:
+        self.crt_suspended = False  # Skipped while the frame governor is in deep idle
+        self.crt = None
+        if self.crt_enabled or self.rescale:
             self._init_crt_distortion(width, height)
+        self.post = PostProcess(width, height, layers=self.overlays, crt=self.crt, rotation=self.output_rotation)
+
+        # Dirty-rect mode: content is drawn incrementally onto an undistorted
+        # canvas, and only the changed regions are post-processed onto the
+        # screen and pushed.
+        self.dirty_rects = getattr(config, 'RENDER_DIRTY_RECTS', False)
+        EntityGroup.dirty_rects = self.dirty_rects
+        if self.dirty_rects:
+            self.blank = pygame.surface.Surface(self.screen.get_size()).convert()
+            self.blank.fill((0, 0, 0))
+            self.canvas = self._frame_surface(self.screen.get_size())
+            self._needs_full_redraw = True
+
+    def _frame_surface(self, size):
+        """An offscreen surface the remap can read (32-bit even on 16-bit panels)."""
+        surface = pygame.surface.Surface(size, 0, 32)
+        return surface.convert() if self.display.get_bytesize() == 4 else surface
 
     def _init_crt_distortion(self, width, height):
-        """Pre-compute CRT barrel distortion mapping for performance using vectorized numpy."""
-        # Create coordinate grids
-        y_coords, x_coords = np.mgrid[0:height, 0:width].astype(np.float32)
-
-        cx, cy = width / 2, height / 2
-
-        # Normalize coordinates to -1 to 1
-        nx = (x_coords - cx) / cx
-        ny = (y_coords - cy) / cy
-
-        # Calculate distance from center
-        r = np.sqrt(nx * nx + ny * ny)
-
-        # Apply barrel distortion formula: r' = r * (1 + k * r^2)
-        factor = 1 + self.crt_strength * r * r
-
-        # Apply distortion - keep as float for bilinear interpolation
-        self.crt_src_x = nx_dist_px = nx * factor * cx + cx
-        self.crt_src_y = ny_dist_px = ny * factor * cy + cy
-
-        # Create mask for out-of-bounds pixels
-        self.crt_mask = (nx_dist_px >= 0) & (nx_dist_px < width - 1) & \
-                       (ny_dist_px >= 0) & (ny_dist_px < height - 1)
-
-    def apply_crt_effect(self, surface):
-        """Apply CRT barrel distortion with bilinear interpolation for smooth edges."""
-        if not self.crt_enabled:
-            return surface
-
+        """Build (or load) the remap LUT once, up front: CRT barrel distortion
+        and/or scaling and rotation onto the display."""
+        mode = getattr(config, 'CRT_EFFECT_MODE', CRTDistortion.MODE_BILINEAR)
+        if self.rescale:
+            mode = getattr(config, 'OUTPUT_SCALE_MODE', mode)
+        self.crt = CRTDistortion(
+            width, height, self.crt_strength if self.crt_enabled else 0.0,
+            mode=mode,
+            cache_file=getattr(config, 'CRT_LUT_CACHE', CRTDistortion.CACHE_FILE),
+            workers=getattr(config, 'CRT_WORKERS', 1),
+            output_size=self.display.get_size(),
+            rotation=self.output_rotation
+        )
+
+    def post_process(self, surface, target=None, rect=None):
+        """Add the scanlines and apply the CRT distortion in one pass (into target, or in place)."""
         try:
-            # Get pixel array from surface (shape: width x height x 3)
-            src_array = pygame.surfarray.array3d(surface).astype(np.float32)
-            height, width = self.crt_src_x.shape
-
-            # Bilinear interpolation coordinates
-            x0 = np.floor(self.crt_src_x).astype(np.int32)
-            y0 = np.floor(self.crt_src_y).astype(np.int32)
-            x1 = np.clip(x0 + 1, 0, src_array.shape[0] - 1)
-            y1 = np.clip(y0 + 1, 0, src_array.shape[1] - 1)
-            x0 = np.clip(x0, 0, src_array.shape[0] - 1)
-            y0 = np.clip(y0, 0, src_array.shape[1] - 1)
-
-            # Fractional parts for interpolation weights
-            fx = (self.crt_src_x - np.floor(self.crt_src_x)).T
-            fy = (self.crt_src_y - np.floor(self.crt_src_y)).T
-
-            # Sample four corners and interpolate
-            c00 = src_array[x0.T, y0.T]
-            c10 = src_array[x1.T, y0.T]
-            c01 = src_array[x0.T, y1.T]
-            c11 = src_array[x1.T, y1.T]
-
-            # Bilinear interpolation
-            fx = fx[:, :, np.newaxis]
-            fy = fy[:, :, np.newaxis]
-            dst_array = (c00 * (1 - fx) * (1 - fy) +
-                        c10 * fx * (1 - fy) +
-                        c01 * (1 - fx) * fy +
-                        c11 * fx * fy).astype(np.uint8)
-
-            # Apply mask to black out pixels that map outside bounds
-            dst_array[~self.crt_mask.T] = [0, 0, 0]
-
-            # Create new surface from distorted array
-            result = pygame.surfarray.make_surface(dst_array)
-            return result
-        except Exception:
-            # If CRT effect fails, return original surface
-            return surface
-
-    def render(self):
-        if self.last_render_time == 0:
-            self.last_render_time = time.time()
-            return
+            self.post.apply(surface, target, rect, distort=not self.crt_suspended)
+        except Exception as e:
+            # If CRT effect fails, leave the frame undistorted from now on
+            print(f"[CRT] Disabled: {e}")
+            self.crt_enabled = False
+            self.post.crt = None
+            self.post.apply(surface, target, None if self.rescale else rect)
+            self.invalidate()
+
+    def to_logical(self, pos):
+        """Map a display position (mouse, touch) to UI coordinates."""
+        if not self.rescale:
+            return pos
+        return self.crt.to_source(pos)
+
+    def to_logical_rel(self, pos, rel):
+        """Map a motion delta ending at display position pos to UI coordinates."""
+        if not self.rescale:
+            return rel
+        x, y = self.to_logical(pos)
+        x0, y0 = self.to_logical((pos[0] - rel[0], pos[1] - rel[1]))
+        return (x - x0, y - y0)
+
+    def render(self, alpha=1.0):
+        """Draw a frame alpha (0..1) of the way from the previous update step to the latest."""
+        if self.dirty_rects:
+            self._render_dirty(alpha)
         else:
-            interval = time.time() - self.last_render_time
-            self.last_render_time = time.time()
+            self._render_full(alpha)
+
+    def _render_full(self, alpha):
+        """Redraw everything and flip the whole screen."""
+        profiler = self.profiler
         # Fill with black background
         self.screen.fill((0, 0, 0))
         # Draw content first (modules)
         for group in self.groups:
-            group.render(interval)
+            group.render(alpha)
+            profiler.lap('render')
             group.draw(self.screen)
+            profiler.lap('draw')
             # Draw module's footer if it has one
             if hasattr(group, 'footer'):
                 self.screen.blit(group.footer.image, group.footer.rect)
-        # Draw scanlines overlay LAST (on top with additive blend)
-        self.root_children.render(interval)
-        for sprite in self.root_children:
+                profiler.lap('footer')
+        self.root_children.render(alpha)
+        self.overlays.render(alpha)
+        profiler.lap('render')
+        for sprite in self.root_children.sprites():
             self.screen.blit(sprite.image, sprite.rect, special_flags=pygame.BLEND_RGBA_ADD)
+        profiler.lap('draw')
 
-        # Apply CRT barrel distortion effect
-        if self.crt_enabled:
-            distorted = self.apply_crt_effect(self.screen)
-            self.screen.blit(distorted, (0, 0))
+        # Scanlines and CRT barrel distortion (and scaling), LAST
+        self.post_process(self.screen, self.display if self.rescale else None)
+        profiler.lap('post')
 
+        profiler.draw_hud(self.display)
         pygame.display.flip()
-        return interval
+        profiler.lap('flip')
+
+    def _render_dirty(self, alpha):
+        """Redraw only what changed and push just those regions to the display."""
+        profiler = self.profiler
+        canvas = self.canvas
+        rects = []
+        if self._needs_full_redraw:
+            self._needs_full_redraw = False
+            canvas.fill((0, 0, 0))
+            for group in self.groups + [self.root_children]:
+                group.repaint()
+            rects.append(canvas.get_rect())
+
+        for group in self.groups:
+            group.render(alpha)
+            profiler.lap('render')
+            rects.extend(group.draw(canvas, self.blank))
+            profiler.lap('draw')
+        self.root_children.render(alpha)
+        profiler.lap('render')
+        rects.extend(self.root_children.draw(canvas, self.blank))
+        profiler.lap('draw')
+
+        # A scrolling overlay touches every row
+        self.overlays.render(alpha)
+        profiler.lap('render')
+        if any(overlay.dirty for overlay in self.overlays):
+            for overlay in self.overlays:
+                overlay.dirty = 0
+            rects = [canvas.get_rect()]
+
+        rects = merge_rects(rects, canvas.get_rect())
+        if not rects and not profiler.hud:
+            return
 
-    def update(self):
-        self.root_children.update()
+        display = self.display
+        if self.post.crt is not None and not self.crt_suspended:
+            # Output regions are the source regions mapped through the remap
+            rects = merge_rects([self.post.crt.map_rect(rect) for rect in rects], display.get_rect())
+        elif self.rescale and rects:
+            # pygame scaling fallback: only whole frames
+            rects = [display.get_rect()]
+        # Canvas + scanlines (+ CRT) straight onto the display, region by region
+        for rect in rects:
+            self.post_process(canvas, display, rect)
+        profiler.lap('post')
+
+        hud_rect = profiler.draw_hud(display)
+        if hud_rect:
+            rects.append(hud_rect)
+        pygame.display.update(rects)
+        profiler.lap('flip')
+
+    def toggle_profiler_hud(self):
+        if not self.profiler.toggle_hud():
+            # Nothing else repaints the area the HUD covered
+            self.invalidate()
+
+    def is_animating(self, overlays=True):
+        """True while anything on screen changes without user input."""
+        groups = self.groups + [self.root_children]
+        if overlays:
+            groups.append(self.overlays)
+        for group in groups:
+            if group.is_animating():
+                return True
+        return False
+
+    def set_deep_idle(self, idle):
+        """Stop (or restart) scanline scrolling and the CRT pass."""
+        for overlay in self.overlays:
+            overlay.scrolling = not idle and getattr(config, 'SCANLINES_SCROLL', True)
+        # A scaled display still needs the remap; only the distortion is optional
+        self.crt_suspended = idle and not self.rescale
+        self.invalidate()
+
+    def invalidate(self):
+        """Force the next dirty-rect frame to redraw and push the whole screen."""
+        if self.dirty_rects:
+            self._needs_full_redraw = True
+
+    def update(self, dt):
+        """Advance everything by one fixed step of dt seconds."""
+        self.root_children.update(dt)
+        self.overlays.update(dt)
         for group in self.groups:
-            group.update()
+            group.update(dt)
 
     def add(self, group):
         if group not in self.groups:
             self.groups.append(group)
+            self.invalidate()
 
     def remove(self, group):
         if group in self.groups:
             self.groups.remove(group)
+            self.invalidate()
+
+
+def merge_rects(rects, bounds):
+    """Clip rects to bounds and union any that overlap."""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect).clip(bounds)
+        if not rect.width or not rect.height:
+            continue
+        i = rect.collidelist(merged)
+        while i > -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
 
 
 class EntityGroup(pygame.sprite.LayeredDirty):
-    def render(self, interval):
+
+    # Set by the Engine: when False every draw is a full redraw
+    dirty_rects = False
+
+    def render(self, alpha):
         for entity in self:
-            entity.render(interval)
+            entity.render(alpha)
+
+    def draw(self, surface, bgsurf=None, special_flags=None):
+        """Draw sprites; returns the changed rects in dirty-rect mode."""
+        # LayeredDirty switches modes on its own timing heuristic; pin it
+        self._use_update = self.dirty_rects
+        return super(EntityGroup, self).draw(surface, bgsurf, special_flags)
+
+    def is_animating(self):
+        for entity in self:
+            if entity.is_animating():
+                return True
+        return False
+
+    def repaint(self):
+        """Mark every sprite dirty so the next draw redraws it."""
+        for entity in self:
+            if not entity.dirty:
+                entity.dirty = 1
 
     def move(self, x, y):
         for child in self:
@@ -164,11 +303,18 @@ class Entity(pygame.sprite.DirtySprite):
         self.image = self.image.convert()
         self.groups = pygame.sprite.LayeredDirty()
         self.layer = layer
-        self.dirty = 2
+        # Drawn once; entities set dirty = 1 again whenever their image changes
+        self.dirty = 1
         self.blendmode = 0  # Normal blending for content
 
-    def render(self, interval=0, *args, **kwargs):
+    def render(self, alpha=1.0, *args, **kwargs):
+        """Draw; alpha is how far real time is between the last update and the next."""
         pass
 
-    def update(self, *args, **kwargs):
+    def update(self, dt=0, *args, **kwargs):
+        """Advance one fixed step of dt seconds (animation state lives here)."""
         pass
+
+    def is_animating(self):
+        """Override in entities that change on their own (used by the frame governor)."""
+        return False
@@ -0,0 +1,381 @@
+"""
+CRT barrel distortion, output scaling and rotation.
+
+All of the per-pixel maths is done once, when the effect is created: every
+output pixel gets flat gather indices into the source surface plus 8-bit
+fixed-point bilinear weights. Scaling the logical frame to the display
+resolution and rotating it for sideways panels are folded into the same
+table, so a frame goes from logical to physical pixels in one gather. A
+frame is then four integer gathers (one in nearest mode) and a few
+multiply-adds on preallocated buffers, written straight into the target's
+pixel memory. An optional per-row additive table (the scanlines) is added
+with saturation in the same pass. On multi-core boards the output rows can
+be split into bands handled by a persistent thread pool (NumPy drops the
+GIL inside its gather and arithmetic loops).
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pygame
+
+
+class CRTDistortion(object):
+    """Precomputed barrel distortion (plus scale and rotation) remap for 32-bit surfaces."""
+
+    MODE_BILINEAR = 'bilinear'
+    MODE_NEAREST = 'nearest'
+
+    CACHE_FILE = 'crt.cache'
+    CACHE_VERSION = 2
+
+    # Weights are 8.8 fixed point: 256 == 1.0
+    FRACTION_BITS = 8
+
+    # Frames timed on each path before choosing between threads and one core
+    CALIBRATION_FRAMES = 10
+
+    ROTATIONS = (0, 90, 180, 270)
+
+    def __init__(self, width, height, strength, mode=MODE_BILINEAR, cache_file=CACHE_FILE, workers=1,
+                 output_size=None, rotation=0):
+        self.width = width      # Source (logical) size
+        self.height = height
+        self.output_width, self.output_height = output_size or (width, height)
+        self.rotation = rotation % 360
+        if self.rotation not in self.ROTATIONS:
+            raise ValueError(f"Output rotation must be one of {self.ROTATIONS}, not {rotation}")
+        self.strength = strength
+        self.mode = mode
+        self.cache_file = cache_file
+
+        self._pitch = None
+        if not self._load_lut():
+            self._build_lut()
+            self._save_lut()
+        self._alloc_buffers()
+        self._start_pool(workers if workers > 0 else (os.cpu_count() or 1))
+
+    def _build_lut(self):
+        """Compute source coordinates and fixed-point weights for every output pixel."""
+        width, height = self.width, self.height
+        oy, ox = np.mgrid[0:self.output_height, 0:self.output_width].astype(np.float32)
+
+        # Display pixel -> upright picture pixel -> logical pixel (centres line up)
+        a, b, span_a, span_b = self._unrotate(ox, oy)
+        x_coords = (a + 0.5) * (width / span_a) - 0.5
+        y_coords = (b + 0.5) * (height / span_b) - 0.5
+
+        cx, cy = width / 2, height / 2
+
+        # Normalize coordinates to -1 to 1
+        nx = (x_coords - cx) / cx
+        ny = (y_coords - cy) / cy
+
+        # Apply barrel distortion formula: r' = r * (1 + k * r^2)
+        factor = 1 + self.strength * (nx * nx + ny * ny)
+        src_x = nx * factor * cx + cx
+        src_y = ny * factor * cy + cy
+
+        # Pixels that sample outside the source are blacked out; samples
+        # within half a pixel of the edge are clamped onto it
+        inside = (src_x > -0.5) & (src_x < width - 0.5) & (src_y > -0.5) & (src_y < height - 0.5)
+        src_x = np.clip(src_x, 0, width - 1)
+        src_y = np.clip(src_y, 0, height - 1)
+
+        # Split into integer pixel and 8-bit fraction in one rounding step
+        one = 1 << self.FRACTION_BITS
+        qx = np.floor(src_x * one + 0.5).astype(np.int32)
+        qy = np.floor(src_y * one + 0.5).astype(np.int32)
+        self.x0 = np.clip(qx >> self.FRACTION_BITS, 0, width - 1).astype(np.int16)
+        self.y0 = np.clip(qy >> self.FRACTION_BITS, 0, height - 1).astype(np.int16)
+        self.fx = (qx & (one - 1)).astype(np.uint8)
+        self.fy = (qy & (one - 1)).astype(np.uint8)
+        self.inside = inside
+
+    def _unrotate(self, x, y):
+        """Display pixel -> pixel of the upright picture, plus the upright picture's size."""
+        w, h = self.output_width, self.output_height
+        if self.rotation == 90:
+            return y, w - 1 - x, h, w
+        if self.rotation == 180:
+            return w - 1 - x, h - 1 - y, w, h
+        if self.rotation == 270:
+            return h - 1 - y, x, h, w
+        return x, y, w, h
+
+    def _load_lut(self):
+        """Load a previously built LUT if it matches (sizes, strength, rotation)."""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return False
+        try:
+            with open(self.cache_file, 'rb') as f:
+                data = np.load(f)
+                key = tuple(data['key'])
+                if key != self._cache_key():
+                    return False
+                self.x0 = data['x0']
+                self.y0 = data['y0']
+                self.fx = data['fx']
+                self.fy = data['fy']
+                self.inside = data['inside']
+            return True
+        except Exception as e:
+            print(f"[CRT] Ignoring unreadable LUT cache: {e}")
+            return False
+
+    def _save_lut(self):
+        """Persist the LUT so the next start skips the float maths."""
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, 'wb') as f:
+                np.savez(f, key=np.array(self._cache_key()), x0=self.x0, y0=self.y0,
+                         fx=self.fx, fy=self.fy, inside=self.inside)
+        except Exception as e:
+            print(f"[CRT] LUT cache write error: {e}")
+
+    def _cache_key(self):
+        return (float(self.CACHE_VERSION), float(self.width), float(self.height), round(float(self.strength), 6),
+                float(self.output_width), float(self.output_height), float(self.rotation))
+
+    def _bind(self, pitch):
+        """Turn the LUT into flat indices for a surface with the given pitch (in pixels)."""
+        self._pitch = pitch
+        width, height = self.width, self.height
+        one = 1 << self.FRACTION_BITS
+
+        x0 = self.x0.astype(np.int32)
+        y0 = self.y0.astype(np.int32)
+        x1 = np.minimum(x0 + 1, width - 1)
+        y1 = np.minimum(y0 + 1, height - 1)
+        fx = self.fx.astype(np.int32)
+        fy = self.fy.astype(np.int32)
+        inside = self.inside
+
+        if self.mode == self.MODE_NEAREST:
+            xn = np.where(fx >= one // 2, x1, x0)
+            yn = np.where(fy >= one // 2, y1, y0)
+            self.idx = [np.where(inside, yn * pitch + xn, 0).astype(np.intp)]
+            self.weights = []
+        else:
+            self.idx = [
+                np.where(inside, y0 * pitch + x0, 0).astype(np.intp),
+                np.where(inside, y0 * pitch + x1, 0).astype(np.intp),
+                np.where(inside, y1 * pitch + x0, 0).astype(np.intp),
+                np.where(inside, y1 * pitch + x1, 0).astype(np.intp),
+            ]
+            half = one // 2
+            w10 = (fx * (one - fy) + half) >> self.FRACTION_BITS
+            w01 = ((one - fx) * fy + half) >> self.FRACTION_BITS
+            w11 = (fx * fy + half) >> self.FRACTION_BITS
+            w00 = np.clip(one - w10 - w01 - w11, 0, one)
+            # Zero weights black out pixels that sample outside the source
+            self.weights = [
+                np.where(inside, w, 0).astype(np.uint16)[:, :, np.newaxis]
+                for w in (w00, w10, w01, w11)
+            ]
+        # Source row each output pixel mostly samples, for per-row additive
+        # tables; outside pixels index the table's extra zero row
+        rows = np.where(fy >= one // 2, y1, y0)
+        self.rows = np.where(inside, rows, height).astype(np.intp)
+        self._outside_flat = ~inside.reshape(-1)
+
+    def _alloc_buffers(self):
+        """Preallocate every per-frame buffer so apply() never allocates."""
+        count = self.output_width * self.output_height
+        self._gather = np.empty(count, dtype=np.uint32)
+        self._gather8 = self._gather.view(np.uint8).reshape(count, 4)
+        self._acc = np.empty((count, 4), dtype=np.uint16)
+        self._term = np.empty((count, 4), dtype=np.uint16)
+        self._out = np.empty(count, dtype=np.uint32)
+        self._out8 = self._out.view(np.uint8).reshape(count, 4)
+        self._room8 = np.empty((count, 4), dtype=np.uint8)
+
+    def map_rect(self, rect):
+        """Return the output rect affected by a change to rect in the source.
+
+        Output pixels sample further out than themselves by a factor between
+        1 and 1 + 2k, so the affected area is bounded by dividing the source
+        edges (widened by the bilinear footprint) by both extremes. That
+        logical area is then scaled and rotated onto the display.
+        """
+        cx, cy = self.width / 2, self.height / 2
+        fmax = 1 + 2 * self.strength
+        left, right = rect.left - 1 - cx, rect.right - cx
+        top, bottom = rect.top - 1 - cy, rect.bottom - cy
+        x0 = int(np.floor(cx + min(left, left / fmax))) - 1
+        x1 = int(np.ceil(cx + max(right, right / fmax))) + 1
+        y0 = int(np.floor(cy + min(top, top / fmax))) - 1
+        y1 = int(np.ceil(cy + max(bottom, bottom / fmax))) + 1
+
+        # Logical -> upright picture, widened by one pixel when scaled
+        w, h = self.output_width, self.output_height
+        span_a, span_b = (h, w) if self.rotation in (90, 270) else (w, h)
+        if span_a != self.width or span_b != self.height:
+            x0 = int(np.floor(x0 * span_a / self.width)) - 1
+            x1 = int(np.ceil(x1 * span_a / self.width)) + 1
+            y0 = int(np.floor(y0 * span_b / self.height)) - 1
+            y1 = int(np.ceil(y1 * span_b / self.height)) + 1
+
+        # Upright picture -> display (inverse of _unrotate, on half-open spans)
+        if self.rotation == 90:
+            x0, x1, y0, y1 = w - y1, w - y0, x0, x1
+        elif self.rotation == 180:
+            x0, x1, y0, y1 = w - x1, w - x0, h - y1, h - y0
+        elif self.rotation == 270:
+            x0, x1, y0, y1 = y0, y1, h - x1, h - x0
+        return pygame.Rect(x0, y0, x1 - x0, y1 - y0).clip(0, 0, w, h)
+
+    def to_source(self, pos):
+        """Map a display position back to source pixels (scale and rotation; the barrel curve is ignored)."""
+        a, b, span_a, span_b = self._unrotate(pos[0], pos[1])
+        return (int((a + 0.5) * self.width / span_a), int((b + 0.5) * self.height / span_b))
+
+    def apply(self, surface, target=None, rect=None, row_add=None):
+        """Distort a 32-bit surface into target (in place when target is None and sizes match).
+
+        With rect (in output pixels), only that part of the output is
+        recomputed. row_add is an optional packed uint32 table of height + 1
+        entries (the last one zero) added with saturation to every source
+        row before it is sampled.
+        """
+        if target is None:
+            target = surface
+        if surface.get_bytesize() != 4 or target.get_bytesize() != 4:
+            raise ValueError("CRT effect needs 32-bit surfaces")
+        if target.get_size() != (self.output_width, self.output_height):
+            raise ValueError(f"CRT output is {self.output_width}x{self.output_height}, target is {target.get_size()}")
+        pitch = surface.get_pitch() // 4
+        if pitch != self._pitch:
+            self._bind(pitch)
+
+        full = rect is None or rect == (0, 0, self.output_width, self.output_height)
+        if full:
+            x0, y0, x1, y1 = 0, 0, self.output_width, self.output_height
+        else:
+            x0, y0, x1, y1 = rect.left, rect.top, rect.right, rect.bottom
+        count = (x1 - x0) * (y1 - y0)
+        if not count:
+            return
+
+        buffer = surface.get_buffer()
+        target_buffer = buffer if target is surface else target.get_buffer()
+        try:
+            pixels = np.frombuffer(buffer, dtype=np.uint32)
+            # All gathers finish before anything is written back, so reading
+            # and writing the same pixel memory is safe.
+            if full:
+                out = self._remap_frame(pixels, row_add)
+            else:
+                idx = [i[y0:y1, x0:x1].reshape(-1) for i in self.idx]
+                weights = [w[y0:y1, x0:x1].reshape(-1, 1) for w in self.weights]
+                outside = ~self.inside[y0:y1, x0:x1].reshape(-1)
+                rows = self.rows[y0:y1, x0:x1].reshape(-1) if row_add is not None else None
+                out = self._remap(pixels, idx, weights, outside, 0, count, row_add, rows)
+
+            rows = np.frombuffer(target_buffer, dtype=np.uint32).reshape(self.output_height, -1)
+            rows[y0:y1, x0:x1] = out.reshape(y1 - y0, x1 - x0)
+            del pixels, rows, out
+        finally:
+            del buffer, target_buffer
+
+    def _remap_frame(self, pixels, row_add=None):
+        """Remap the whole frame, split into row bands when that is faster."""
+        use_pool = self._pool is not None
+        if self._calibrating:
+            # Alternate between the two paths until both have enough samples
+            use_pool = len(self._trials[True]) <= len(self._trials[False])
+        start = time.perf_counter()
+
+        if use_pool:
+            futures = [self._pool.submit(self._remap_band, pixels, y0, y1, row_add) for y0, y1 in self._bands]
+            self.band_times = [future.result() for future in futures]
+        else:
+            self._remap_band(pixels, 0, self.output_height, row_add)
+
+        if self._calibrating:
+            self._trials[use_pool].append(time.perf_counter() - start)
+            self._finish_calibration()
+        return self._out
+
+    def _remap_band(self, pixels, y0, y1, row_add=None):
+        """Remap output rows y0..y1 into their slice of the shared buffers; returns seconds taken."""
+        start = time.perf_counter()
+        lo, hi = y0 * self.output_width, y1 * self.output_width
+        idx = [i.reshape(-1)[lo:hi] for i in self.idx]
+        weights = [w.reshape(-1, 1)[lo:hi] for w in self.weights]
+        rows = self.rows.reshape(-1)[lo:hi] if row_add is not None else None
+        self._remap(pixels, idx, weights, self._outside_flat[lo:hi], lo, hi, row_add, rows)
+        return time.perf_counter() - start
+
+    def _remap(self, pixels, idx, weights, outside, lo, hi, row_add=None, rows=None):
+        """Gather and blend output pixels lo..hi into the preallocated buffers."""
+        out = self._out[lo:hi]
+        gather, gather8 = self._gather[lo:hi], self._gather8[lo:hi]
+        if self.mode == self.MODE_NEAREST:
+            np.take(pixels, idx[0], out=out)
+            out[outside] = 0
+        else:
+            acc, term = self._acc[lo:hi], self._term[lo:hi]
+            for i, (index, weight) in enumerate(zip(idx, weights)):
+                np.take(pixels, index, out=gather)
+                if i == 0:
+                    np.multiply(gather8, weight, out=acc)
+                else:
+                    np.multiply(gather8, weight, out=term)
+                    np.add(acc, term, out=acc)
+            np.right_shift(acc, self.FRACTION_BITS, out=acc)
+            np.copyto(self._out8[lo:hi], acc, casting='unsafe')
+
+        if row_add is not None:
+            # out + add, saturating at 255 per channel: add at most the headroom
+            out8, room = self._out8[lo:hi], self._room8[lo:hi]
+            np.take(row_add, rows, out=gather)
+            np.subtract(255, out8, out=room)
+            np.minimum(room, gather8, out=room)
+            np.add(out8, room, out=out8)
+        return out
+
+    def _start_pool(self, workers):
+        """Start the persistent band workers and calibrate them against one thread."""
+        self.workers = workers
+        self.band_times = []
+        self._pool = None
+        self._calibrating = False
+        if workers <= 1:
+            return
+        step = -(-self.output_height // workers)
+        self._bands = [(y, min(y + step, self.output_height)) for y in range(0, self.output_height, step)]
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crt')
+        self._trials = {True: [], False: []}
+        self._calibrating = True
+
+    def _finish_calibration(self):
+        if min(len(self._trials[True]), len(self._trials[False])) < self.CALIBRATION_FRAMES:
+            return
+        self._calibrating = False
+        parallel = float(np.median(self._trials[True]))
+        single = float(np.median(self._trials[False]))
+        if parallel < single:
+            print(f"[CRT] {self.workers} workers: {parallel * 1000:.1f} ms vs {single * 1000:.1f} ms single-threaded")
+        else:
+            print(f"[CRT] {self.workers} workers slower ({parallel * 1000:.1f} ms vs {single * 1000:.1f} ms), using one thread")
+            self.close()
+
+    def parallel_stats(self):
+        """Worker count, calibration timings and the last frame's per-band times (ms)."""
+        return {
+            'workers': self.workers if self._pool else 1,
+            'calibrating': self._calibrating,
+            'parallel_ms': [round(t * 1000, 3) for t in self._trials[True]] if self.workers > 1 else [],
+            'single_ms': [round(t * 1000, 3) for t in self._trials[False]] if self.workers > 1 else [],
+            'band_ms': [round(t * 1000, 3) for t in self.band_times],
+        }
+
+    def close(self):
+        """Stop the band workers; the effect keeps working single-threaded."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
@@ -0,0 +1,140 @@
+"""
+Adaptive frame-rate governor.
+
+Runs at the full rate while something on screen is animating or the user is
+interacting, drops to a low idle rate when the picture is static, and after a
+long stretch without input enters a deep idle state in which the engine stops
+scanline scrolling and the CRT pass. Any event wakes it immediately.
+tick() blocks; tick_async() is the same wait for an engine running on an
+asyncio loop, which keeps running tasks while the frame waits.
+"""
+
+import asyncio
+import time
+import pygame
+import game.clock
+
+
+class FrameGovernor(object):
+
+    MODE_ACTIVE = 'active'
+    MODE_IDLE = 'idle'
+    MODE_DEEP_IDLE = 'deep_idle'
+
+    def __init__(self, active_fps=30, idle_fps=4, deep_idle_fps=1,
+                 idle_after=2.0, deep_idle_after=0, on_deep_idle=None):
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps
+        self.deep_idle_fps = deep_idle_fps
+        self.idle_after = idle_after
+        self.deep_idle_after = deep_idle_after  # 0 disables deep idle
+        self.on_deep_idle = on_deep_idle
+
+        self.mode = self.MODE_ACTIVE
+        self.time_in_mode = {self.MODE_ACTIVE: 0.0, self.MODE_IDLE: 0.0, self.MODE_DEEP_IDLE: 0.0}
+        self.frames_in_mode = {self.MODE_ACTIVE: 0, self.MODE_IDLE: 0, self.MODE_DEEP_IDLE: 0}
+        self.last_input = game.clock.time()
+        self._last_tick = self.last_input
+
+    def wake(self):
+        """Record user input; leaves any idle mode straight away."""
+        self.last_input = game.clock.time()
+        if self.mode != self.MODE_ACTIVE:
+            self._set_mode(self.MODE_ACTIVE)
+
+    def tick(self, clock, animating=False, clock_visible=False, ambient=False):
+        """Wait out the rest of the frame at the rate the current state allows."""
+        now = game.clock.time()
+        self._set_mode(self._choose_mode(now, animating, ambient))
+
+        if self.mode == self.MODE_ACTIVE:
+            clock.tick(self.active_fps)
+        else:
+            self._wait(self._idle_timeout(now, clock_visible))
+            clock.tick()
+        self._count_frame()
+
+    async def tick_async(self, animating=False, clock_visible=False, ambient=False):
+        """tick() for a loop on asyncio: waits by awaiting, so other tasks run meanwhile."""
+        now = game.clock.time()
+        self._set_mode(self._choose_mode(now, animating, ambient))
+
+        if self.mode == self.MODE_ACTIVE:
+            # Always yield, even when the frame took its whole budget
+            await asyncio.sleep(max(0.0, 1.0 / self.active_fps - (now - self._last_tick)))
+        else:
+            await self._wait_async(self._idle_timeout(now, clock_visible))
+        self._count_frame()
+
+    def _idle_timeout(self, now, clock_visible):
+        fps = self.idle_fps if self.mode == self.MODE_IDLE else self.deep_idle_fps
+        timeout = 1.0 / fps
+        if clock_visible:
+            # Wake just after the next whole second so the clock stays exact
+            timeout = min(timeout, 1.0 - now % 1.0 + 0.01)
+        return timeout
+
+    def _count_frame(self):
+        # The whole frame (work plus wait) counts towards the mode it ran in
+        end = game.clock.time()
+        self.time_in_mode[self.mode] += end - self._last_tick
+        self.frames_in_mode[self.mode] += 1
+        self._last_tick = end
+
+    def _choose_mode(self, now, animating, ambient=False):
+        # ambient is what deep idle itself stops (scrolling scanlines), so it
+        # only holds off the plain idle mode
+        quiet = now - self.last_input
+        if animating:
+            return self.MODE_ACTIVE
+        if self.deep_idle_after and quiet >= self.deep_idle_after:
+            return self.MODE_DEEP_IDLE
+        if not ambient and quiet >= self.idle_after:
+            return self.MODE_IDLE
+        return self.MODE_ACTIVE
+
+    def _set_mode(self, mode):
+        if mode == self.mode:
+            return
+        was_deep = self.mode == self.MODE_DEEP_IDLE
+        self.mode = mode
+        is_deep = mode == self.MODE_DEEP_IDLE
+        if was_deep != is_deep and self.on_deep_idle:
+            self.on_deep_idle(is_deep)
+
+    def _wait(self, timeout):
+        """Sleep up to timeout seconds, returning early as soon as an event arrives."""
+        # Real time: this blocks on the actual event queue
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            event = pygame.event.wait(max(1, int(remaining * 1000)))
+            if event.type != pygame.NOEVENT:
+                # Queue was empty, so putting it back keeps event order intact
+                pygame.event.post(event)
+                return
+
+    async def _wait_async(self, timeout, poll=0.01):
+        """_wait without blocking the loop: checks the queue every poll seconds."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or pygame.event.peek():
+                return
+            await asyncio.sleep(min(remaining, poll))
+
+    def stats(self):
+        """Seconds and frames spent in each mode so far."""
+        return {
+            mode: {'seconds': round(self.time_in_mode[mode], 3), 'frames': self.frames_in_mode[mode]}
+            for mode in self.time_in_mode
+        }
+
+    def report(self):
+        total = sum(self.time_in_mode.values()) or 1.0
+        parts = []
+        for mode, seconds in self.time_in_mode.items():
+            parts.append(f"{mode} {seconds:.1f}s ({100.0 * seconds / total:.0f}%, {self.frames_in_mode[mode]} frames)")
+        return "[Governor] " + ", ".join(parts)
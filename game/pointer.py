@@ -0,0 +1,58 @@
+"""
+Pointer gesture state.
+
+A fast drag on a touchscreen delivers many motion events per frame, and
+each pan of a zoomed map rescales the whole map surface. Motion is therefore
+only accumulated here as events arrive; the engine asks for it once per
+frame (take_drag) and applies a single pan. Press/release and whether the
+press started somewhere draggable are tracked here too, so handlers don't
+each keep their own dragging flags.
+"""
+
+
+class PointerInput(object):
+
+    def __init__(self):
+        self.down = False
+        self.captured = False       # Press landed on something that takes drags
+        self.pos = (0, 0)           # Latest display position
+        self._dx = 0.0              # Motion not yet applied, in display pixels
+        self._dy = 0.0
+        self.events = 0             # Motion events received while captured
+        self.pans = 0               # Drags handed out (at most one per frame)
+
+    def press(self, pos, captured=True):
+        self.down = True
+        self.captured = captured
+        self.pos = pos
+        self._dx = self._dy = 0.0
+
+    def motion(self, pos, rel):
+        """Record motion (display pixels, may be fractional); nothing is applied yet."""
+        self.pos = pos
+        if not (self.down and self.captured):
+            return
+        self.events += 1
+        self._dx += rel[0]
+        self._dy += rel[1]
+
+    def release(self, pos):
+        self.pos = pos
+        self.down = False
+        self.captured = False
+
+    def take_drag(self):
+        """The motion accumulated since the last call as (pos, whole-pixel rel), or None.
+
+        Sub-pixel remainders carry over, so slow finger drags still move.
+        """
+        dx, dy = int(self._dx), int(self._dy)
+        if not dx and not dy:
+            return None
+        self._dx -= dx
+        self._dy -= dy
+        self.pans += 1
+        return self.pos, (dx, dy)
+
+    def stats(self):
+        return {'motion_events': self.events, 'pans': self.pans}
@@ -0,0 +1,118 @@
+"""
+Post-processing pipeline.
+
+Additive layers (the scanlines) only vary per row, so each frame they are
+summed into one table of packed pixels, one entry per row. With the CRT
+effect on, the table is added with saturation inside the barrel remap, so
+the frame is read and written once. Without it, the table is expanded into
+a row surface (only when it changes) and added with a single blit.
+
+When the display differs from the logical UI size (OUTPUT_WIDTH/HEIGHT,
+OUTPUT_ROTATION), the remap also scales and rotates, so there is no separate
+transform pass.
+"""
+
+import sys
+import numpy as np
+import pygame
+import config
+
+
+def output_transform(width, height):
+    """Display size and clockwise rotation for a width x height UI, from config."""
+    rotation = getattr(config, 'OUTPUT_ROTATION', 0) % 360
+    upright = (height, width) if rotation in (90, 270) else (width, height)
+    size = (getattr(config, 'OUTPUT_WIDTH', upright[0]), getattr(config, 'OUTPUT_HEIGHT', upright[1]))
+    return size, rotation
+
+
+class PostProcess(object):
+
+    def __init__(self, width, height, layers=(), crt=None, rotation=0):
+        self.width = width
+        self.height = height
+        self.layers = layers    # Objects with add_to_rows(sums); may be a live sprite group
+        self.crt = crt          # Remap (distortion, scale, rotation), or None
+        self.rotation = rotation
+        self._output = None     # 32-bit staging surface for displays of other depths
+        self._sums = np.zeros((height, 3), dtype=np.uint16)
+        # One extra zero row: what pixels outside the CRT picture get
+        self._table8 = np.zeros((height + 1, 4), dtype=np.uint8)
+        self._table = self._table8.view(np.uint32).reshape(-1)
+        self._format = None
+        self._rows_surface = None   # Table expanded to full width, for the undistorted path
+        self._rows_table = None     # Table the row surface was built from
+
+    def _pack_rows(self, surface):
+        """Sum the layers per row and pack the totals in the surface's pixel format."""
+        if not self.layers:
+            return None
+        sums = self._sums
+        sums.fill(0)
+        for layer in self.layers:
+            layer.add_to_rows(sums)
+
+        shifts = surface.get_shifts()[:3]
+        if shifts != self._format:
+            self._format = shifts
+            self._table8.fill(0)
+        for channel, shift in enumerate(shifts):
+            byte = shift // 8 if sys.byteorder == 'little' else 3 - shift // 8
+            np.minimum(sums[:, channel], 255, out=self._table8[:self.height, byte], casting='unsafe')
+        return self._table
+
+    def apply(self, surface, target=None, rect=None, distort=True):
+        """Add the layers to surface and distort it into target (surface itself when None).
+
+        With rect, only that part of the output is updated. distort=False
+        skips the CRT remap (the layers are still added).
+        """
+        if self.crt is not None and distort:
+            table = self._pack_rows(surface)
+            if target is None or target.get_bytesize() == 4:
+                self.crt.apply(surface, target, rect, row_add=table)
+                return
+            # 16-bit panels: remap at 32 bits, then let SDL convert
+            if self._output is None:
+                self._output = pygame.Surface(target.get_size(), 0, 32)
+            self.crt.apply(surface, self._output, rect, row_add=table)
+            target.blit(self._output, rect or (0, 0), rect)
+            return
+
+        if target is not None and target.get_size() != surface.get_size():
+            self._apply_transformed(surface, target)
+            return
+        if target is not None and target is not surface:
+            target.blit(surface, rect or (0, 0), rect)
+            surface = target
+        rows = self._row_surface()
+        if rows is not None:
+            surface.blit(rows, rect or (0, 0), rect, special_flags=pygame.BLEND_RGB_ADD)
+
+    def _apply_transformed(self, surface, target):
+        """Without a remap: add the layers to a copy, then rotate and scale it with pygame."""
+        frame = surface.copy()
+        rows = self._row_surface()
+        if rows is not None:
+            frame.blit(rows, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+        if self.rotation:
+            frame = pygame.transform.rotate(frame, -self.rotation)
+        target.blit(pygame.transform.scale(frame, target.get_size()), (0, 0))
+
+    def _row_surface(self):
+        """Full-size surface holding this frame's row colours, rebuilt only when they change."""
+        if self._rows_surface is None:
+            self._rows_surface = pygame.Surface((self.width, self.height), 0, 32)
+        table = self._pack_rows(self._rows_surface)
+        if table is None:
+            return None
+        if self._rows_table is None or not np.array_equal(table, self._rows_table):
+            self._rows_table = table.copy()
+            buffer = self._rows_surface.get_buffer()
+            try:
+                pixels = np.frombuffer(buffer, dtype=np.uint32).reshape(self.height, -1)
+                pixels[:, :self.width] = table[:self.height, np.newaxis]
+                del pixels
+            finally:
+                del buffer
+        return self._rows_surface
@@ -0,0 +1,114 @@
+"""
+Per-stage frame profiler.
+
+Call frame_start() at the top of the loop, lap(stage) after each stage and
+frame_end() at the bottom. Each lap charges the time since the previous one
+to that stage; the last PROFILER_FRAMES frames are kept in fixed-size ring
+buffers. When disabled every call returns straight away.
+"""
+
+import time
+import datetime
+import numpy as np
+import pygame
+import config
+
+
+class FrameProfiler(object):
+
+    # Stages that are not part of the frame's own work
+    IDLE_STAGES = ('wait',)
+
+    def __init__(self, enabled=False, size=600, hud=False):
+        self.enabled = enabled or hud
+        self.hud = hud
+        self.size = size
+        self.stages = []        # Stage names in first-seen order
+        self._samples = {}      # stage -> ring buffer of milliseconds
+        self._frame = {}
+        self._index = 0
+        self._count = 0
+        self._last = 0.0
+        self._hud_surface = None
+
+    def frame_start(self):
+        if not self.enabled:
+            return
+        self._frame = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        """Charge the time since the previous lap to stage."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._frame[stage] = self._frame.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def frame_end(self):
+        if not self.enabled or not self._frame:
+            return
+        frame = self._frame
+        frame['total'] = sum(seconds for stage, seconds in frame.items() if stage not in self.IDLE_STAGES)
+        for stage in frame:
+            if stage not in self._samples:
+                self.stages.append(stage)
+                self._samples[stage] = np.zeros(self.size, dtype=np.float32)
+        i = self._index
+        for stage in self.stages:
+            self._samples[stage][i] = frame.get(stage, 0.0) * 1000.0
+        self._index = (i + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+        self._frame = {}
+
+    def percentiles(self):
+        """{stage: (p50, p95, p99)} in milliseconds over the buffered frames."""
+        if not self._count:
+            return {}
+        result = {}
+        for stage in self.stages:
+            p50, p95, p99 = np.percentile(self._samples[stage][:self._count], (50, 95, 99))
+            result[stage] = (float(p50), float(p95), float(p99))
+        return result
+
+    def toggle_hud(self):
+        self.hud = not self.hud
+        if self.hud:
+            self.enabled = True
+        return self.hud
+
+    def draw_hud(self, surface):
+        """Draw the stage table onto surface (after post-processing); returns the rect drawn."""
+        if not self.hud:
+            return None
+        font = config.FONTS[10]
+        line_height = font.get_linesize()
+        rows = [" stage        p50    p95    p99"]
+        for stage, (p50, p95, p99) in self.percentiles().items():
+            rows.append(f" {stage:<10}{p50:7.2f}{p95:7.2f}{p99:7.2f}")
+        width = max(font.size(row)[0] for row in rows) + 6
+        size = (width, line_height * len(rows) + 4)
+        if self._hud_surface is None or self._hud_surface.get_size() != size:
+            self._hud_surface = pygame.Surface(size).convert()
+        self._hud_surface.fill((0, 0, 0))
+        for i, row in enumerate(rows):
+            text = font.render(row, False, (255, 255, 255), (0, 0, 0))
+            self._hud_surface.blit(text, (2, 2 + i * line_height))
+        rect = self._hud_surface.get_rect(topright=(surface.get_width() - 4, 44))
+        surface.blit(self._hud_surface, rect)
+        return rect
+
+    def dump_csv(self, filename=None):
+        """Write buffered frames (oldest first) to CSV; returns the filename or None."""
+        if not self._count:
+            return None
+        if filename is None:
+            filename = datetime.datetime.now().strftime("profile_%Y%m%d_%H%M%S.csv")
+        start = self._index - self._count
+        order = [(start + i) % self.size for i in range(self._count)]
+        with open(filename, "w") as f:
+            f.write("frame," + ",".join(f"{stage}_ms" for stage in self.stages) + "\n")
+            for n, i in enumerate(order):
+                f.write(f"{n}," + ",".join(f"{self._samples[stage][i]:.3f}" for stage in self.stages) + "\n")
+        print(f"[Profiler] Wrote {self._count} frames to {filename}")
+        return filename
@@ -0,0 +1,175 @@
+"""
+Slow I/O as asyncio tasks.
+
+Network fetches, geocoding and cache file reads/writes run as coroutines on
+an asyncio loop instead of in ad-hoc threads. Blocking calls inside them
+(requests, file I/O, XML parsing) go through run_blocking() to a small
+thread pool. Every task can have a timeout and can be cancelled.
+
+Results never reach the UI from the loop. A finished task's callback is put
+on a thread-safe completion queue, and the engine runs those callbacks on
+the main thread with drain(), once per frame. Only the main thread draws on
+pygame surfaces.
+
+With ENGINE_ASYNCIO the engine loop itself runs on the asyncio loop
+(Pypboy.run_async) and attach()es it. Otherwise a daemon thread runs a loop
+of its own, started by the first submit().
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import queue
+import threading
+import config
+
+
+class Task(object):
+    """Handle for a submitted coroutine."""
+
+    def __init__(self, name, on_done, on_error):
+        self.name = name
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+        self.finished = False   # Its completion has been drained
+        self._future = None
+
+    def done(self):
+        return self.finished
+
+    def cancel(self):
+        """Stop the task; its callbacks won't run."""
+        self.cancelled = True
+        if self._future is not None:
+            self._future.cancel()
+
+
+class TaskRunner(object):
+
+    def __init__(self, workers=4):
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='io')
+        self._completions = queue.SimpleQueue()
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+    def attach(self, loop):
+        """Run tasks submitted from now on on loop (the engine's own, in asyncio mode)."""
+        loop.set_default_executor(self._executor)
+        with self._lock:
+            self._loop = loop
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop.set_default_executor(self._executor)
+                self._thread = threading.Thread(target=self._loop.run_forever, name='tasks', daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coroutine, on_done=None, on_error=None, timeout=None, name=None):
+        """Schedule coroutine; on_done(result) or on_error(exception) later runs in drain()."""
+        task = Task(name or coroutine.__qualname__, on_done, on_error)
+        self.submitted += 1
+        self._pending.add(task)
+        task._future = asyncio.run_coroutine_threadsafe(self._run(task, coroutine, timeout), self._get_loop())
+        return task
+
+    async def _run(self, task, coroutine, timeout):
+        result = error = None
+        try:
+            if timeout:
+                result = await asyncio.wait_for(coroutine, timeout)
+            else:
+                result = await coroutine
+        except asyncio.CancelledError:
+            task.cancelled = True
+        except Exception as e:
+            error = e
+        self._completions.put((task, result, error))
+
+    def drain(self):
+        """Run the callbacks of the tasks finished since the last call (main thread)."""
+        handled = 0
+        while True:
+            try:
+                task, result, error = self._completions.get_nowait()
+            except queue.Empty:
+                return handled
+            handled += 1
+            task.finished = True
+            self._pending.discard(task)
+            if task.cancelled:
+                self.cancelled += 1
+            elif error is not None:
+                self.failed += 1
+                if isinstance(error, asyncio.TimeoutError):
+                    self.timed_out += 1
+                    error = TimeoutError(f"{task.name} timed out")
+                if task.on_error:
+                    task.on_error(error)
+                else:
+                    print(f"[Tasks] {task.name} failed: {error!r}")
+            else:
+                self.completed += 1
+                if task.on_done:
+                    task.on_done(result)
+
+    def pending(self):
+        """Tasks whose completion hasn't been drained yet."""
+        return len(self._pending)
+
+    def shutdown(self, wait=False):
+        """Cancel everything still running and stop the background loop.
+
+        Blocking calls already on a pool thread can't be interrupted; with
+        wait, return only once they have finished (a tile write, say).
+        """
+        for task in list(self._pending):
+            task.cancel()
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(1.0)
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'timed_out': self.timed_out,
+            'cancelled': self.cancelled,
+            'pending': self.pending(),
+        }
+
+    def report(self):
+        return "[Tasks] %(submitted)d submitted, %(completed)d completed, %(failed)d failed " \
+               "(%(timed_out)d timed out), %(cancelled)d cancelled, %(pending)d pending" % self.stats()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Await func(*args, **kwargs) run on the task pool (for blocking I/O and parsing)."""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+runner = TaskRunner(workers=getattr(config, 'TASK_WORKERS', 4))
+
+
+def submit(coroutine, on_done=None, on_error=None, timeout=None, name=None):
+    return runner.submit(coroutine, on_done, on_error, timeout, name)
+
+
+def drain():
+    return runner.drain()
+
+
+def attach(loop):
+    runner.attach(loop)
@@ -0,0 +1,87 @@
+"""
+Shared cache of rendered text.
+
+Labels, menu items and the boot text are rendered with the same strings over
+and over; FreeType rasterisation is one of the slower things the Pi does per
+redraw. render() keeps the finished surfaces, already converted to the
+display format, in a byte-bounded LRU keyed by everything that affects the
+pixels.
+
+Cached surfaces are shared: blit them, never draw on them. Like all drawing,
+render() is for the main thread only.
+"""
+
+from collections import OrderedDict
+import pygame
+import config
+
+
+class TextCache(object):
+
+    def __init__(self, max_bytes=2 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> surface, least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, text, size, colour, background=None, antialias=True):
+        """The text in config.FONTS[size], ready to blit."""
+        key = (text, size, tuple(colour), tuple(background) if background is not None else None, antialias)
+        surface = self._entries.get(key)
+        if surface is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+
+        surface = _display_format(config.FONTS[size].render(text, antialias, colour, background))
+        cost = surface.get_pitch() * surface.get_height()
+        if cost > self.max_bytes:
+            return surface
+        self._entries[key] = surface
+        self.bytes += cost
+        while self.bytes > self.max_bytes:
+            self._evict()
+        return surface
+
+    def _evict(self):
+        key, surface = self._entries.popitem(last=False)
+        self.bytes -= surface.get_pitch() * surface.get_height()
+        self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return (f"[TextCache] {self.hits}/{lookups} hits ({rate:.0f}%), {self.evictions} evictions, "
+                f"{len(self._entries)} entries, {self.bytes / 1024.0:.0f}KB")
+
+
+def _display_format(surface):
+    """Convert to the display's pixel format once, so every later blit is a plain copy."""
+    if pygame.display.get_surface() is None:
+        return surface
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert_alpha()
+    return surface.convert()
+
+
+cache = TextCache(getattr(config, 'TEXT_CACHE_BYTES', 2 * 1024 * 1024))
+
+
+def render(text, size, colour, background=None, antialias=True):
+    return cache.render(text, size, colour, background, antialias)
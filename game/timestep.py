@@ -0,0 +1,67 @@
+"""
+Fixed-timestep simulation clock.
+
+Animation state (scanline scroll, waveform time, boot text scroll) advances in
+update(dt) steps of exactly 1/rate seconds, however long frames take to draw.
+Each frame runs as many steps as the elapsed time calls for and then renders
+once, passing alpha (how far real time is into the next step, 0..1) so
+positions can be interpolated between the last two steps. A slow frame
+therefore costs rendered frames, not simulation speed.
+
+At most max_steps run per frame; time beyond that is dropped, so one very
+long stall (loading, a swap storm) can't snowball into ever longer catch-ups.
+"""
+
+import game.clock
+
+
+class FixedTimestep(object):
+
+    def __init__(self, rate=60, max_steps=5):
+        self.dt = 1.0 / rate
+        self.max_steps = max_steps
+        self.alpha = 0.0
+        self._accumulator = 0.0
+        self._last = None
+        self.frames = 0
+        self.updates = 0
+        self.most_steps = 0         # Most steps run in one frame
+        self.capped_frames = 0      # Frames that hit max_steps
+        self.dropped = 0.0          # Seconds given up at the max_steps cap
+
+    def advance(self):
+        """Take the time since the last call; returns how many steps are due now."""
+        now = game.clock.time()
+        if self._last is None:
+            self._last = now
+        self._accumulator += max(0.0, now - self._last)
+        self._last = now
+        due = int(self._accumulator / self.dt + 1e-3)   # Tolerate float error on exact multiples
+        self._accumulator = max(0.0, self._accumulator - due * self.dt)
+        self.alpha = min(1.0, self._accumulator / self.dt)
+        steps = min(due, self.max_steps)
+        self.dropped += (due - steps) * self.dt
+        self.frames += 1
+        self.updates += steps
+        self.most_steps = max(self.most_steps, steps)
+        if due > self.max_steps:
+            self.capped_frames += 1
+        return steps
+
+    def resync(self):
+        """Don't count the time since the last advance() (an idle wait with nothing animating)."""
+        self._last = game.clock.time()
+
+    def stats(self):
+        return {
+            'rate': round(1.0 / self.dt, 3),
+            'frames': self.frames,
+            'updates': self.updates,
+            'most_steps': self.most_steps,
+            'capped_frames': self.capped_frames,
+            'dropped_seconds': round(self.dropped, 3),
+        }
+
+    def report(self):
+        return "[Timestep] %(updates)d updates at %(rate)gHz over %(frames)d frames " \
+               "(at most %(most_steps)d per frame), %(capped_frames)d capped, %(dropped_seconds).1fs dropped" % self.stats()
@@ -1,32 +1,99 @@
-from gpiozero import Button
-from time import sleep
-
-button4 = Button(4)# used Stats
-button17 = Button(17) #used Items
-button18 = Button(18)
-button27 = Button(27) #used MAP
-button22 = Button(22)
-#button23 = Button(23) Reboots system if called pin 16
-#button24 = Button(24) No edge detection pin 18
-button25 = Button(25)
-while True:
-    
-    if button4.is_pressed:
-        print("4 Pressed pin7")
-    elif button17.is_pressed:
-        print("17 Pressed pin 11")
-    elif button18.is_pressed:
-        print("18 Pressed pin 12")
-    elif button27.is_pressed:
-        print("27 Pressed pin 13")
-    elif button22.is_pressed:
-        print("22 Pressed pin 15")
-    #elif button23.is_pressed:
-    #    print("23 Pressed pin 16")
-    #elif button24.is_pressed:
-    #    print("24 Pressed pin 18")
-    elif button25.is_pressed:
-        print("25 Pressed pin 22")
+"""
+GPIO button diagnostics.
+
+Runs the same ButtonInput backend the Pip-Boy uses and prints every press,
+hold, repeat and release it produces. For each event it shows the latency
+from the interrupt to the event being read off the pygame queue. On Ctrl-C
+it prints latency percentiles and, per pin, the raw edges, accepted
+transitions and contact bounces (with the longest bounce) so the debounce
+window can be tuned.
+
+    python gpio.py                  # pins from config.GPIO_ACTIONS
+    python gpio.py -p 4 -p 17       # just these pins
+    python gpio.py --mock           # simulated bouncy presses, no hardware
+    python gpio.py -d 0.03          # try a 30ms debounce window
+"""
+
+import optparse
+import os
+import random
+import threading
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+
+import numpy as np
+import pygame
+import config
+import game.buttons
+
+
+def simulate(backend, pins, stop):
+    """Press random pins with realistic contact bounce until stop is set."""
+    while not stop.is_set():
+        pin = random.choice(pins)
+        backend.press(pin, bounces=random.randint(0, 4), bounce_interval=random.uniform(0.0002, 0.002))
+        time.sleep(random.choice((0.05, 0.2, 0.9)))
+        backend.release(pin, bounces=random.randint(0, 3), bounce_interval=random.uniform(0.0002, 0.002))
+        time.sleep(random.uniform(0.1, 0.5))
+
+
+def main():
+    parser = optparse.OptionParser(usage='python %prog [-p PIN ...] [--mock] [-d SECONDS]')
+    parser.add_option('-p', '--pin', action='append', type='int', dest='pins', help="BCM pin to watch (repeatable)")
+    parser.add_option('--mock', action='store_true', default=False, help="Simulated presses instead of RPi.GPIO")
+    parser.add_option('-d', '--debounce', type='float', default=getattr(config, 'GPIO_DEBOUNCE', 0.02))
+    options, args = parser.parse_args()
+
+    actions = dict(config.GPIO_ACTIONS)
+    if options.pins:
+        actions = {pin: actions.get(pin, 'pin_%d' % pin) for pin in options.pins}
+
+    pygame.display.init()
+    if options.mock:
+        backend = game.buttons.MockBackend()
     else:
-        print("Released")
-    sleep(1)
+        import RPi.GPIO as GPIO
+        GPIO.setmode(GPIO.BCM)
+        backend = game.buttons.RPiGPIOBackend()
+    buttons = game.buttons.ButtonInput(
+        actions, backend,
+        debounce=options.debounce,
+        hold_after=getattr(config, 'GPIO_HOLD_AFTER', 0.6),
+        repeat_every=getattr(config, 'GPIO_REPEAT_EVERY', 0.15)
+    )
+    stop = threading.Event()
+    if options.mock:
+        threading.Thread(target=simulate, args=(backend, list(actions), stop), daemon=True).start()
+
+    print("Watching pins %s (debounce %.0fms), Ctrl-C for the summary" % (
+        ", ".join(str(pin) for pin in actions), options.debounce * 1000))
+    latencies = []
+    try:
+        while True:
+            event = pygame.event.wait()
+            if event.type != config.EVENTS['BUTTON']:
+                continue
+            latency = (time.monotonic() - event.time) * 1000
+            latencies.append(latency)
+            print("%-8s pin %-3d %-14s latency %6.2fms%s" % (
+                event.kind, event.pin, event.action, latency,
+                "  held %.0fms" % (event.duration * 1000) if event.duration else ""))
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    buttons.close()
+
+    print()
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+        print("Latency over %d events: p50 %.2fms, p95 %.2fms, p99 %.2fms, max %.2fms" % (
+            len(latencies), p50, p95, p99, max(latencies)))
+    for pin, stats in buttons.stats().items():
+        print("Pin %-3d %4d edges, %4d transitions, %4d bounces (longest %.2fms)" % (
+            pin, stats['edges'], stats['transitions'], stats['bounces'], stats['bounce_span_ms']))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,7 @@
-import pygame
 import optparse
 import os
 import sys
-import config
-from platform_detect import PLATFORM
+import startup
 
 parser = optparse.OptionParser(
     usage='python %prog -c True\nor:\npython %prog -c True',
@@ -13,11 +11,24 @@ parser = optparse.OptionParser(
 parser.add_option(
     '-c', '--cached-map',
     action="store_true",
-    help="Loads the cached map file stored in map.cache",
+    help="Loads the map from the tiles stored in map_tiles/",
     dest="load_cached",
     default=False
 )
+parser.add_option(
+    '--startup-report',
+    action="store_true",
+    help="Print what each import, asset and startup phase cost before the first frame",
+    dest="startup_report",
+    default=False
+)
 options, args = parser.parse_args()
+if options.startup_report:
+    startup.enable()
+
+import pygame
+import config
+from platform_detect import PLATFORM
 
 # Detect platform and GPIO availability
 PLATFORM.detect_gpio()
@@ -35,26 +46,30 @@ if config.GPIO_AVAILABLE:
     os.putenv('SDL_MOUSEDEV', config.TOUCH_DEVICE)
 
 from pypboy.core import Pypboy
+from game.postprocess import output_transform
 
 # Initialize sound
-try:
-    pygame.mixer.init(44100, -16, 2, 2048)
-    config.SOUND_ENABLED = True
-except Exception:
-    config.SOUND_ENABLED = False
+with startup.timed('phase', 'mixer init'):
+    try:
+        pygame.mixer.init(44100, -16, 2, 2048)
+        config.SOUND_ENABLED = True
+    except Exception:
+        config.SOUND_ENABLED = False
 
 if __name__ == "__main__":
     # Run boot sequence before main interface
     if config.BOOT_SEQUENCE_ENABLED:
-        pygame.init()
-        screen = pygame.display.set_mode((config.WIDTH, config.HEIGHT))
-        pygame.display.set_caption('PIP-OS V7.1.0.8')
-        pygame.mouse.set_visible(config.SHOW_CURSOR)
+        with startup.timed('phase', 'boot sequence setup'):
+            pygame.init()
+            screen = pygame.display.set_mode(output_transform(config.WIDTH, config.HEIGHT)[0])
+            pygame.display.set_caption('PIP-OS V7.1.0.8')
+            pygame.mouse.set_visible(config.SHOW_CURSOR)
 
-        from pypboy.boot import BootSequence
-        boot = BootSequence(screen)
+            from pypboy.boot import BootSequence
+            boot = BootSequence(screen)
         boot.run()
 
-    boy = Pypboy('Pip-Boy 3000', config.WIDTH, config.HEIGHT)
+    with startup.timed('phase', 'Pypboy()'):
+        boy = Pypboy('Pip-Boy 3000', config.WIDTH, config.HEIGHT)
     print("RUN")
     boy.run()
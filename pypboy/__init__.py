@@ -1,6 +1,7 @@
 import pygame
 import game
 import config
+import startup
 import pypboy.ui
 from enum import Enum
 
@@ -16,10 +17,17 @@ class GameState(Enum):
 
 class BaseModule(game.EntityGroup):
 
+    # Submodule classes, in footer order; each is built on first use
     submodules = []
 
     def __init__(self, boy, *args, **kwargs):
         super(BaseModule, self).__init__()
+        self._built = {}    # index -> submodule instance
+        # No tab is active until the module is first shown (see
+        # Pypboy.switch_module): building it ahead of time must not resume
+        # a tab, which writes the header and plays its sound
+        self.active = None
+        self.active_index = 0
 
         #if config.GPIO_AVAILABLE:
             #GPIO.setup(self.GPIO_LED_ID, GPIO.OUT)
@@ -36,8 +44,6 @@ class BaseModule(game.EntityGroup):
         self.footer.position = (0, config.HEIGHT - 53) #80
         self.add(self.footer)
 
-        self.switch_submodule(0)
-
         self.action_handlers = {
             "pause": self.handle_pause,
             "resume": self.handle_resume
@@ -47,37 +53,60 @@ class BaseModule(game.EntityGroup):
 
     def move(self, x, y):
         super(BaseModule, self).move(x, y)
-        if hasattr(self, 'active'):
+        if hasattr(self, 'active') and self.active:
             self.active.move(x, y)
 
-    def switch_submodule(self, module):
+    def submodule(self, index):
+        """The submodule at index, built the first time it is asked for."""
+        if index not in self._built:
+            cls = self.submodules[index]
+            with startup.timed('submodule', f"{self.label}/{cls.label}"):
+                self._built[index] = cls(self)
+        return self._built[index]
+
+    def is_built(self, index):
+        return index in self._built
+
+    def built_submodules(self):
+        return [self._built[index] for index in sorted(self._built)]
+
+    def switch_submodule(self, module, resume=True):
         print("Changing submodules")
         if hasattr(self, 'active') and self.active:
             self.active.handle_action("pause")
             self.remove(self.active)
         if len(self.submodules) > module:
-            self.active = self.submodules[module]
+            self.active = self.submodule(module)
+            self.active_index = module
             self.active.parent = self
-            self.active.handle_action("resume")
+            if resume:
+                self.active.handle_action("resume")
             self.footer.select(self.footer.menu[module])
             self.add(self.active)
         else:
             print("No submodule at %d" % module)
 
-    def update(self):
+    def update(self, dt):
+        # The active submodule's sprites are in this group too (see
+        # switch_submodule): each is updated once, through the submodule
+        active = self.active if hasattr(self, 'active') and self.active else None
+        if active:
+            active.update(dt)
+        for sprite in self.sprites():
+            if active is None or not active.has(sprite):
+                sprite.update(dt)
+
+    def render(self, alpha):
         if hasattr(self, 'active') and self.active:
-            self.active.update()
-        super(BaseModule, self).update()
-
-    def render(self, interval):
-        self.active.render(interval)
-        super(BaseModule, self).render(interval)
+            self.active.render(alpha)
+        super(BaseModule, self).render(alpha)
 
-    def draw(self, surface):
+    def draw(self, surface, bgsurf=None, special_flags=None):
         """Draw submodule first, then this module's sprites (footer)."""
+        rects = []
         if hasattr(self, 'active') and self.active:
-            self.active.draw(surface)
-        return super(BaseModule, self).draw(surface)
+            rects = self.active.draw(surface, bgsurf, special_flags)
+        return rects + super(BaseModule, self).draw(surface, bgsurf, special_flags)
 
     def handle_action(self, action, value=0):
         if action.startswith("knob_"):
@@ -135,10 +164,10 @@ class SubModule(game.EntityGroup):
         if config.SOUND_ENABLED:
             self.submodule_change_sfx = pygame.mixer.Sound('sounds/submodule_change.ogg')
 
-    def update(self):
+    def update(self, dt):
         """Propagate update to all child entities."""
         for sprite in self:
-            sprite.update()
+            sprite.update(dt)
 
     def handle_action(self, action, value=0):
         if action.startswith("dial_"):
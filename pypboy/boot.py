@@ -4,8 +4,13 @@ Authentic Fallout 4 style boot animation with typewriter effect and blinking cur
 """
 
 import pygame
-import time
 import config
+import game.clock
+import game.textcache
+import startup
+from game.crt import CRTDistortion
+from game.postprocess import PostProcess, output_transform
+from game.timestep import FixedTimestep
 from pypboy.ui import Scanlines
 
 
@@ -25,10 +30,15 @@ class BootSequence:
     ]
 
     def __init__(self, screen):
-        self.screen = screen
+        self.display = screen
         self.width = config.WIDTH
         self.height = config.HEIGHT
-        self.font = config.FONTS[14]
+        # Draw at the UI size; the post-process pass scales onto the display
+        output_size, rotation = output_transform(self.width, self.height)
+        self.rescale = output_size != (self.width, self.height) or rotation != 0
+        self.screen = pygame.Surface((self.width, self.height), 0, 32) if self.rescale else screen
+        self.font_size = 14
+        self.font = config.FONTS[self.font_size]
         self.color = (105, 255, 187)
         self.bg_color = (0, 0, 0)
 
@@ -49,6 +59,15 @@ class BootSequence:
             [(0, 3, 0, 0), (6, 18, 12, 20), (18, 36, 24, 28), (6, 18, 12, 20)] + [(0, 3, 0, 0) for x in range(50)],
             True
         )
+        scale = None
+        if self.rescale:
+            scale = CRTDistortion(
+                self.width, self.height, 0.0,
+                mode=getattr(config, 'OUTPUT_SCALE_MODE', CRTDistortion.MODE_BILINEAR),
+                cache_file=None, output_size=screen.get_size(), rotation=rotation
+            )
+        self.post = PostProcess(self.width, self.height, layers=[self.scanlines1, self.scanlines2],
+                                crt=scale, rotation=rotation)
 
         # State
         self.completed_lines = []      # Fully typed lines
@@ -56,6 +75,7 @@ class BootSequence:
         self.current_char_idx = 0      # Character position in current line
         self.cursor_visible = True
         self.scroll_offset = 0         # For scroll-up animation
+        self.previous_scroll_offset = 0
 
         # Phase: "initial_blink", "typing", "line_pause", "scroll", "done"
         self.phase = "initial_blink"
@@ -64,7 +84,10 @@ class BootSequence:
         # Timing
         self.last_char_time = 0
         self.last_blink_time = 0
-        self.last_render_time = 0
+        self.timestep = FixedTimestep(
+            rate=getattr(config, 'UPDATE_RATE', 60),
+            max_steps=getattr(config, 'MAX_UPDATES_PER_FRAME', 5)
+        )
         self.char_delay = config.BOOT_CHAR_DELAY
         self.blink_interval = config.BOOT_CURSOR_BLINK
         self.line_pause_blinks = config.BOOT_LINE_PAUSE_BLINKS
@@ -74,10 +97,9 @@ class BootSequence:
     def run(self):
         """Main boot sequence loop - blocks until complete"""
         clock = pygame.time.Clock()
-        current_time = time.time()
+        current_time = game.clock.time()
         self.last_blink_time = current_time
         self.last_char_time = current_time
-        self.last_render_time = current_time
 
         running = True
         while running and self.phase != "done":
@@ -92,27 +114,25 @@ class BootSequence:
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     return  # Skip on click
 
-            # Calculate interval for scanlines
-            current_time = time.time()
-            interval = current_time - self.last_render_time
-            self.last_render_time = current_time
-
-            # Update state
-            self.update()
-
-            # Update scanlines
-            self.scanlines1.render(interval)
-            self.scanlines2.render(interval)
-
-            # Render
-            self.render()
+            # Fixed-rate updates for the time elapsed, then one frame
+            for i in range(self.timestep.advance()):
+                self.update(self.timestep.dt)
+                self.scanlines1.update(self.timestep.dt)
+                self.scanlines2.update(self.timestep.dt)
+                if self.phase == "done":
+                    break
+            alpha = self.timestep.alpha
+            self.scanlines1.render(alpha)
+            self.scanlines2.render(alpha)
+            self.render(alpha)
             pygame.display.flip()
+            startup.first_frame()
 
             clock.tick(60)  # 60 FPS
 
-    def update(self):
-        """Update boot sequence state"""
-        current_time = time.time()
+    def update(self, dt):
+        """Update boot sequence state by one fixed step of dt seconds"""
+        current_time = game.clock.time()
 
         # Handle cursor blinking
         if current_time - self.last_blink_time >= self.blink_interval:
@@ -169,25 +189,27 @@ class BootSequence:
                     self.last_char_time = current_time
 
         elif self.phase == "scroll":
-            # Scroll all text upward
-            self.scroll_offset += self.scroll_speed / 60  # Assuming 60 FPS
+            # Scroll all text upward (scroll_speed is in pixels per second)
+            self.previous_scroll_offset = self.scroll_offset
+            self.scroll_offset += self.scroll_speed * dt
 
             # Check if all text scrolled off screen
             total_height = len(self.completed_lines) * self.line_height + self.start_y
             if self.scroll_offset >= total_height:
                 self.phase = "done"
 
-    def render(self):
-        """Render current boot state"""
+    def render(self, alpha=1.0):
+        """Render current boot state, alpha of the way into the next update step"""
         self.screen.fill(self.bg_color)
 
-        y = self.start_y - self.scroll_offset
+        scroll = self.previous_scroll_offset + (self.scroll_offset - self.previous_scroll_offset) * alpha
+        y = self.start_y - scroll
 
         # Render completed lines
         for line in self.completed_lines:
             if y > -self.line_height and y < self.height:
                 if line:  # Don't render empty lines
-                    text_surface = self.font.render(line, True, self.color)
+                    text_surface = game.textcache.render(line, self.font_size, self.color)
                     self.screen.blit(text_surface, (self.start_x, y))
             y += self.line_height
 
@@ -198,6 +220,7 @@ class BootSequence:
 
                 if y > -self.line_height and y < self.height:
                     # Render typed portion of current line
+                    # Each typed prefix is shown once: rendered directly, not through the text cache
                     if current_text:
                         text_surface = self.font.render(current_text, True, self.color)
                         self.screen.blit(text_surface, (self.start_x, y))
@@ -213,6 +236,5 @@ class BootSequence:
                         )
                         pygame.draw.rect(self.screen, self.color, cursor_rect)
 
-        # Render scanlines overlay on top (with additive blend)
-        self.screen.blit(self.scanlines1.image, self.scanlines1.rect, special_flags=pygame.BLEND_RGBA_ADD)
-        self.screen.blit(self.scanlines2.image, self.scanlines2.rect, special_flags=pygame.BLEND_RGBA_ADD)
+        # Add scanlines on top (same post-process pass as the main interface)
+        self.post.apply(self.screen, self.display if self.rescale else None)
@@ -0,0 +1,68 @@
+"""
+Vectorized line clipping.
+
+clip_segments() is Liang-Barsky over arrays of segments at once: each
+segment is parametrised as a + t * (b - a), and each of the rectangle's
+four edges either raises the t where it enters or lowers the t where it
+leaves. The segment is visible where the two don't cross.
+
+clip_polylines() clips CSR polylines (points back to back plus each
+line's start, as in MapGeometry) to a rectangle. A line leaving and
+re-entering the rectangle comes back as several pieces, each only the
+part inside it, so a renderer gets no coordinates far off its surface.
+"""
+
+import numpy as np
+
+
+def clip_segments(a, b, rect):
+    """Clip segments a[i] to b[i] ((n, 2) arrays) to rect (x0, y0, x1, y1).
+
+    Returns (t0, t1, visible): the visible part of segment i runs from
+    a + t0 * (b - a) to a + t1 * (b - a), where visible[i].
+    """
+    d = b - a
+    t0 = np.zeros(len(a))
+    t1 = np.ones(len(a))
+    outside = np.zeros(len(a), dtype=bool)
+    edges = ((-d[:, 0], a[:, 0] - rect[0]), (d[:, 0], rect[2] - a[:, 0]),
+             (-d[:, 1], a[:, 1] - rect[1]), (d[:, 1], rect[3] - a[:, 1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in edges:
+            # Parallel to this edge: all outside or all inside it
+            outside |= (p == 0) & (q < 0)
+            r = q / p
+            t0 = np.where(p < 0, np.maximum(t0, r), t0)
+            t1 = np.where(p > 0, np.minimum(t1, r), t1)
+    return t0, t1, ~outside & (t0 <= t1)
+
+
+def clip_polylines(xy, offsets, rect):
+    """The parts of polylines inside rect (x0, y0, x1, y1), as (xy, offsets) like the input.
+
+    Line i of the input is xy[offsets[i]:offsets[i + 1]]. Lines with
+    fewer than two points are dropped.
+    """
+    xy = np.asarray(xy, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lines = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    # Segment i runs from point i to point i + 1 of the same line
+    starts = np.flatnonzero(lines[:-1] == lines[1:])
+    a, b = xy[starts], xy[starts + 1]
+    t0, t1, visible = clip_segments(a, b, rect)
+    starts, a, b, t0, t1 = starts[visible], a[visible], b[visible], t0[visible], t1[visible]
+    if not len(starts):
+        return np.zeros((0, 2)), np.zeros(1, dtype=np.int64)
+
+    # A piece goes on through the next segment if that is the line's next
+    # one and neither was cut where they meet
+    joined = np.zeros(len(starts), dtype=bool)
+    joined[1:] = (starts[1:] == starts[:-1] + 1) & (t1[:-1] == 1.0) & (t0[1:] == 0.0)
+    # Each piece is its first segment's start, then every segment's end
+    ends = np.cumsum(np.where(joined, 1, 2)) - 1
+    out = np.empty((ends[-1] + 1, 2))
+    out[ends] = a + t1[:, None] * (b - a)
+    first = ~joined
+    out[ends[first] - 1] = a[first] + t0[first, None] * (b[first] - a[first])
+    pieces = np.append(ends[first] - 1, len(out))
+    return out, pieces
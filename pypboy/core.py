@@ -1,79 +1,154 @@
+import asyncio
+import time
 import pygame
 import config
+import assets
+import startup
 import game
+import game.clock
+import game.buttons
+import game.pointer
+import game.tasks
+import game.textcache
 import pypboy.ui
+from game.governor import FrameGovernor
 
 from pypboy.modules import data
 from pypboy.modules import items
 from pypboy.modules import stats
 
-if config.GPIO_AVAILABLE:
-    import RPi.GPIO as GPIO
-
 
 class Pypboy(game.core.Engine):
 
+    MODULES = {
+        "data": data.Module,
+        "items": items.Module,
+        "stats": stats.Module
+    }
+
     def __init__(self, *args, **kwargs):
-        if hasattr(config, 'OUTPUT_WIDTH') and hasattr(config, 'OUTPUT_HEIGHT'):
-            self.rescale = True
+        self._build_started = time.perf_counter()
         super(Pypboy, self).__init__(*args, **kwargs)
 
-        # Fetch area name from GPS coordinates
+        # In asyncio mode the frame loop and the I/O tasks share one loop
+        self.loop = None
+        if getattr(config, 'ENGINE_ASYNCIO', False):
+            self.loop = asyncio.new_event_loop()
+            game.tasks.attach(self.loop)
+
+        # Fetch area name from GPS coordinates (shown once it arrives)
         from pypboy.data import GeoLocation
         geo = GeoLocation()
         longitude, latitude = config.MAP_FOCUS
-        self.area_name = geo.get_area_name(longitude, latitude)
-        print(f"[Pypboy] Area: {self.area_name}")
+        self.area_name = GeoLocation.DEFAULT_AREA
+        game.tasks.submit(
+            geo.get_area_name_async(longitude, latitude), on_done=self.set_area_name,
+            timeout=getattr(config, 'GEOCODE_TIMEOUT', 10), name='geocode'
+        )
 
         self.init_children()
         self.init_modules()
         
-        self.gpio_actions = {}
+        # Drags are accumulated here and applied once per frame (see step)
+        self.pointer = game.pointer.PointerInput()
+
+        self.buttons = None
         if config.GPIO_AVAILABLE:
             self.init_gpio_controls()
 
+        self.governor = FrameGovernor(
+            active_fps=getattr(config, 'FRAME_RATE_ACTIVE', 30),
+            idle_fps=getattr(config, 'FRAME_RATE_IDLE', 4),
+            deep_idle_fps=getattr(config, 'FRAME_RATE_DEEP_IDLE', 1),
+            idle_after=getattr(config, 'IDLE_AFTER', 2.0),
+            deep_idle_after=getattr(config, 'DEEP_IDLE_AFTER', 0),
+            on_deep_idle=self.set_deep_idle
+        )
+
+    def set_area_name(self, area_name):
+        print(f"[Pypboy] Area: {area_name}")
+        if self.header.title == [self.area_name]:
+            self.header.title = [area_name]
+        self.area_name = area_name
+
     def init_children(self):
         self.background = pygame.image.load('images/overlay.png')
         # border = pypboy.ui.Border()
         # self.root_children.add(border)
         # More subtle scanlines - reduced alpha/RGB values
         scanlines = pypboy.ui.Scanlines(800, 480, 3, 1, [(0, 4, 1, 12), (2, 12, 6, 25), (0, 4, 1, 12)])
-        self.root_children.add(scanlines)
+        self.overlays.add(scanlines)
         scanlines2 = pypboy.ui.Scanlines(800, 480, 8, 40, [(0, 3, 0, 0), (6, 18, 12, 20), (18, 36, 24, 28), (6, 18, 12, 20)] + [(0, 3, 0, 0) for x in range(50)], True)
-        self.root_children.add(scanlines2)
+        self.overlays.add(scanlines2)
         self.header = pypboy.ui.Header()
         self.root_children.add(self.header)
 
     def init_modules(self):
-        self.modules = {
-            "data": data.Module(self),
-            "items": items.Module(self),
-            "stats": stats.Module(self)
-        }
-        for module in self.modules.values():
-            module.move(4, 40)
+        # Modules (and their submodules) are built on first use; idle frames
+        # build the likely next ones ahead of time
+        self.modules = assets.LazyRegistry('modules', self.MODULES, self._build_module, kind='module')
+        self.warmup_enabled = getattr(config, 'WARMUP_ENABLED', True)
+        self.warmup_after = getattr(config, 'WARMUP_AFTER', 1.0)
         self.switch_module("stats")
 
-    def init_gpio_controls(self):
-        for pin in config.GPIO_ACTIONS.keys():
-            print("Intialising pin %s as action '%s'" % (pin, config.GPIO_ACTIONS[pin]))
-            GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-            self.gpio_actions[pin] = config.GPIO_ACTIONS[pin]
-
-    def check_gpio_input(self):
-        for pin in self.gpio_actions.keys():
-            if GPIO.input(pin) == False:
-                self.handle_action(self.gpio_actions[pin])
+    def _build_module(self, name):
+        module = self.MODULES[name](self)
+        module.move(4, 40)
+        return module
 
-    def update(self):
+    def warmup_candidates(self):
+        """What to build ahead of time, most likely next first."""
         if hasattr(self, 'active'):
-            self.active.update()
-        super(Pypboy, self).update()
+            # Neighbouring tabs of the current module
+            index = self.active.active_index
+            for neighbour in (index + 1, index - 1):
+                if 0 <= neighbour < len(self.active.submodules):
+                    yield self.active, neighbour
+        # The other modules as they open, then everything else
+        for name in self.modules:
+            if name not in self.modules.loaded():
+                yield name, None
+        for module in self.modules.loaded().values():
+            for index in range(len(module.submodules)):
+                yield module, index
+
+    def warm_up(self):
+        """Build the first not-yet-built candidate; False when everything is built."""
+        for module, index in self.warmup_candidates():
+            if index is None:
+                self.modules[module]
+                return True
+            if not module.is_built(index):
+                module.submodule(index)
+                return True
+        return False
 
-    def render(self):
-        interval = super(Pypboy, self).render()
+    def init_gpio_controls(self):
+        for pin in config.GPIO_ACTIONS.keys():
+            print("Intialising pin %s as action '%s'" % (pin, config.GPIO_ACTIONS[pin]))
+        # Edges come in on interrupts and arrive here as BUTTON events
+        self.buttons = game.buttons.ButtonInput(
+            config.GPIO_ACTIONS, game.buttons.RPiGPIOBackend(),
+            debounce=getattr(config, 'GPIO_DEBOUNCE', 0.02),
+            hold_after=getattr(config, 'GPIO_HOLD_AFTER', 0.6),
+            repeat_every=getattr(config, 'GPIO_REPEAT_EVERY', 0.15)
+        )
+
+    def handle_button(self, event):
+        """One action per press; holds and repeats only where configured."""
+        if event.kind == game.buttons.PRESS:
+            self.handle_action(event.action)
+        elif event.kind == game.buttons.HOLD and event.pin in getattr(config, 'GPIO_HOLD_ACTIONS', {}):
+            self.handle_action(config.GPIO_HOLD_ACTIONS[event.pin])
+        elif event.kind in (game.buttons.HOLD, game.buttons.REPEAT):
+            if event.action in getattr(config, 'GPIO_REPEAT_ACTIONS', ()):
+                self.handle_action(event.action)
+
+    def render(self, alpha=1.0):
+        super(Pypboy, self).render(alpha)
         if hasattr(self, 'active'):
-            self.active.render(interval)
+            self.active.render(alpha)
+            self.profiler.lap('render')
 
     def switch_module(self, module):
         if module in self.modules:
@@ -82,6 +157,9 @@ class Pypboy(game.core.Engine):
                 self.remove(self.active)
             self.active = self.modules[module]
             self.active.parent = self
+            if not self.active.active:
+                # First time shown: pick its first tab, resumed with the module
+                self.active.switch_submodule(0, resume=False)
             self.active.handle_action("resume")
             self.add(self.active)
         else:
@@ -90,25 +168,34 @@ class Pypboy(game.core.Engine):
     def handle_action(self, action):
         if action.startswith('module_'):
             self.switch_module(action[7:])
+        elif action == 'profiler_hud':
+            self.toggle_profiler_hud()
+        elif action == 'profiler_dump':
+            self.profiler.dump_csv()
         else:
             if hasattr(self, 'active'):
                 self.active.handle_action(action)
 
     def handle_click(self, pos):
-        """Route click/tap to active module for screen interactions."""
+        """Route click/tap to active module for screen interactions.
+
+        Returns True if it landed in the content area (where drags go).
+        """
         x, y = pos
 
         # Ignore header region (y < 40)
         if y < 40:
-            return
+            return False
 
         # Ignore footer region (y > HEIGHT - 53) - tabs are button-controlled
         if y > config.HEIGHT - 53:
-            return
+            return False
 
         # Main content area - delegate to active module
         if hasattr(self, 'active') and self.active:
             self.active.handle_click(pos)
+            return True
+        return False
 
     def handle_click_release(self, pos):
         """Route click/tap release to active module."""
@@ -120,7 +207,38 @@ class Pypboy(game.core.Engine):
         if hasattr(self, 'active') and self.active:
             self.active.handle_drag(pos, rel)
 
+    def pointer_down(self, pos):
+        """Press at a display position."""
+        self.pointer.press(pos, self.handle_click(self.to_logical(pos)))
+
+    def pointer_up(self, pos):
+        """Release at a display position; pending motion is applied first."""
+        self.apply_drag()
+        self.pointer.release(pos)
+        self.handle_click_release(self.to_logical(pos))
+
+    def apply_drag(self):
+        """Pan once with everything the pointer moved since the last call."""
+        drag = self.pointer.take_drag()
+        if drag:
+            pos, rel = drag
+            self.handle_drag(self.to_logical(pos), self.to_logical_rel(pos, rel))
+
+    def finger_pos(self, event):
+        """Display pixel position of a normalized touch event."""
+        width, height = self.display.get_size()
+        return (min(int(event.x * width), width - 1), min(int(event.y * height), height - 1))
+
+    WAKE_EVENTS = (
+        pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+        pygame.MOUSEMOTION, pygame.FINGERDOWN, pygame.FINGERUP, pygame.FINGERMOTION,
+        config.EVENTS['SONG_END'], config.EVENTS['BUTTON']
+    )
+
     def handle_event(self, event):
+        if event.type in self.WAKE_EVENTS:
+            self.governor.wake()
+
         # Keyboard events - keep existing for module/submodule switching
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE:
@@ -129,10 +247,15 @@ class Pypboy(game.core.Engine):
                 if event.key in config.ACTIONS:
                     self.handle_action(config.ACTIONS[event.key])
 
-        # Mouse events for desktop interaction
+        # Mouse events for desktop interaction. SDL also synthesizes them
+        # from touches (event.touch); those arrive as finger events below.
+        elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION) and \
+                getattr(event, 'touch', False):
+            pass
+
         elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button == 1:  # Left click / touch
-                self.handle_click(event.pos)
+            if event.button == 1:  # Left click
+                self.pointer_down(event.pos)
             elif event.button == 4:  # Scroll up - navigate menu
                 self.handle_action("dial_up")
             elif event.button == 5:  # Scroll down - navigate menu
@@ -140,31 +263,27 @@ class Pypboy(game.core.Engine):
 
         elif event.type == pygame.MOUSEBUTTONUP:
             if event.button == 1:
-                self.handle_click_release(event.pos)
+                self.pointer_up(event.pos)
 
         elif event.type == pygame.MOUSEMOTION:
             if event.buttons[0]:  # Left button held - drag
-                self.handle_drag(event.pos, event.rel)
+                self.pointer.motion(event.pos, event.rel)
 
         # SDL2 Touch/Finger events (for Pi touchscreen)
         elif event.type == pygame.FINGERDOWN:
-            # Convert normalized coords (0.0-1.0) to pixels
-            x = int(event.x * config.WIDTH)
-            y = int(event.y * config.HEIGHT)
-            self.handle_click((x, y))
+            # Normalized coords (0.0-1.0) -> display pixels
+            self.pointer_down(self.finger_pos(event))
 
         elif event.type == pygame.FINGERUP:
-            x = int(event.x * config.WIDTH)
-            y = int(event.y * config.HEIGHT)
-            self.handle_click_release((x, y))
+            self.pointer_up(self.finger_pos(event))
 
         elif event.type == pygame.FINGERMOTION:
-            x = int(event.x * config.WIDTH)
-            y = int(event.y * config.HEIGHT)
-            # dx/dy are also normalized, convert to pixel delta
-            rel_x = int(event.dx * config.WIDTH)
-            rel_y = int(event.dy * config.HEIGHT)
-            self.handle_drag((x, y), (rel_x, rel_y))
+            # dx/dy are also normalized; fractions add up in the pointer
+            width, height = self.display.get_size()
+            self.pointer.motion(self.finger_pos(event), (event.dx * width, event.dy * height))
+
+        elif event.type == config.EVENTS['BUTTON']:
+            self.handle_button(event)
 
         elif event.type == pygame.QUIT:
             self.running = False
@@ -178,17 +297,92 @@ class Pypboy(game.core.Engine):
             if hasattr(self, 'active'):
                 self.active.handle_event(event)
 
+    def handle_events(self):
+        for event in pygame.event.get():
+            self.handle_event(event)
+        self.apply_drag()
+
+    def step(self):
+        """One frame without the wait: the update steps that are due, then one render.
+
+        Input is taken before every update step, so a frame that runs several
+        to catch up still sees events at the update rate, and always at least
+        once even when no step is due yet.
+        """
+        profiler = self.profiler
+        timestep = self.timestep
+        # Results of finished I/O tasks, applied here on the main thread
+        game.tasks.drain()
+        profiler.lap('tasks')
+        steps = timestep.advance()
+        for i in range(max(steps, 1)):
+            self.handle_events()
+            profiler.lap('events')
+            if i < steps:
+                self.update(timestep.dt)
+                profiler.lap('update')
+        self.render(timestep.alpha)
+
+    def begin_frame(self):
+        """Everything in a frame up to the wait."""
+        profiler = self.profiler
+        profiler.frame_start()
+        self.step()
+        startup.interactive_frame(self._build_started)
+        if self.warmup_enabled and game.clock.time() - self.governor.last_input >= self.warmup_after:
+            # Nobody is touching it: prepare what comes next, one piece per frame
+            self.warmup_enabled = self.warm_up()
+            profiler.lap('warmup')
+
+    def end_frame(self):
+        """After the governor's wait."""
+        if self.governor.mode != FrameGovernor.MODE_ACTIVE:
+            # Nothing was animating through that wait; don't replay it as updates
+            self.timestep.resync()
+        self.profiler.lap('wait')
+        self.profiler.frame_end()
+
     def run(self):
+        if self.loop is not None:
+            self.loop.run_until_complete(self.run_async())
+            # Let the tasks cancelled at shutdown unwind
+            remaining = asyncio.all_tasks(self.loop)
+            if remaining:
+                self.loop.run_until_complete(asyncio.wait(remaining, timeout=1.0))
+            self.loop.close()
+            return
         self.running = True
         clock = pygame.time.Clock()
         while self.running:
-            self.check_gpio_input()
-            for event in pygame.event.get():
-                self.handle_event(event)
-            self.update()
-            self.render()
-            clock.tick(30)  # Cap at 30 FPS to reduce CPU usage
-
+            self.begin_frame()
+            # Full rate while animating, throttled when the screen is static
+            self.governor.tick(clock, self.is_animating(False), self.header.show_date,
+                               self.overlays.is_animating())
+            self.end_frame()
+        self.shutdown()
+
+    async def run_async(self):
+        """run() as a coroutine: frames wait by awaiting, so I/O tasks run in between."""
+        self.running = True
+        while self.running:
+            self.begin_frame()
+            await self.governor.tick_async(self.is_animating(False), self.header.show_date,
+                                           self.overlays.is_animating())
+            self.end_frame()
+        self.shutdown()
+
+    def shutdown(self):
+        profiler = self.profiler
+        print(game.tasks.runner.report())
+        game.tasks.runner.shutdown()
+        print(self.governor.report())
+        print(self.timestep.report())
+        if self.buttons:
+            self.buttons.close()
+        print(game.textcache.cache.report())
+        print("[Pointer] %(motion_events)d motion events, %(pans)d pans" % self.pointer.stats())
+        if profiler.enabled:
+            profiler.dump_csv()
         try:
             pygame.mixer.quit()
         except:
@@ -1,28 +1,54 @@
-import xmltodict
-import requests
 import numpy
 from numpy.fft import fft
 from math import log10
 import math
 import pygame
-import sys
 import json
+import config
+from game.tasks import run_blocking
+from pypboy.geometry import MapGeometry, merge, parse_osm
+from pypboy.spatial import SpatialIndex
+from pypboy.lod import WayLevels
+from pypboy.clipping import clip_polylines
+import pypboy.fetch
+import pypboy.tiles
+
+
+class Area(object):
+    """A loaded geometry with its spatial index and way levels, built together off the main thread.
+
+    The async loads return one; Maps.apply() puts it in place on the main
+    thread, so drawing never sees a geometry without its index and levels.
+    """
+
+    def __init__(self, geometry, index, levels, bounds=None, tiles=()):
+        self.geometry = geometry
+        self.index = index
+        self.levels = levels
+        self.bounds = bounds    # For set_bounds; None keeps the mapper's
+        self.tiles = set(tiles)
 
 
 class Maps(object):
 
-    nodes = {}
-    ways = []
-    tags = []
     origin = None
     width = 0
     height = 0
 
     SIG_PLACES = 3
     GRID_SIZE = 0.001
+    URL = getattr(config, 'OSM_API_URL', "https://api.openstreetmap.org/api/0.6/map") + "?bbox=%f,%f,%f,%f"
 
     def __init__(self, *args, **kwargs):
         super(Maps, self).__init__(*args, **kwargs)
+        # Per instance: each fetch (and each progressive stage) has its own data
+        self.geometry = MapGeometry.empty()
+        self._index = None
+        self._levels = None
+        self.tiles = set()      # Tiles merged in by extend_area (or apply)
+        self.downloaded = 0     # Bytes of OSM data downloaded
+        self.timeout = getattr(config, 'MAP_FETCH_TIMEOUT', 20)
+        self.retries = getattr(config, 'MAP_FETCH_RETRIES', 3)
 
     def float_floor_to_precision(self, value, precision):
         for i in range(precision):
@@ -43,41 +69,87 @@ class Maps(object):
                 lng + self.GRID_SIZE
         ])
 
-    def fetch_area(self, bounds):
-        self.width = (bounds[2] - bounds[0]) / 2
-        self.height = (bounds[3] - bounds[1]) / 2
-        self.origin = (
-                bounds[0] + self.width,
-                bounds[1] + self.height
-        )
-        
-        url = "http://www.openstreetmap.org/api/0.6/map?bbox=%f,%f,%f,%f" % (
-                        bounds[0],
-                        bounds[1],
-                        bounds[2],
-                        bounds[3]
-                )
+    async def fetch_grid_async(self, coords):
+        lat = coords[0]
+        lng = coords[1]
+
+        return await self.fetch_area_async([
+                lat - self.GRID_SIZE,
+                lng - self.GRID_SIZE,
+                lat + self.GRID_SIZE,
+                lng + self.GRID_SIZE
+        ])
 
+    def fetch_area(self, bounds):
+        """Load bounds from the tile store, downloading the tiles it doesn't have."""
+        self._start_fetch(bounds)
+        self.apply(self._prepare(pypboy.tiles.store.area(bounds, self.download), bounds))
+
+    async def fetch_area_async(self, bounds):
+        """fetch_area as a coroutine: requests, tile writes and parsing run on the task pool.
+
+        Returns the Area for apply(), which the caller runs on the main thread.
+        """
+        self._start_fetch(bounds)
+        geometry = await pypboy.tiles.store.area_async(bounds, self.download_async)
+        return await run_blocking(self._prepare, geometry, bounds)
+
+    def extend_area(self, bounds):
+        """Merge the tiles covering bounds that aren't loaded yet into the geometry.
+
+        Unlike fetch_area, the bounds set with set_bounds (and so the
+        origin and the scale of transposition) stay as they are.
+        """
+        tiles = [tile for tile in pypboy.tiles.store.tiles_for(bounds) if tile not in self.tiles]
+        self.apply(self._extended(tiles, pypboy.tiles.store.load(tiles, self.download)))
+
+    async def extend_area_async(self, bounds):
+        """extend_area as a coroutine; returns the Area for apply() (None if no tiles were new)."""
+        tiles = [tile for tile in pypboy.tiles.store.tiles_for(bounds) if tile not in self.tiles]
+        loaded = await pypboy.tiles.store.load_async(tiles, self.download_async)
+        return await run_blocking(self._extended, tiles, loaded)
+
+    def _extended(self, tiles, loaded):
+        if not loaded:
+            return None
+        # Ways crossing into tiles merged earlier are in both; merge keeps one copy
+        geometry = merge([self.geometry] + loaded, self.origin)
+        return self._prepare(geometry, tiles=tiles)
+
+    def _prepare(self, geometry, bounds=None, tiles=()):
+        """An Area of geometry, with its index and levels built (any thread)."""
+        return Area(geometry, SpatialIndex(geometry), self._build_levels(geometry), bounds, tiles)
+
+    def apply(self, area):
+        """Put a loaded Area in place: bounds, geometry, index and levels together (main thread)."""
+        if area is None:
+            return
+        if area.bounds is not None:
+            self.set_bounds(area.bounds)
+        self.geometry, self._index, self._levels = area.geometry, area.index, area.levels
+        self.tiles.update(area.tiles)
+
+    def download(self, bounds, validators=None):
+        """The OSM XML for bounds, as a pypboy.fetch.Fetched (conditional, given validators)."""
+        fetched = pypboy.fetch.service.get(self.URL % tuple(bounds[:4]), timeout=self.timeout,
+                                           retries=self.retries, validators=validators)
+        self.downloaded += len(fetched.content)
+        return fetched
+
+    async def download_async(self, bounds, validators=None):
+        fetched = await pypboy.fetch.service.get_async(self.URL % tuple(bounds[:4]), timeout=self.timeout,
+                                                       retries=self.retries, validators=validators)
+        self.downloaded += len(fetched.content)
+        return fetched
+
+    def _start_fetch(self, bounds):
         print("[Fetching maps... (%f, %f) to (%f, %f)]" % (
                         bounds[0],
                         bounds[1],
                         bounds[2],
                         bounds[3]
                 ))
-        while True:
-            try:
-                response = requests.get(url)
-            except:
-                pass
-            else:
-                break
-        map_data = response.text.encode('UTF-8')
-        #Write to cache file
-        f = open("map.cache", "w")
-        f.write(str(map_data))
-        f.close()
-        self.display_map(map_data)
-    
+
     def load_map_coordinates(self, coords, range):
         return self.load_map((
                 coords[0] - range,
@@ -87,48 +159,69 @@ class Maps(object):
         ))
     
     def load_map(self, bounds):
+        """Load bounds from the tile store only; FileNotFoundError if tiles are missing."""
+        self.apply(self._read(bounds))
+
+    def _read(self, bounds):
+        return self._prepare(pypboy.tiles.store.area(bounds), bounds)
+
+    async def load_map_coordinates_async(self, coords, range):
+        """load_map_coordinates with the read and parse on the task pool; returns the Area for apply()."""
+        return await run_blocking(self._read, (
+                coords[0] - range,
+                coords[1] - range,
+                coords[0] + range,
+                coords[1] + range
+        ))
+
+    def set_bounds(self, bounds):
+        """Set the area transposition maps onto a surface (origin at its centre)."""
         self.width = (bounds[2] - bounds[0]) / 2
         self.height = (bounds[3] - bounds[1]) / 2
         self.origin = (
                 bounds[0] + self.width,
                 bounds[1] + self.height
         )
-        with open('map.cache', 'r') as mapcache:
-            map_data = mapcache.read()
-        self.display_map(map_data)
             
     def display_map(self, map_data):
-        osm_dict = xmltodict.parse(map_data)
-        try:
-            for node in osm_dict['osm']['node']:
-                self.nodes[node['@id']] = node
-                if 'tag' in node:
-                    for tag in node['tag']:
-                        try:
-                            #Named Amenities
-                            if tag["@k"] == "name":
-                                for tag2 in node['tag']:
-                                    if tag2["@k"] == "amenity":
-                                        amenity = tag2["@v"]
-                                self.tags.append((float(node['@lat']), float(node['@lon']), tag["@v"], amenity))
-                            #Personal Addresses - Removed
-                            if tag["@k"] == "addr:housenumber":
-                                   for t2 in node['tag']:
-                                           if t2["@k"] == "addr:street":
-                                                   self.tags.append((float(node['@lat']), float(node['@lon']),tag["@v"]+" "+t2["@v"]))
-                        except Exception:
-                            pass
-
-            for way in osm_dict['osm']['way']:
-                waypoints = []
-                for node_id in way['nd']:
-                    node = self.nodes[node_id['@ref']]
-                    waypoints.append((float(node['@lat']), float(node['@lon'])))
-                self.ways.append(waypoints)
-        except Exception:
-            _, err, _ = sys.exc_info()
-            print(err)
-    
+        self.geometry = parse_osm(map_data, self.origin or (0.0, 0.0))
+
+    def spatial_index(self):
+        """The SpatialIndex of the current geometry (built on first use)."""
+        if self._index is None or self._index.geometry is not self.geometry:
+            self._index = SpatialIndex(self.geometry)
+        return self._index
+
+    def way_levels(self):
+        """The WayLevels (simplified ways) of the current geometry (built on first use)."""
+        if self._levels is None or self._levels.geometry is not self.geometry:
+            self._levels = self._build_levels(self.geometry)
+        return self._levels
+
+    def _build_levels(self, geometry):
+        return WayLevels(
+            geometry,
+            base=getattr(config, 'MAP_LOD_BASE', 2e-6),
+            count=getattr(config, 'MAP_LOD_LEVELS', 8),
+            minor_tolerance=getattr(config, 'MAP_LOD_MINOR_TOLERANCE', 5e-5)
+        )
+
+    def lod_level(self, dimensions, tolerance):
+        """The way level to draw on a surface of dimensions, staying within tolerance pixels."""
+        if not self.width:
+            return 0
+        return self.way_levels().level_for(tolerance * self.width * 2 / dimensions[0])
+
+    def memory(self):
+        """Bytes held by this area's geometry, per part (see MapGeometry.memory)."""
+        usage = self.geometry.memory()
+        if self._index is not None:
+            usage['index'] = self._index.memory()
+            usage['total'] += usage['index']
+        if self._levels is not None:
+            usage['levels'] = self._levels.memory()
+            usage['total'] += usage['levels']
+        return usage
 
     def fetch_by_coordinate(self, coords, range):
         return self.fetch_area((
@@ -138,57 +231,121 @@ class Maps(object):
                 coords[1] + range
         ))
 
-    def transpose_ways(self, dimensions, offset, flip_y=True):
-        width = dimensions[0]
-        height = dimensions[1]
-        w_coef = width / self.width / 2
-        h_coef = height / self.height / 2
-        transways = []
-        for way in self.ways:
-            transway = []
-            for waypoint in way:
-                lat = waypoint[1] - self.origin[0]
-                lng = waypoint[0] - self.origin[1]
-                wp = [
-                        (lat * w_coef) + offset[0],
-                        (lng * h_coef) + offset[1]
-                ]
-                if flip_y:
-                    wp[1] *= -1
-                    wp[1] += offset[1] * 2
-                transway.append(wp)
-            transways.append(transway)
-        return transways
-
-    def transpose_tags(self, dimensions, offset, flip_y=True):
-        width = dimensions[0]
-        height = dimensions[1]
-        w_coef = width / self.width / 2
-        h_coef = height / self.height / 2
-        transtags = []
-        for tag in self.tags:
-            lat = tag[1] - self.origin[0]
-            lng = tag[0] - self.origin[1]
-            # Some tags have 4 elements (lat, lon, name, amenity), some have only 3
-            amenity = tag[3] if len(tag) > 3 else None
-            wp = [
-                            tag[2],
-                            (lat * w_coef) + offset[0],
-                            (lng * h_coef) + offset[1],
-                            amenity
-            ]
-            if flip_y:
-                wp[2] *= -1
-                wp[2] += offset[1] * 2
-            transtags.append(wp)
-        return transtags
+    async def fetch_by_coordinate_async(self, coords, range):
+        return await self.fetch_area_async((
+                coords[0] - range,
+                coords[1] - range,
+                coords[0] + range,
+                coords[1] + range
+        ))
+
+    def _transpose(self, points, dimensions, offset, flip_y):
+        """Origin-relative (lon, lat) points to pixels on a surface of dimensions centred on offset."""
+        w_coef = dimensions[0] / self.width / 2
+        h_coef = dimensions[1] / self.height / 2
+        xy = numpy.empty(points.shape, dtype=numpy.float64)
+        xy[:, 0] = points[:, 0] * w_coef + offset[0]
+        if flip_y:
+            xy[:, 1] = offset[1] - points[:, 1] * h_coef
+        else:
+            xy[:, 1] = points[:, 1] * h_coef + offset[1]
+        return xy
+
+    def untranspose(self, pos, dimensions, offset, flip_y=True):
+        """A pixel position (as placed by _transpose) back to origin-relative (lon, lat)."""
+        w_coef = dimensions[0] / self.width / 2
+        h_coef = dimensions[1] / self.height / 2
+        y = (offset[1] - pos[1]) if flip_y else (pos[1] - offset[1])
+        return (pos[0] - offset[0]) / w_coef, y / h_coef
+
+    def _area_rect(self, area, dimensions, offset, flip_y):
+        """A pixel rect as an origin-relative (x0, y0, x1, y1) rectangle."""
+        x0, y0 = self.untranspose(area[:2], dimensions, offset, flip_y)
+        x1, y1 = self.untranspose((area[0] + area[2], area[1] + area[3]), dimensions, offset, flip_y)
+        return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+    def transpose_ways(self, dimensions, offset, flip_y=True, area=None, tolerance=None):
+        """Each way as a list of [x, y] pixel positions.
+
+        With area (a pixel rect), only the ways that can show in it. With
+        tolerance (pixels), the ways come simplified to within it, and
+        those too small to show are left out (see pypboy.lod).
+        """
+        points, offsets = self._way_points(dimensions, offset, flip_y, area, tolerance)
+        points, offsets = points.tolist(), offsets.tolist()
+        return [points[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    def clip_ways(self, dimensions, offset, area, flip_y=True, tolerance=None):
+        """The parts of the ways inside area (a pixel rect), each as a list of [x, y] pixel positions.
+
+        As transpose_ways, but each way is clipped to area (Liang-Barsky,
+        see pypboy.clipping), so a way running in and out of it comes back
+        as several pieces and no position lies outside it.
+        """
+        points, offsets = self._way_points(dimensions, offset, flip_y, area, tolerance)
+        points, offsets = clip_polylines(points, offsets, (area[0], area[1], area[0] + area[2], area[1] + area[3]))
+        points, offsets = points.tolist(), offsets.tolist()
+        return [points[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    def _way_points(self, dimensions, offset, flip_y, area, tolerance):
+        """Pixel positions of the ways for transpose_ways, back to back, and each way's start."""
+        geometry = self.geometry
+        way_xy, way_offsets = geometry.way_xy, geometry.way_offsets
+        if tolerance is not None:
+            level = self.way_levels().levels[self.lod_level(dimensions, tolerance)]
+            way_xy, way_offsets = level.way_xy, level.way_offsets
+        if area is None and tolerance is None:
+            return self._transpose(way_xy, dimensions, offset, flip_y), way_offsets
+        if area is None:
+            ways = numpy.arange(geometry.way_count)
+        else:
+            ways = self.spatial_index().ways_in(self._area_rect(area, dimensions, offset, flip_y))
+        starts = way_offsets[ways]
+        lengths = way_offsets[ways + 1] - starts
+        if tolerance is not None:
+            # Ways left out at this level have no points
+            drawn = lengths > 0
+            ways, starts, lengths = ways[drawn], starts[drawn], lengths[drawn]
+        offsets = numpy.zeros(len(ways) + 1, dtype=numpy.int64)
+        numpy.cumsum(lengths, out=offsets[1:])
+        selected = numpy.arange(offsets[-1]) + numpy.repeat(starts - offsets[:-1], lengths)
+        return self._transpose(way_xy[selected], dimensions, offset, flip_y), offsets
+
+    def transpose_tags(self, dimensions, offset, flip_y=True, area=None):
+        """Each POI as [name, x, y, amenity or None] (with area, only those inside it)."""
+        geometry = self.geometry
+        if area is None:
+            pois = numpy.arange(geometry.poi_count)
+        else:
+            pois = self.spatial_index().pois_in(self._area_rect(area, dimensions, offset, flip_y))
+        points = self._transpose(geometry.poi_xy[pois], dimensions, offset, flip_y).tolist()
+        names, amenities = geometry.names, geometry.amenities
+        return [
+            [names[name], x, y, amenities[amenity] if amenity >= 0 else None]
+            for (x, y), name, amenity in zip(points, geometry.poi_name[pois].tolist(),
+                                             geometry.poi_amenity[pois].tolist())
+        ]
+
+    def poi_at(self, pos, dimensions, offset, radius, flip_y=True):
+        """The POI nearest a pixel position, within radius pixels, as in transpose_tags (or None)."""
+        if not self.width:
+            return None
+        x, y = self.untranspose(pos, dimensions, offset, flip_y)
+        found = self.spatial_index().nearest_poi(x, y, radius / (dimensions[0] / self.width / 2))
+        if found is None:
+            return None
+        geometry = self.geometry
+        poi = found[0]
+        (px, py), = self._transpose(geometry.poi_xy[poi:poi + 1], dimensions, offset, flip_y).tolist()
+        amenity = int(geometry.poi_amenity[poi])
+        return [geometry.names[geometry.poi_name[poi]], px, py, geometry.amenities[amenity] if amenity >= 0 else None]
 
 
 class GeoLocation:
     """Reverse geocoding using Nominatim API with caching."""
 
     CACHE_FILE = "location.cache"
-    NOMINATIM_URL = "https://nominatim.openstreetmap.org/reverse"
+    NOMINATIM_URL = getattr(config, 'NOMINATIM_URL', "https://nominatim.openstreetmap.org/reverse")
     USER_AGENT = "PypBoy/1.0 (Pip-Boy Emulator)"
     TIMEOUT = 5
     DEFAULT_AREA = "Local Area"
@@ -204,16 +361,20 @@ class GeoLocation:
             self._write_cache(longitude, latitude, area_name)
         return area_name
 
+    async def get_area_name_async(self, longitude, latitude):
+        """get_area_name as a coroutine (cache and API calls on the task pool)."""
+        return await run_blocking(self.get_area_name, longitude, latitude)
+
     def _fetch_from_api(self, longitude, latitude):
         """Fetch area name from Nominatim."""
         try:
-            response = requests.get(
+            response = pypboy.fetch.service.get(
                 self.NOMINATIM_URL,
                 params={"lat": latitude, "lon": longitude, "format": "json", "addressdetails": 1},
                 headers={"User-Agent": self.USER_AGENT},
-                timeout=self.TIMEOUT
+                timeout=self.TIMEOUT,
+                retries=1
             )
-            response.raise_for_status()
             data = response.json()
 
             # Priority: city > town > village > suburb > municipality > county
@@ -0,0 +1,177 @@
+"""
+Shared HTTP fetch service for OSM map data and Nominatim lookups.
+
+Every request goes through one requests.Session, so connections are pooled
+and reused (keep-alive) instead of opened per request, and responses come
+gzip-compressed. At most `connections` requests are in flight at once,
+however many tasks ask.
+
+Connection errors, timeouts and 429/5xx answers are retried with
+exponential backoff and full jitter: the wait before retry n is random in
+[0, min(max_backoff, backoff * 2**n)], or the server's Retry-After if that
+is longer. Other errors (a 400 for an area with too many nodes, say) fail
+at once.
+
+get(validators=...) makes a conditional request (If-None-Match /
+If-Modified-Since). A 304 comes back as a Fetched with not_modified set,
+so a cached copy can be kept without downloading it again.
+
+The benchmark swaps `service.session` for a fixture server with the same
+get() signature. benchmarks/fetch_service.py runs the service against a
+local stand-in server with injected latency and failures.
+"""
+
+import json
+import random
+import threading
+import requests
+import requests.adapters
+import config
+import game.clock
+from game.tasks import run_blocking
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+USER_AGENT = "PypBoy/1.0 (Pip-Boy Emulator)"
+
+
+class Fetched(object):
+    """A completed request: content (bytes, decompressed) and its cache validators."""
+
+    def __init__(self, url, status, content, headers):
+        self.url = url
+        self.status = status
+        self.content = content
+        self.not_modified = status == 304
+        self.validators = {}
+        if headers.get('ETag'):
+            self.validators['etag'] = headers['ETag']
+        if headers.get('Last-Modified'):
+            self.validators['last_modified'] = headers['Last-Modified']
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _Retry(Exception):
+    """A failed attempt worth retrying, after at least `wait` seconds."""
+
+    def __init__(self, error, wait=0.0):
+        super(_Retry, self).__init__(str(error))
+        self.error = error
+        self.wait = wait
+
+
+class FetchService(object):
+
+    def __init__(self, connections=4, timeout=20, retries=3, backoff=1.0, max_backoff=30.0):
+        self.connections = connections
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=connections, pool_maxsize=connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip, deflate'})
+        self._slots = threading.BoundedSemaphore(connections)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failed = 0
+        self.not_modified = 0
+        self.bytes = 0
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _attempt(self, url, params, headers, timeout):
+        """One request; returns a Fetched or raises _Retry (or the error, if retrying won't help)."""
+        self._count('requests')
+        try:
+            with self._slots:
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+                content = response.content
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise _Retry(e)
+        status = response.status_code
+        if status in RETRY_STATUSES:
+            retry_after = (getattr(response, 'headers', None) or {}).get('Retry-After', '')
+            raise _Retry(requests.HTTPError(f"{status} for {url}"),
+                         float(retry_after) if retry_after.isdigit() else 0.0)
+        if status >= 400:
+            raise requests.HTTPError(f"{status} for {url}")
+        if status == 304:
+            self._count('not_modified')
+        self._count('bytes', len(content))
+        return Fetched(url, status, content, getattr(response, 'headers', None) or {})
+
+    def _prepare(self, headers, validators):
+        headers = dict(headers or {})
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    def delay(self, attempt, at_least=0.0):
+        """Seconds to wait before retry number attempt (from 0): full jitter, capped."""
+        return min(self.max_backoff, max(at_least, random.uniform(0, self.backoff * 2 ** attempt)))
+
+    def _failed(self, retry, attempt, retries):
+        """The wait before the next attempt, or raise if that was the last one."""
+        if attempt == retries:
+            self._count('failed')
+            raise retry.error
+        self._count('retried')
+        wait = self.delay(attempt, retry.wait)
+        print(f"[Fetch] {retry.error}; retry {attempt + 1}/{retries} in {wait:.1f}s")
+        return wait
+
+    def get(self, url, params=None, headers=None, timeout=None, retries=None, validators=None):
+        """GET url as a Fetched, retrying with backoff; raises once retries are used up."""
+        headers = self._prepare(headers, validators)
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                return self._attempt(url, params, headers, timeout or self.timeout)
+            except _Retry as retry:
+                game.clock.sleep(self._failed(retry, attempt, retries))
+
+    async def get_async(self, url, params=None, headers=None, timeout=None, retries=None, validators=None):
+        """get() as a coroutine: requests run on the task pool, backoff waits don't hold a thread."""
+        headers = self._prepare(headers, validators)
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                return await run_blocking(self._attempt, url, params, headers, timeout or self.timeout)
+            except _Retry as retry:
+                await game.clock.sleep_async(self._failed(retry, attempt, retries))
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'retried': self.retried,
+            'failed': self.failed,
+            'not_modified': self.not_modified,
+            'bytes': self.bytes,
+        }
+
+    def report(self):
+        return "[Fetch] %(requests)d requests, %(retried)d retried, %(failed)d failed, " \
+               "%(not_modified)d not modified, %(bytes)d bytes" % self.stats()
+
+
+service = FetchService(
+    connections=getattr(config, 'FETCH_CONNECTIONS', 4),
+    timeout=getattr(config, 'MAP_FETCH_TIMEOUT', 20),
+    retries=getattr(config, 'MAP_FETCH_RETRIES', 3),
+    backoff=getattr(config, 'FETCH_BACKOFF', 1.0),
+    max_backoff=getattr(config, 'FETCH_MAX_BACKOFF', 30.0),
+)
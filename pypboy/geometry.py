@@ -0,0 +1,289 @@
+"""
+Compact map geometry.
+
+A parsed map area is stored as a few flat NumPy arrays instead of Python
+lists of tuples and the raw xmltodict node dicts:
+
+- way_xy: every way's points back to back, (lon, lat) as float32 offsets
+  from the area's origin. Offsets keep float32 precise to well under a
+  metre, where absolute degrees would be off by about one.
+- way_offsets: int32. Way i is way_xy[way_offsets[i]:way_offsets[i + 1]]
+  (CSR layout).
+- way_class: int16 index into classes (the highway=* value, -1 for none).
+- way_id: int64 OSM way id (-1 if unknown).
+- POIs as a struct of arrays: poi_xy like way_xy, poi_name indexing the
+  interned names list, poi_amenity indexing amenities (-1 for none) and
+  poi_id, the OSM id of the node it came from.
+
+GeometryBuilder collects the data while a map is parsed. Node coordinates
+are only needed until the ways referencing them are resolved, and are then
+dropped.
+
+parse_osm() streams an OSM XML response straight into a builder with
+ElementTree.iterparse. Each element is dropped once it is read, and only
+the tags that get drawn are kept, so peak memory stays near the size of
+the result rather than a multiple of the document.
+
+merge() joins the geometries of neighbouring areas (map tiles) into one.
+A way crossing an area's edge is in both areas' data; the ids are how the
+copies are dropped.
+"""
+
+import io
+import sys
+import xml.etree.ElementTree as ElementTree
+from array import array
+import numpy as np
+
+
+class MapGeometry(object):
+
+    def __init__(self, origin, way_xy, way_offsets, way_class, way_id, poi_xy, poi_name, poi_amenity, poi_id,
+                 names, amenities, classes):
+        self.origin = origin
+        self.way_xy = way_xy
+        self.way_offsets = way_offsets
+        self.way_class = way_class
+        self.way_id = way_id
+        self.poi_xy = poi_xy
+        self.poi_name = poi_name
+        self.poi_amenity = poi_amenity
+        self.poi_id = poi_id
+        self.names = names
+        self.amenities = amenities
+        self.classes = classes
+
+    @classmethod
+    def empty(cls, origin=(0.0, 0.0)):
+        return GeometryBuilder(origin).build()
+
+    @property
+    def way_count(self):
+        return len(self.way_offsets) - 1
+
+    @property
+    def poi_count(self):
+        return len(self.poi_name)
+
+    def ways(self):
+        """Each way's points as an (n, 2) view into way_xy."""
+        offsets = self.way_offsets
+        for i in range(self.way_count):
+            yield self.way_xy[offsets[i]:offsets[i + 1]]
+
+    def memory(self):
+        """Bytes held, per part."""
+        arrays = {
+            'way_xy': self.way_xy, 'way_offsets': self.way_offsets, 'way_class': self.way_class,
+            'way_id': self.way_id, 'poi_xy': self.poi_xy, 'poi_name': self.poi_name,
+            'poi_amenity': self.poi_amenity, 'poi_id': self.poi_id,
+        }
+        usage = {name: int(value.nbytes) for name, value in arrays.items()}
+        usage['names'] = sys.getsizeof(self.names) + sum(sys.getsizeof(name) for name in self.names)
+        for table in ('amenities', 'classes'):
+            values = getattr(self, table)
+            usage[table] = sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+        usage['total'] = sum(usage.values())
+        return usage
+
+    def report(self):
+        usage = self.memory()
+        return "[Geometry] %d ways, %d points, %d POIs (%d names): %.1fKB (points %.1fKB, POIs %.1fKB, names %.1fKB)" % (
+            self.way_count, len(self.way_xy), self.poi_count, len(self.names), usage['total'] / 1024.0,
+            (usage['way_xy'] + usage['way_offsets'] + usage['way_class'] + usage['way_id']) / 1024.0,
+            (usage['poi_xy'] + usage['poi_name'] + usage['poi_amenity'] + usage['poi_id']) / 1024.0,
+            (usage['names'] + usage['amenities'] + usage['classes']) / 1024.0)
+
+
+class GeometryBuilder(object):
+    """Collects ways and POIs (in degrees) and packs them into a MapGeometry."""
+
+    def __init__(self, origin):
+        self.origin = origin
+        self._xy = array('d')
+        self._offsets = array('i', [0])
+        self._class = array('h')
+        self._way_id = array('q')
+        self._poi_xy = array('d')
+        self._poi_name = array('i')
+        self._poi_amenity = array('h')
+        self._poi_id = array('q')
+        self._names = {}
+        self._amenities = {}
+        self._classes = {}
+
+    def _intern(self, table, value):
+        code = table.get(value)
+        if code is None:
+            code = table[value] = len(table)
+        return code
+
+    def add_way(self, points, highway=None, way_id=-1):
+        """points: (lon, lat) pairs."""
+        for lon, lat in points:
+            self._xy.append(lon)
+            self._xy.append(lat)
+        self._offsets.append(len(self._xy) // 2)
+        self._class.append(-1 if highway is None else self._intern(self._classes, highway))
+        self._way_id.append(way_id)
+
+    def add_poi(self, lon, lat, name, amenity=None, node_id=-1):
+        self._poi_xy.append(lon)
+        self._poi_xy.append(lat)
+        self._poi_name.append(self._intern(self._names, name))
+        self._poi_amenity.append(-1 if amenity is None else self._intern(self._amenities, amenity))
+        self._poi_id.append(node_id)
+
+    def _points(self, values):
+        points = np.frombuffer(values, dtype=np.float64).reshape(-1, 2) if len(values) else np.zeros((0, 2))
+        return (points - self.origin).astype(np.float32)
+
+    def build(self):
+        return MapGeometry(
+            self.origin,
+            self._points(self._xy),
+            np.frombuffer(self._offsets, dtype=np.int32).copy(),
+            np.frombuffer(self._class, dtype=np.int16).copy(),
+            np.frombuffer(self._way_id, dtype=np.int64).copy(),
+            self._points(self._poi_xy),
+            np.frombuffer(self._poi_name, dtype=np.int32).copy(),
+            np.frombuffer(self._poi_amenity, dtype=np.int16).copy(),
+            np.frombuffer(self._poi_id, dtype=np.int64).copy(),
+            list(self._names),
+            list(self._amenities),
+            list(self._classes)
+        )
+
+
+def _drawn_tags(element):
+    """The tags of a node or way that are rendered: name, amenity, highway and addr:*."""
+    tags = {}
+    for tag in element.iter('tag'):
+        key = tag.get('k')
+        if key in ('name', 'amenity', 'highway') or key.startswith('addr:'):
+            tags[key] = tag.get('v')
+    return tags
+
+
+def parse_osm(source, origin=(0.0, 0.0)):
+    """Stream OSM XML (bytes, str or a binary file) into a MapGeometry.
+
+    Named nodes become POIs (with their amenity, if any), as do nodes with
+    a house number and street. Ways referencing nodes that aren't in the
+    document are dropped.
+    """
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    builder = GeometryBuilder(origin)
+    # Node coordinates, only until the ways are resolved: id -> index into
+    # a flat (lon, lat) array (a dict of tuples costs about 4x as much)
+    nodes = {}
+    node_xy = array('d')
+    skipped = 0
+    root = None
+    depth = 0
+    for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            # Only whole top-level elements (their tag/nd children are read with them)
+            continue
+        tag = element.tag
+        if tag == 'node':
+            lon, lat = float(element.get('lon')), float(element.get('lat'))
+            node_id = int(element.get('id'))
+            nodes[node_id] = len(node_xy)
+            node_xy.append(lon)
+            node_xy.append(lat)
+            if len(element):
+                tags = _drawn_tags(element)
+                if 'name' in tags:
+                    builder.add_poi(lon, lat, tags['name'], tags.get('amenity'), node_id)
+                if 'addr:housenumber' in tags and 'addr:street' in tags:
+                    builder.add_poi(lon, lat, tags['addr:housenumber'] + " " + tags['addr:street'], None, node_id)
+        elif tag == 'way':
+            try:
+                indices = [nodes[int(nd.get('ref'))] for nd in element.iter('nd')]
+            except KeyError:
+                # Node outside the downloaded area
+                skipped += 1
+            else:
+                builder.add_way([(node_xy[i], node_xy[i + 1]) for i in indices],
+                                _drawn_tags(element).get('highway'), int(element.get('id')))
+        # Done with it: drop it from the tree so memory doesn't grow with the document
+        root.clear()
+    if skipped:
+        print(f"[Map] {skipped} ways skipped (nodes outside the area)")
+    return builder.build()
+
+
+def _first_copies(ids):
+    """Mask keeping the first item of each id (items with id -1 are all kept)."""
+    keys = ids.copy()
+    unknown = keys < 0
+    # Give unknown ids distinct negative keys so they never match each other
+    keys[unknown] = -1 - np.arange(np.count_nonzero(unknown))
+    keep = np.zeros(len(keys), dtype=bool)
+    keep[np.unique(keys, return_index=True)[1]] = True
+    return keep
+
+
+def _remap(codes, table, merged):
+    """codes indexing table, re-indexed into the merged table (-1 stays -1)."""
+    if not len(table):
+        return codes.copy()
+    lookup = np.array([merged.setdefault(value, len(merged)) for value in table], dtype=codes.dtype)
+    return np.where(codes >= 0, lookup[np.maximum(codes, 0)], -1).astype(codes.dtype)
+
+
+def merge(geometries, origin):
+    """One MapGeometry (relative to origin) holding each way and POI of geometries once."""
+    geometries = list(geometries)
+    if not geometries:
+        return MapGeometry.empty(origin)
+    names, amenities, classes = {}, {}, {}
+    way_xy, lengths, way_class, way_id = [], [], [], []
+    poi_xy, poi_name, poi_amenity, poi_id = [], [], [], []
+    for geometry in geometries:
+        # Re-base in float64 so float32 offsets stay exact to the new origin
+        shift = np.subtract(geometry.origin, origin)
+        way_xy.append(geometry.way_xy + shift)
+        lengths.append(np.diff(geometry.way_offsets))
+        way_class.append(_remap(geometry.way_class, geometry.classes, classes))
+        way_id.append(geometry.way_id)
+        poi_xy.append(geometry.poi_xy + shift)
+        poi_name.append(_remap(geometry.poi_name, geometry.names, names))
+        poi_amenity.append(_remap(geometry.poi_amenity, geometry.amenities, amenities))
+        poi_id.append(geometry.poi_id)
+
+    way_id = np.concatenate(way_id)
+    keep = _first_copies(way_id)
+    lengths = np.concatenate(lengths)
+    points = np.concatenate(way_xy)[np.repeat(keep, lengths)]
+    offsets = np.zeros(np.count_nonzero(keep) + 1, dtype=np.int32)
+    np.cumsum(lengths[keep], out=offsets[1:])
+
+    # A node can be both a named place and an address: duplicates share id and name
+    poi_id = np.concatenate(poi_id)
+    poi_name = np.concatenate(poi_name)
+    poi_keep = _first_copies(poi_id * len(names) + poi_name) if len(poi_id) else np.zeros(0, dtype=bool)
+    return MapGeometry(
+        origin,
+        points.astype(np.float32),
+        offsets,
+        np.concatenate(way_class)[keep],
+        way_id[keep],
+        np.concatenate(poi_xy)[poi_keep].astype(np.float32),
+        poi_name[poi_keep],
+        np.concatenate(poi_amenity)[poi_keep],
+        poi_id[poi_keep],
+        list(names),
+        list(amenities),
+        list(classes)
+    )
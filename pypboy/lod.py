@@ -0,0 +1,135 @@
+"""
+Level of detail for map ways.
+
+WayLevels keeps simplified copies of a MapGeometry's ways, one per
+tolerance: level 0 is the geometry itself, level k (from 1) is simplified
+with Douglas-Peucker to base * 2**(k - 1) degrees. Each level is made from
+the one before, so each keeps a subset of the previous level's points.
+
+At each level, ways whose bounding box is smaller than min_extent times
+the tolerance are left out (they would be a dot), and from minor_tolerance
+up, so are the minor highway classes (service roads, footpaths, tracks...).
+A way left out keeps its place with no points, so way indices (and the
+spatial index) are the same at every level.
+
+The renderer asks for the coarsest level whose tolerance is within the
+pixel tolerance it can accept (level_for): the world map at 0.12 degrees on
+a 960 pixel surface is about 2.5e-4 degrees to a pixel, so most of a
+way's vertices fall within the same pixel and need not be drawn.
+
+benchmarks/map_lod.py reports vertex counts and raster time per level.
+"""
+
+import numpy as np
+from pypboy.spatial import way_boxes
+
+MINOR_CLASSES = ('service', 'footway', 'path', 'track', 'cycleway', 'steps', 'pedestrian', 'bridleway',
+                 'corridor', 'construction', 'proposed')
+
+
+class Level(object):
+    """One level: way_xy and way_offsets as in MapGeometry, for the same ways."""
+
+    def __init__(self, tolerance, way_xy, way_offsets):
+        self.tolerance = tolerance
+        self.way_xy = way_xy
+        self.way_offsets = way_offsets
+
+    @property
+    def way_count(self):
+        """Ways with points at this level."""
+        return int(np.count_nonzero(np.diff(self.way_offsets)))
+
+    @property
+    def point_count(self):
+        return len(self.way_xy)
+
+
+class WayLevels(object):
+
+    def __init__(self, geometry, base=2e-6, count=8, minor_tolerance=5e-5, min_extent=2.0):
+        self.geometry = geometry
+        boxes = way_boxes(geometry)
+        extent = np.fmax(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+        minor_codes = [code for code, name in enumerate(geometry.classes) if name in MINOR_CLASSES]
+        minor = np.isin(geometry.way_class, minor_codes)
+
+        self.levels = [Level(0.0, geometry.way_xy, geometry.way_offsets)]
+        xy = np.asarray(geometry.way_xy, dtype=np.float64)
+        offsets = np.asarray(geometry.way_offsets, dtype=np.int64)
+        for k in range(count):
+            tolerance = base * 2 ** k
+            keep = simplify(xy, offsets, tolerance)
+            # NaN extents (ways without points) compare False: left out too
+            dropped = ~(extent >= min_extent * tolerance)
+            if tolerance >= minor_tolerance:
+                dropped |= minor
+            keep &= ~np.repeat(dropped, np.diff(offsets))
+            kept = np.zeros(len(keep) + 1, dtype=np.int64)
+            np.cumsum(keep, out=kept[1:])
+            xy, offsets = xy[keep], kept[offsets]
+            self.levels.append(Level(tolerance, xy.astype(np.float32), offsets.astype(np.int32)))
+
+    def level_for(self, degrees):
+        """Index of the coarsest level simplified within degrees."""
+        for index in range(len(self.levels) - 1, 0, -1):
+            if self.levels[index].tolerance <= degrees:
+                return index
+        return 0
+
+    def memory(self):
+        """Bytes held by the simplified levels (level 0 is the geometry's own)."""
+        return int(sum(level.way_xy.nbytes + level.way_offsets.nbytes for level in self.levels[1:]))
+
+    def stats(self):
+        return [{'tolerance': level.tolerance, 'ways': level.way_count, 'points': level.point_count}
+                for level in self.levels]
+
+    def report(self):
+        return "[LOD] %d levels, points: %s" % (
+            len(self.levels), " ".join(str(level.point_count) for level in self.levels))
+
+
+def _distances(points, a, b):
+    """Distance of each point to the segment from a to b (to a itself, if b is a)."""
+    ab = b - a
+    ap = points - a
+    length = np.einsum('ij,ij->i', ab, ab)
+    t = np.clip(np.einsum('ij,ij->i', ap, ab) / np.where(length > 0, length, 1.0), 0.0, 1.0)
+    off = ap - t[:, None] * ab
+    return np.hypot(off[:, 0], off[:, 1])
+
+
+def simplify(xy, offsets, tolerance):
+    """Mask of the points Douglas-Peucker keeps at tolerance, for every way at once.
+
+    Each pass takes all segments still to check, finds each one's farthest
+    point and splits the segment there if it is beyond tolerance, so the
+    number of passes follows the depth of the recursion, not the number of
+    ways. Both ends of each way are always kept.
+    """
+    xy = np.asarray(xy, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    keep = np.zeros(len(xy), dtype=bool)
+    nonempty = offsets[1:] > offsets[:-1]
+    a, b = offsets[:-1][nonempty], offsets[1:][nonempty] - 1
+    keep[a] = keep[b] = True
+    while len(a):
+        inner = b - a - 1
+        checked = inner > 0
+        a, b, inner = a[checked], b[checked], inner[checked]
+        if not len(a):
+            break
+        segment = np.repeat(np.arange(len(a)), inner)
+        starts = np.cumsum(inner) - inner
+        points = np.arange(len(segment)) - starts[segment] + a[segment] + 1
+        distances = _distances(xy[points], xy[a[segment]], xy[b[segment]])
+        farthest = np.maximum.reduceat(distances, starts)
+        # The first point of each segment at its farthest distance
+        at_farthest = np.flatnonzero(distances == farthest[segment])
+        first = np.unique(segment[at_farthest], return_index=True)[1]
+        split = farthest > tolerance
+        middle = points[at_farthest[first]][split]
+        keep[middle] = True
+        a, b = np.concatenate([a[split], middle]), np.concatenate([middle, b[split]])
+    return keep
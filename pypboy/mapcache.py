@@ -0,0 +1,109 @@
+"""
+File format of the map tile store.
+
+pypboy.tiles keeps one file per map tile, holding the tile's parsed
+MapGeometry. Reading one maps the arrays straight from the file
+(numpy.memmap), with no XML parsing and no copying, so a stored tile is
+ready almost at once.
+
+Layout: MAGIC, a little-endian uint32 header length, a JSON header (format
+version, bounds, origin, the name/amenity/class tables, each array's dtype,
+shape and offset, and an `info` dict for the caller), then the arrays, each
+64-byte aligned. A file with another format version reads as missing.
+Files are written to a temporary name and renamed into place, so a crash
+mid-write never leaves a torn file behind.
+"""
+
+import json
+import os
+import struct
+import tempfile
+import numpy as np
+from pypboy.geometry import MapGeometry
+
+MAGIC = b'PYPBOYGEO\n'
+FORMAT_VERSION = 2
+ALIGN = 64
+ARRAYS = ('way_xy', 'way_offsets', 'way_class', 'way_id', 'poi_xy', 'poi_name', 'poi_amenity', 'poi_id')
+
+
+def read_tile(path):
+    """(geometry, info) as stored at path; (None, None) if missing, unreadable or outdated."""
+    if not os.path.exists(path):
+        return None, None
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("not a geometry cache file")
+            length, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(length).decode('utf-8'))
+        if header['version'] != FORMAT_VERSION:
+            print(f"[MapCache] Ignoring {path} (format {header['version']}, want {FORMAT_VERSION})")
+            return None, None
+        arrays = {}
+        for name in ARRAYS:
+            dtype, shape, offset = header['arrays'][name]
+            if 0 in shape:
+                # memmap can't map zero bytes
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=tuple(shape))
+        geometry = MapGeometry(
+            tuple(header['origin']), *[arrays[name] for name in ARRAYS],
+            header['names'], header['amenities'], header['classes']
+        )
+        return geometry, header.get('info') or {}
+    except Exception as e:
+        print(f"[MapCache] Ignoring unreadable {path}: {e}")
+        return None, None
+
+
+def write_geometry(path, geometry, bounds, info=None):
+    """Store geometry (covering bounds) at path, atomically, with an info dict (JSON-able)."""
+    arrays = [(name, np.ascontiguousarray(getattr(geometry, name))) for name in ARRAYS]
+    layout = {name: [value.dtype.str, list(value.shape), 0] for name, value in arrays}
+    header = {
+        'version': FORMAT_VERSION,
+        'bounds': list(bounds[:4]),
+        'origin': list(geometry.origin),
+        'names': geometry.names,
+        'amenities': geometry.amenities,
+        'classes': geometry.classes,
+        'arrays': layout,
+        'info': info or {},
+    }
+    # Offsets depend on the header's own length; leave room and pad to it
+    reserve = len(json.dumps(header).encode('utf-8')) + 64 * len(arrays)
+    offset = _aligned(len(MAGIC) + 4 + reserve)
+    for name, value in arrays:
+        layout[name][2] = offset
+        offset = _aligned(offset + value.nbytes)
+    encoded = json.dumps(header).encode('utf-8').ljust(reserve)
+
+    def write(f):
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(encoded)))
+        f.write(encoded)
+        for name, value in arrays:
+            f.write(b'\0' * (layout[name][2] - f.tell()))
+            f.write(value.tobytes())
+
+    write_atomic(path, write)
+
+
+def write_atomic(path, write):
+    """Call write(f) on a temporary file next to path, then rename it into place."""
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
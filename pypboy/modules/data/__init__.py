@@ -10,16 +10,13 @@ class Module(BaseModule):
 
     label = "DATA"
     GPIO_LED_ID = 28 #GPIO 23 #23
-
-    def __init__(self, *args, **kwargs):
-        self.submodules = [
-            local_map.Module(self),
-            world_map.Module(self),
-            quests.Module(self),
-            misc.Module(self),
-            radio.Module(self)
-        ]
-        super(Module, self).__init__(*args, **kwargs)
+    submodules = [
+        local_map.Module,
+        world_map.Module,
+        quests.Module,
+        misc.Module,
+        radio.Module
+    ]
         
     def handle_resume(self):
         self.pypboy.header.headline = self.label
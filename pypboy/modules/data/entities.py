@@ -1,10 +1,12 @@
 import os
+import math
 import game
+import game.textcache
 import config
 import pygame
-import threading
 import pypboy.data
-import time
+import game.clock
+import game.tasks
 from random import choice
 
 
@@ -27,6 +29,10 @@ class Map(game.Entity):
         self._map_surface = pygame.Surface((surface_size, surface_size))
         self._render_rect = render_rect if render_rect else pygame.Rect(0, 0, surface_size, surface_size)
         self._zoom_level = config.MAP_ZOOM_DEFAULT
+        self._zoom_target = self._zoom_level
+        self._zoomed = None           # (zoom, window, surface): part of the surface scaled by the zoom level
+        self._vector = None           # (zoom, window, surface): the same, drawn from the data at that scale
+        self._vector_wait = None      # Seconds until the view is drawn as vectors (None: nothing to draw)
         self._data_loaded = False
         self._is_loading = False
         self._needs_display_update = False
@@ -34,66 +40,96 @@ class Map(game.Entity):
         self._geo_radius = None       # Current geographic radius
         self._target_radius = None    # Target radius for progressive loading
         self._load_stage = 0          # 0=initial, 1=expanding, 2=complete
+        self.stages = []              # Per progressive stage: radius, tiles and bytes fetched
+        self._lod_level = 0           # Way level (pypboy.lod) the surface was drawn with
         self._status_text = loading_type
 
         # Entity image is viewport-sized (what user sees), not full surface size
         viewport_size = (self._render_rect.width, self._render_rect.height)
         super(Map, self).__init__(viewport_size, *args, **kwargs)
-        text = config.FONTS[14].render(loading_type, True, (95, 255, 177), (0, 0, 0))
+        text = game.textcache.render(loading_type, 14, (95, 255, 177), (0, 0, 0))
         self.image.blit(text, (10, 10))
 
+    def open(self, position, radius):
+        """Start loading the map, the first time it is shown: from the tile store or the network (LOAD_CACHED_MAP)."""
+        if self._geo_center is not None:
+            return
+        if config.LOAD_CACHED_MAP:
+            self.load_map(position, radius)
+        else:
+            self.fetch_map(position, radius)
+
     def fetch_map(self, position, radius):
         """Start progressive loading - small area first, then expand."""
         if self._is_loading:
             return
-        self._is_loading = True
         self._geo_center = position
         self._target_radius = radius
+        self._geo_radius = 0
+        self.stages = []
+        # One mapper for all stages, scaled to the target area from the start:
+        # each stage merges in only the tiles it adds and draws only its ring
+        self._mapper = pypboy.data.Maps()
+        self._mapper.set_bounds((position[0] - radius, position[1] - radius,
+                                 position[0] + radius, position[1] + radius))
+        self._map_surface.fill((0, 0, 0))
+        self._zoomed = self._vector = None
         # Start with 30% of target for fast initial load
-        initial_radius = radius * 0.3
-        self._geo_radius = initial_radius
         self._load_stage = 0
-        self._fetching = threading.Thread(target=self._internal_fetch_progressive, args=(position, initial_radius))
-        self._fetching.start()
+        print(f"[Map] Stage 0: Initial load (radius={radius * 0.3:.4f})")
+        self._fetch_stage(radius * 0.3)
 
-    def _internal_fetch_progressive(self, position, radius):
-        """Fetch initial area, then progressively expand in background."""
-        print(f"[Map] Stage 0: Initial load (radius={radius:.4f})")
-        self._mapper.fetch_by_coordinate(position, radius)
-        self._redraw_map()
-        self.center_viewport()
-        self._data_loaded = True  # User can interact now!
+    def _fetch_stage(self, radius, delay=0):
+        """Fetch one stage as a task; _stage_loaded draws it and queues the next."""
+        self._is_loading = True
+        self._fetching = game.tasks.submit(
+            self._fetch(radius, delay), on_done=self._stage_loaded, on_error=self._fetch_failed,
+            timeout=getattr(config, 'MAP_STAGE_TIMEOUT', 120), name=f"map stage {self._load_stage}"
+        )
+
+    async def _fetch(self, radius, delay):
+        if delay:
+            # Wait a moment so user sees the previous stage
+            await game.clock.sleep_async(delay)
+        mapper = self._mapper
+        downloaded = mapper.downloaded
+        position = self._geo_center
+        area = await mapper.extend_area_async((position[0] - radius, position[1] - radius,
+                                               position[0] + radius, position[1] + radius))
+        return radius, area, mapper.downloaded - downloaded
+
+    def _stage_loaded(self, result):
+        """Runs on the main thread once a stage's data is in."""
+        radius, area, downloaded = result
+        self._mapper.apply(area)
+        tiles = len(area.tiles) if area else 0
+        self.stages.append({'radius': radius, 'tiles': tiles, 'bytes': downloaded})
+        print(f"[Map] Stage {self._load_stage}: {tiles} new tiles, {downloaded / 1024.0:.1f}KB downloaded")
+        print(self._mapper.geometry.report())
+        self._draw_ring(self._geo_radius, radius)
+        self._geo_radius = radius
+        if not self._data_loaded:
+            self.center_viewport()
+            self._data_loaded = True  # User can interact now!
         self._is_loading = False
-        self._load_stage = 1
-
-        # Continue expanding in background
-        self._expand_progressively()
-
-    def _expand_progressively(self):
-        """Expand radius by 50% each stage until reaching target."""
-        while self._geo_radius < self._target_radius * 0.95:
-            # Wait a moment so user sees initial map
-            time.sleep(0.5)
 
-            if self._is_loading:
-                # Another operation in progress, wait
-                continue
-
-            # Calculate new radius (50% larger)
+        # Expand radius by 50% each stage until reaching target
+        if self._geo_radius < self._target_radius * 0.95:
             new_radius = min(self._geo_radius * 1.5, self._target_radius)
             self._load_stage += 1
             print(f"[Map] Stage {self._load_stage}: Expanding (radius={new_radius:.4f})")
+            self._fetch_stage(new_radius, delay=0.5)
+        else:
+            self._load_stage = -1  # Complete
+            print(f"[Map] Progressive loading complete ({sum(stage['bytes'] for stage in self.stages) / 1024.0:.1f}KB)")
 
-            # Fetch expanded area
-            self._is_loading = True
-            self._mapper = pypboy.data.Maps()  # Fresh mapper
-            self._mapper.fetch_by_coordinate(self._geo_center, new_radius)
-            self._geo_radius = new_radius
-            self._redraw_map()
-            self._is_loading = False
-
-        self._load_stage = -1  # Complete
-        print(f"[Map] Progressive loading complete")
+    def _fetch_failed(self, error):
+        print(f"[Map] Loading stopped: {error}")
+        self._is_loading = False
+        if not self._data_loaded:
+            self.image.fill((0, 0, 0))
+            self.image.blit(game.textcache.render("Map unavailable", 14, (95, 255, 177), (0, 0, 0)), (10, 10))
+            self.dirty = 1
 
     def load_map(self, position, radius):
         """Load from cache - no progressive loading needed since cache is local."""
@@ -101,85 +137,227 @@ class Map(game.Entity):
             return
         self._is_loading = True
         self._geo_center = position
-        self._geo_radius = radius
         self._target_radius = radius
-        self._fetching = threading.Thread(target=self._internal_load_map, args=(position, radius))
-        self._fetching.start()
-
-    def _internal_load_map(self, position, radius):
-        """Load from local cache - fast, no progressive needed."""
         print(f"[Map] Loading from cache (radius={radius:.4f})")
-        self._mapper.load_map_coordinates(position, radius)
+        self._fetching = game.tasks.submit(
+            self._mapper.load_map_coordinates_async(position, radius),
+            on_done=lambda area: self._cache_loaded(area, radius), on_error=self._cache_missed,
+            name='map cache'
+        )
+
+    def _cache_missed(self, error):
+        """Area not cached (or unreadable): download it instead."""
+        print(f"[Map] {error}, fetching")
+        self._is_loading = False
+        self.fetch_map(self._geo_center, self._target_radius)
+
+    def _cache_loaded(self, area, radius):
+        self._mapper.apply(area)
+        self._geo_radius = radius
+        print(self._mapper.geometry.report())
         self._redraw_map()
         self.center_viewport()
         self._data_loaded = True
         self._is_loading = False
         self._load_stage = -1  # Complete
 
+    def memory(self):
+        """Bytes held: the current stage's geometry plus the map surface."""
+        usage = dict(self._mapper.memory())
+        usage['surface'] = self._map_surface.get_bytesize() * self._size * self._size
+        usage['total'] += usage['surface']
+        return usage
+
+    def is_fetching(self):
+        """True while a stage (or the wait before it) is in progress."""
+        return bool(self._fetching and not self._fetching.done())
+
+    def _tolerance(self):
+        """Pixels on the surface ways may be simplified by: MAP_LOD_TOLERANCE on screen, at the zoom level."""
+        return getattr(config, 'MAP_LOD_TOLERANCE', 0.5) / self._zoom_level
+
+    def _zoom_changed(self):
+        """Redraw with another way level if the new zoom level calls for one."""
+        if not self._data_loaded:
+            return
+        if self._mapper.lod_level((self._size, self._size), self._tolerance()) != self._lod_level:
+            self._redraw_map()
+        self._apply_zoom()
+        self.dirty = 1
+
     def _redraw_map(self):
-        """Render map data to _map_surface (called from background thread)."""
+        """Render map data to _map_surface (main thread, when a task's data is in)."""
         self._map_surface.fill((0, 0, 0))
+        self._draw_region(self._map_surface.get_rect())
+        self._needs_display_update = True
+
+    def _draw_ring(self, inner, outer):
+        """Render the part of the surface between two radii (degrees) around the centre."""
+        scale = self._size / 2 / self._target_radius
+        centre = self._size / 2
+        a, b = int(round(centre - outer * scale)), int(round(centre - inner * scale))
+        c, d = int(round(centre + inner * scale)), int(round(centre + outer * scale))
+        if not inner:
+            regions = [pygame.Rect(a, a, d - a, d - a)]
+        else:
+            # Up to four strips: top and bottom full width, left and right between them
+            regions = [pygame.Rect(a, a, d - a, b - a), pygame.Rect(a, c, d - a, d - c),
+                       pygame.Rect(a, b, b - a, c - b), pygame.Rect(c, b, d - c, c - b)]
+        for region in regions:
+            self._draw_region(region)
+        self._needs_display_update = True
+
+    def _draw_region(self, region):
+        """Draw the roads within region (clipped to it) and the POIs inside it."""
+        self._zoomed = self._vector = None
+        region = region.clip(self._map_surface.get_rect())
+        if not region.width or not region.height:
+            return
+        dimensions, centre = (self._size, self._size), (self._size / 2, self._size / 2)
+        tolerance = self._tolerance()
+        self._lod_level = self._mapper.lod_level(dimensions, tolerance)
 
-        # Draw all roads
-        for way in self._mapper.transpose_ways((self._size, self._size), (self._size / 2, self._size / 2)):
+        # Roads clipped to the region, so rings drawn later meet them seamlessly
+        self._map_surface.set_clip(region)
+        for way in self._mapper.transpose_ways(dimensions, centre, area=region.inflate(4, 4), tolerance=tolerance):
             pygame.draw.lines(self._map_surface, (85, 251, 167), False, way, 2)
+        self._map_surface.set_clip(None)
 
-        # Draw all POIs
-        for tag in self._mapper.transpose_tags((self._size, self._size), (self._size / 2, self._size / 2)):
+        # Each POI is drawn with the region holding its point (the label may run past it)
+        self._draw_tags(self._map_surface, self._mapper.transpose_tags(dimensions, centre, area=region))
+
+    def _draw_tags(self, surface, tags):
+        """Draw POIs (as from transpose_tags) with an amenity icon and their name."""
+        for tag in tags:
             if len(tag) >= 4 and tag[3] in config.AMENITIES:
                 image = config.AMENITIES[tag[3]]
                 scaled_icon = pygame.transform.scale(image, (10, 10))
-                self._map_surface.blit(scaled_icon, (int(tag[1]), int(tag[2])))
-                text = config.FONTS[12].render(tag[0], True, (95, 255, 177), (0, 0, 0))
-                self._map_surface.blit(text, (int(tag[1]) + 17, int(tag[2]) + 4))
-
-        self._needs_display_update = True
+                surface.blit(scaled_icon, (int(tag[1]), int(tag[2])))
+                text = game.textcache.render(tag[0], 12, (95, 255, 177), (0, 0, 0))
+                surface.blit(text, (int(tag[1]) + 17, int(tag[2]) + 4))
+
+    def _draw_vector(self, view):
+        """Draw the ways and POIs around view (a rect on the map at the zoom level) at that scale.
+
+        Unlike the scaled bitmap, roads keep their width and detail: only the
+        ways crossing the window are projected, clipped to it and drawn.
+        """
+        zoom = self._zoom_level
+        scaled_size = int(self._size * zoom)
+        margin = getattr(config, 'MAP_ZOOM_MARGIN', 0.5)
+        window = view.inflate(int(view.width * margin) * 2, int(view.height * margin) * 2)
+        window = window.clip(pygame.Rect(0, 0, scaled_size, scaled_size))
+        surface = pygame.Surface(window.size, 0, self._map_surface)
+        surface.fill((0, 0, 0))
+        # Transposed onto the scaled map, shifted so the window's corner is (0, 0)
+        dimensions = (scaled_size, scaled_size)
+        centre = (scaled_size / 2 - window.x, scaled_size / 2 - window.y)
+        area = surface.get_rect()
+        tolerance = getattr(config, 'MAP_LOD_TOLERANCE', 0.5)
+        for way in self._mapper.clip_ways(dimensions, centre, area.inflate(4, 4), tolerance=tolerance):
+            pygame.draw.lines(surface, (85, 251, 167), False, way, 2)
+        # POIs just left of or above the window may have labels reaching into it
+        tags = pygame.Rect(area.x - 160, area.y - 20, area.width + 160, area.height + 20)
+        self._draw_tags(surface, self._mapper.transpose_tags(dimensions, centre, area=tags))
+        self._vector = (zoom, window, surface)
+
+    def _view_origin(self):
+        """Top-left of the viewport on the map surface scaled by the zoom level."""
+        if self._zoom_level == 1.0:
+            return self._render_rect.x, self._render_rect.y
+        scaled_size = int(self._size * self._zoom_level)
+        # Clamp to bounds
+        src_x = max(0, min(int(self._render_rect.x * self._zoom_level), scaled_size - self._render_rect.width))
+        src_y = max(0, min(int(self._render_rect.y * self._zoom_level), scaled_size - self._render_rect.height))
+        return src_x, src_y
+
+    def _scale_window(self, view):
+        """Scale the part of the map surface around view (a rect on the scaled map) by the zoom level.
+
+        Only a window of about (1 + 2 * MAP_ZOOM_MARGIN) times the viewport
+        is scaled, whatever the zoom level; panning within it needs no
+        scaling at all.
+        """
+        zoom = self._zoom_level
+        scaled_size = int(self._size * zoom)
+        margin = getattr(config, 'MAP_ZOOM_MARGIN', 0.5)
+        window = view.inflate(int(view.width * margin) * 2, int(view.height * margin) * 2)
+        window = window.clip(pygame.Rect(0, 0, scaled_size, scaled_size))
+        # The whole source pixels under the window
+        x0, y0 = int(window.left / zoom), int(window.top / zoom)
+        x1 = min(self._size, int(math.ceil(window.right / zoom)))
+        y1 = min(self._size, int(math.ceil(window.bottom / zoom)))
+        source = self._map_surface.subsurface((x0, y0, max(1, x1 - x0), max(1, y1 - y0)))
+        size = (max(1, int(round(source.get_width() * zoom))), max(1, int(round(source.get_height() * zoom))))
+        if getattr(config, 'MAP_SMOOTHSCALE', False) and source.get_bitsize() in (24, 32):
+            scaled = pygame.transform.smoothscale(source, size)
+        else:
+            scaled = pygame.transform.scale(source, size)
+        self._zoomed = (zoom, pygame.Rect((int(round(x0 * zoom)), int(round(y0 * zoom))), size), scaled)
 
     def _apply_zoom(self):
         """Apply current zoom level to display."""
+        self.image.fill((0, 0, 0))
         if self._zoom_level == 1.0:
             # No zoom - just blit the render rect area
-            self.image.fill((0, 0, 0))
             self.image.blit(self._map_surface, (0, 0), area=self._render_rect)
-        else:
-            # Scale the map surface
-            scaled_size = int(self._size * self._zoom_level)
-            scaled = pygame.transform.scale(self._map_surface, (scaled_size, scaled_size))
-
-            # Calculate the viewport rect on scaled surface
-            # Center the view
-            scale_factor = self._zoom_level
-            src_x = int(self._render_rect.x * scale_factor)
-            src_y = int(self._render_rect.y * scale_factor)
-            src_w = self._render_rect.width
-            src_h = self._render_rect.height
-
-            # Clamp to bounds
-            src_x = max(0, min(src_x, scaled_size - src_w))
-            src_y = max(0, min(src_y, scaled_size - src_h))
-
-            self.image.fill((0, 0, 0))
-            self.image.blit(scaled, (0, 0), area=pygame.Rect(src_x, src_y, src_w, src_h))
+            return
+        scaled_size = int(self._size * self._zoom_level)
+        src_x, src_y = self._view_origin()
+        view = pygame.Rect(src_x, src_y, self._render_rect.width, self._render_rect.height)
+        visible = view.clip(pygame.Rect(0, 0, scaled_size, scaled_size))
+        if self._vector is not None and self._vector[0] == self._zoom_level and self._vector[1].contains(visible):
+            window, drawn = self._vector[1:]
+            self.image.blit(drawn, (window.x - src_x, window.y - src_y))
+            return
+        # The scaled bitmap is the preview until the view settles (see update)
+        if getattr(config, 'MAP_VECTOR_ZOOM', True):
+            self._vector_wait = getattr(config, 'MAP_VECTOR_DELAY', 0.15)
+        if self._zoomed is None or self._zoomed[0] != self._zoom_level or not self._zoomed[1].contains(visible):
+            self._scale_window(view)
+        window, scaled = self._zoomed[1:]
+        self.image.blit(scaled, (window.x - src_x, window.y - src_y))
+
+    def poi_at(self, pos):
+        """The POI shown nearest a screen position (within MAP_TAP_RADIUS), as [name, x, y, amenity], or None."""
+        if not self._data_loaded or not self.rect.collidepoint(pos):
+            return None
+        src_x, src_y = self._view_origin()
+        surface_pos = ((src_x + pos[0] - self.rect.x) / self._zoom_level,
+                       (src_y + pos[1] - self.rect.y) / self._zoom_level)
+        radius = getattr(config, 'MAP_TAP_RADIUS', 16) / self._zoom_level
+        return self._mapper.poi_at(surface_pos, (self._size, self._size), (self._size / 2, self._size / 2), radius)
 
     def zoom_in(self):
-        """Zoom in - fast, no data re-fetch."""
-        new_zoom = min(config.MAP_ZOOM_MAX, self._zoom_level + config.MAP_ZOOM_STEP)
-        if new_zoom != self._zoom_level:
-            self._zoom_level = new_zoom
-            if self._data_loaded:
-                self._apply_zoom()
-                self.dirty = 1
-            print(f"Zoom: {self._zoom_level:.2f}")
+        """Zoom in - no data re-fetch (a redraw if finer ways are needed)."""
+        self._zoom_to(min(config.MAP_ZOOM_MAX, self._zoom_target + config.MAP_ZOOM_STEP))
 
     def zoom_out(self):
-        """Zoom out - fast, no data re-fetch."""
-        new_zoom = max(config.MAP_ZOOM_MIN, self._zoom_level - config.MAP_ZOOM_STEP)
-        if new_zoom != self._zoom_level:
-            self._zoom_level = new_zoom
-            if self._data_loaded:
-                self._apply_zoom()
-                self.dirty = 1
-            print(f"Zoom: {self._zoom_level:.2f}")
+        """Zoom out - no data re-fetch (a redraw if coarser ways will do)."""
+        self._zoom_to(max(config.MAP_ZOOM_MIN, self._zoom_target - config.MAP_ZOOM_STEP))
+
+    def _zoom_to(self, zoom):
+        """Head for a zoom level: at once, or over MAP_ZOOM_ANIMATION seconds (see update)."""
+        if zoom == self._zoom_target:
+            return
+        self._zoom_target = zoom
+        if getattr(config, 'MAP_ZOOM_ANIMATION', 0) <= 0 or not self._data_loaded:
+            self._zoom_level = zoom
+            self._zoom_changed()
+        print(f"Zoom: {zoom:.2f}")
+
+    def _animate_zoom(self, dt):
+        """Move the zoom level towards its target by one step of dt seconds."""
+        # One MAP_ZOOM_STEP per MAP_ZOOM_ANIMATION seconds
+        step = config.MAP_ZOOM_STEP * dt / getattr(config, 'MAP_ZOOM_ANIMATION', 0)
+        if abs(self._zoom_target - self._zoom_level) <= step:
+            self._zoom_level = self._zoom_target
+            # The way level is only worth redrawing for once the zoom settles
+            self._zoom_changed()
+            return
+        self._zoom_level += step if self._zoom_target > self._zoom_level else -step
+        self._apply_zoom()
+        self.dirty = 1
 
     def move_map(self, x, y):
         """Pan the map - clamped to pre-loaded area boundaries."""
@@ -202,14 +380,51 @@ class Map(game.Entity):
         self._render_rect.x = max(0, center_x)
         self._render_rect.y = max(0, center_y)
 
-    def update(self, *args, **kwargs):
-        # Check if background thread finished rendering and needs display update
+    def is_animating(self):
+        # Keep frames coming while a fetch is running so new data shows promptly
+        return self._needs_display_update or self.is_fetching() or self._zoom_level != self._zoom_target or \
+            self._vector_wait is not None
+
+    def update(self, dt=0, *args, **kwargs):
+        if self._zoom_level != self._zoom_target and dt:
+            self._animate_zoom(dt)
+        elif self._vector_wait is not None:
+            # Zooming and panning have settled for MAP_VECTOR_DELAY: redraw the view sharp
+            self._vector_wait -= dt
+            if self._vector_wait <= 0:
+                self._vector_wait = None
+                if self._data_loaded and self._zoom_level != 1.0:
+                    src_x, src_y = self._view_origin()
+                    self._draw_vector(pygame.Rect(src_x, src_y, self._render_rect.width, self._render_rect.height))
+                    self._apply_zoom()
+                    self.dirty = 1
+        # Check if a finished stage was drawn and needs display update
         if self._needs_display_update:
             self._needs_display_update = False
             self._apply_zoom()
-        # Keep dirty=2 since screen is cleared each frame
-        self.dirty = 2
-        super(Map, self).update(*args, **kwargs)
+            self.dirty = 1
+        super(Map, self).update(dt, *args, **kwargs)
+
+class MapTaps(object):
+    """Submodule mixin: a tap (press and release without dragging) on self.mapgrid names the POI under it."""
+
+    map_title = None    # Header title when a tap misses; None for the area name
+    _pressed_at = None
+
+    def handle_click(self, pos):
+        self._pressed_at = pos
+
+    def handle_click_release(self, pos):
+        pressed_at, self._pressed_at = self._pressed_at, None
+        if pressed_at is None or math.hypot(pos[0] - pressed_at[0], pos[1] - pressed_at[1]) > config.MAP_TAP_SLOP:
+            return
+        header = self.parent.pypboy.header
+        poi = self.mapgrid.poi_at(pos)
+        if poi:
+            print(f"[Map] Tapped {poi[0]}" + (f" ({poi[3]})" if poi[3] else ""))
+            header.title = [poi[0]]
+        else:
+            header.title = [self.map_title or self.parent.pypboy.area_name]
 
 class MapSquare(game.Entity):
     _mapper = None
@@ -228,17 +443,22 @@ class MapSquare(game.Entity):
         super(MapSquare, self).__init__((size, size), *args, **kwargs)
 
     def fetch_map(self):
-        self._fetching = threading.Thread(target=self._internal_fetch_map)
-        self._fetching.start()
+        self._fetching = game.tasks.submit(
+            self._mapper.fetch_grid_async(self.map_position), on_done=self._fetched, name='map square'
+        )
 
-    def _internal_fetch_map(self):
-        self._mapper.fetch_grid(self.map_position)
+    def _fetched(self, area):
+        self._mapper.apply(area)
         self.redraw_map()
         self.parent.redraw_map()
 
     def redraw_map(self, coef=1):
         self._map_surface.fill((0, 0, 0))
-        for way in self._mapper.transpose_ways((self._size, self._size), (self._size / 2, self._size / 2)):
+        dimensions, centre = (self._size, self._size), (self._size / 2, self._size / 2)
+        # Only what can land on the surface (MapGrid shows all of it)
+        area = self._map_surface.get_rect().inflate(4, 4)
+        tolerance = getattr(config, 'MAP_LOD_TOLERANCE', 0.5)
+        for way in self._mapper.transpose_ways(dimensions, centre, area=area, tolerance=tolerance):
             pygame.draw.lines(
                     self._map_surface,
                     (85, 251, 167),
@@ -250,6 +470,7 @@ class MapSquare(game.Entity):
             self.tags[tag[0]] = (tag[1] + self.position[0], tag[2] + self.position[1], tag[3])
         self.image.fill((0, 0, 0))
         self.image.blit(self._map_surface, (-self._size / 2, -self._size / 2))
+        self.dirty = 1
 
 class MapGrid(game.Entity):
 
@@ -310,7 +531,7 @@ class MapGrid(game.Entity):
                 pygame.transform.scale(image, (10, 10))
                 self.image.blit(image, (self.tags[name][0], self.tags[name][1]))
             # try:
-                text = config.FONTS[12].render(name, True, (95, 255, 177), (0, 0, 0))
+                text = game.textcache.render(name, 12, (95, 255, 177), (0, 0, 0))
             # text_width = text.get_size()[0]
             # 	pygame.draw.rect(
             # 		self,
@@ -334,6 +555,7 @@ class MapGrid(game.Entity):
         for square in self._grid:
             self.image.blit(square._map_surface, square.position)
         self.draw_tags()
+        self.dirty = 1
 
 class RadioStation(game.Entity):
 
@@ -357,7 +579,7 @@ class RadioStation(game.Entity):
             if hasattr(self, 'last_filename') and self.last_filename:
                 pygame.mixer.music.load(self.last_filename)
 
-                now = time.time()
+                now = game.clock.time()
                 curpos = self.last_playpos + (now - self.last_playtime)
                 # TODO
             f = choice(self.files)
@@ -385,7 +607,7 @@ class RadioStation(game.Entity):
             if self.filename:
                 self.last_filename = self.filename
                 self.last_playpos = pygame.mixer.music.get_pos()
-                self.last_playtime = time.time()
+                self.last_playtime = game.clock.time()
             pygame.mixer.music.stop()
 
     def load_files(self):
@@ -89,11 +89,11 @@ class Module(pypboy.SubModule):
                     audio_file = getattr(self.active_station, 'filename', None)
                     self.waveform.set_audio_file(audio_file)
 
-    def render(self, interval):
+    def render(self, alpha):
         """Render the waveform animation."""
         if hasattr(self, 'waveform'):
-            self.waveform.render(interval)
-        super(Module, self).render(interval)
+            self.waveform.render(alpha)
+        super(Module, self).render(alpha)
 
     def handle_resume(self):
         self.parent.pypboy.header.headline = "DATA"
@@ -26,7 +26,6 @@ class RadioWaveform(game.Entity):
         self.height = height
         self.is_playing = False
         self.current_file = None
-        self.time_offset = 0.0
 
         # Calculate plot area with margins for axes
         self.margin_left = 5
@@ -97,9 +96,9 @@ class RadioWaveform(game.Entity):
     def set_audio_file(self, filepath):
         """Set the current audio file for visualization."""
         self.current_file = filepath
-        # Pre-cache the waveform data (will analyze if not cached)
+        # Load the waveform data in the background (analyzing it if not cached)
         if filepath:
-            waveform_cache.get_waveform(filepath)
+            waveform_cache.request(filepath)
 
     def set_playing(self, playing, filepath=None):
         """Set the playing state and optionally update the audio file."""
@@ -113,7 +112,10 @@ class RadioWaveform(game.Entity):
             self._draw_flat_line()
             self.dirty = 1
 
-    def render(self, interval):
+    def is_animating(self):
+        return self.is_playing
+
+    def render(self, alpha=1.0):
         """Render the waveform using real audio data."""
         if not self.is_playing:
             return
@@ -127,8 +129,6 @@ class RadioWaveform(game.Entity):
             except:
                 pass
 
-        self.time_offset += interval
-
         # Clear to background (with axes)
         self.image.blit(self.background, (0, 0))
 
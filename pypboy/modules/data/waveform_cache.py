@@ -1,12 +1,16 @@
 """
 Waveform cache system for radio visualization.
 Analyzes audio files once and caches the waveform data for fast playback visualization.
+Analysis and cache files are handled by a background task (request()); the
+amplitude lookups used while drawing only read what is already in memory.
 """
 
 import os
 import json
 import numpy as np
 import pygame
+import game.tasks
+from game.tasks import run_blocking
 
 
 class WaveformCache:
@@ -23,6 +27,7 @@ class WaveformCache:
 
     def __init__(self):
         self.cache = {}  # filename -> waveform data
+        self._requested = set()
 
     def get_cache_path(self, audio_path):
         """Get the cache file path for an audio file."""
@@ -141,12 +146,24 @@ class WaveformCache:
 
         return None
 
+    def request(self, audio_path):
+        """Load or analyze audio_path in the background unless it's in memory or under way."""
+        if audio_path in self.cache or audio_path in self._requested:
+            return
+        self._requested.add(audio_path)
+        game.tasks.submit(
+            run_blocking(self.get_waveform, audio_path),
+            on_done=lambda data: self._requested.discard(audio_path),
+            on_error=lambda error: print(f"Error analyzing audio {audio_path}: {error}"),
+            name='waveform'
+        )
+
     def get_amplitude_at_time(self, audio_path, time_seconds):
         """
         Get the amplitude value at a specific time in the audio.
-        Returns 0-1 normalized amplitude, or 0 if not available.
+        Returns 0-1 normalized amplitude, or 0 if not available (yet).
         """
-        data = self.get_waveform(audio_path)
+        data = self.cache.get(audio_path)
         if not data or not data.get('envelope'):
             return 0
 
@@ -167,9 +184,10 @@ class WaveformCache:
     def get_amplitude_range(self, audio_path, start_time, end_time, num_points):
         """
         Get a range of amplitude values for visualization.
-        Returns list of num_points amplitude values between start and end time.
+        Returns list of num_points amplitude values between start and end time
+        (all 0 until request() has the data in memory).
         """
-        data = self.get_waveform(audio_path)
+        data = self.cache.get(audio_path)
         if not data or not data.get('envelope'):
             return [0] * num_points
 
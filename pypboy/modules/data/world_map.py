@@ -5,56 +5,43 @@ import config
 from pypboy.modules.data import entities
 
 
-class Module(pypboy.SubModule):
+class Module(entities.MapTaps, pypboy.SubModule):
     label = "World Map"
+    map_title = "World Map"
 
     def __init__(self, *args, **kwargs):
         super(Module, self).__init__(*args, **kwargs)
-        self.dragging = False  # Track drag state for touch/mouse panning
 
         # Create map with display rect - world map uses larger surface for extended panning
         display_rect = pygame.Rect(0, 0, config.WIDTH - 8, config.HEIGHT - 80)
 
         # Use larger surface (2x screen) so user can pan without hitting edges
+        # Loaded when the tab is first shown (handle_resume), not when it is built
         self.mapgrid = entities.Map(config.WORLD_MAP_SURFACE_SIZE, display_rect, "Loading map...")
-        if config.LOAD_CACHED_MAP:
-            self.mapgrid.load_map(config.MAP_FOCUS, config.WORLD_MAP_RADIUS)
-        else:
-            self.mapgrid.fetch_map(config.MAP_FOCUS, config.WORLD_MAP_RADIUS)
 
         self.add(self.mapgrid)
         self.mapgrid.rect[0] = 4
         self.mapgrid.rect[1] = 40
 
-    def handle_click(self, pos):
-        """Start drag operation on map."""
-        self.dragging = True
-
-    def handle_click_release(self, pos):
-        """End drag operation."""
-        self.dragging = False
-
     def handle_drag(self, pos, rel):
         """Pan map based on drag movement."""
-        # Only pan if dragging and map is not currently loading
-        if self.dragging and hasattr(self, 'mapgrid'):
-            # Check if map is loading (thread is still alive)
-            is_loading = (hasattr(self.mapgrid, '_fetching') and
-                         self.mapgrid._fetching and
-                         self.mapgrid._fetching.is_alive())
-            if not is_loading:
+        # Called once per frame with the motion since the last one (see
+        # game.pointer); only pan if the map is not currently loading
+        if hasattr(self, 'mapgrid'):
+            if not self.mapgrid.is_fetching():
                 self.mapgrid.move_map(-rel[0], -rel[1])
 
     def handle_action(self, action, value=0):
         """Handle zoom actions - fast surface-based zoom."""
         if action == "zoom_in":
-            self.mapgrid.zoom_in()  # Fast! Just scales surface
+            self.mapgrid.zoom_in()  # Scales the surface (redrawn if the way level changes)
         elif action == "zoom_out":
-            self.mapgrid.zoom_out()  # Fast! Just scales surface
+            self.mapgrid.zoom_out()  # Scales the surface (redrawn if the way level changes)
         elif action in self.action_handlers:
             self.action_handlers[action]()
 
     def handle_resume(self):
         self.parent.pypboy.header.headline = "DATA"
         self.parent.pypboy.header.title = ["World Map"]
+        self.mapgrid.open(config.MAP_FOCUS, config.WORLD_MAP_RADIUS)
         super(Module, self).handle_resume()
@@ -10,16 +10,13 @@ class Module(BaseModule):
 
 	label = "INV"
 	GPIO_LED_ID = 21
-
-	def __init__(self, *args, **kwargs):
-		self.submodules = [
-			weapons.Module(self),
-			apparel.Module(self),
-			aid.Module(self),
-			misc.Module(self),
-			ammo.Module(self)
-		]
-		super(Module, self).__init__(*args, **kwargs)
+	submodules = [
+		weapons.Module,
+		apparel.Module,
+		aid.Module,
+		misc.Module,
+		ammo.Module
+	]
 
 	def handle_resume(self):
 		self.pypboy.header.headline = self.label
@@ -10,16 +10,13 @@ class Module(BaseModule):
 
     label = "STATS"
     GPIO_LED_ID = 30 #GPIO 22 #19
-
-    def __init__(self, *args, **kwargs):
-        self.submodules = [
-            status.Module(self),
-            special.Module(self),
-            skills.Module(self),
-            perks.Module(self),
-            general.Module(self)
-        ]
-        super(Module, self).__init__(*args, **kwargs)
+    submodules = [
+        status.Module,
+        special.Module,
+        skills.Module,
+        perks.Module,
+        general.Module
+    ]
         
     def handle_resume(self):
         self.pypboy.header.headline = self.label
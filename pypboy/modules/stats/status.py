@@ -1,6 +1,7 @@
 import pypboy
 import pygame
 import game
+import game.textcache
 import config
 import pypboy.ui
 
@@ -76,11 +77,9 @@ class Module(pypboy.SubModule):
     def _switch_display(self, display_name):
         """Switch to showing a specific display, hiding others."""
         for name, display in self.displays.items():
-            if name == display_name:
-                display.visible = 1
-                display.dirty = 2
-            else:
-                display.visible = 0
+            # Hidden displays are dirtied too so their old area gets cleared
+            display.visible = 1 if name == display_name else 0
+            display.dirty = 1
         self.current_display = display_name
 
     def show_cnd(self):
@@ -173,7 +172,7 @@ class Health(game.Entity):
 
         # Draw player name and level at bottom center
         name_text = f"{self.player_name} - Level {self.player_level}"
-        name_surface = config.FONTS[14].render(name_text, True, self.color, (0, 0, 0))
+        name_surface = game.textcache.render(name_text, 14, self.color, (0, 0, 0))
         name_x = (self.image.get_width() - name_surface.get_width()) // 2 - 30
         name_y = 185
         self.image.blit(name_surface, (name_x, name_y))
@@ -215,7 +214,7 @@ class Health(game.Entity):
 
         for item_name, count in self.healing_items[:4]:
             item_text = f"({count}) {item_name}"
-            item_surface = config.FONTS[11].render(item_text, True, self.color, (0, 0, 0))
+            item_surface = game.textcache.render(item_text, 11, self.color, (0, 0, 0))
             self.image.blit(item_surface, (x_offset, y_offset))
             y_offset += 20
 
@@ -224,14 +223,14 @@ class Health(game.Entity):
         if limb in self.limb_conditions:
             self.limb_conditions[limb] = max(0, min(100, value))
             self._redraw()
-            self.dirty = 2
+            self.dirty = 1
 
     def set_player_info(self, name, level):
         """Update player name and level."""
         self.player_name = name
         self.player_level = level
         self._redraw()
-        self.dirty = 2
+        self.dirty = 1
 
 
 class StatusMeter(game.Entity):
@@ -260,7 +259,7 @@ class StatusMeter(game.Entity):
         self.image.fill((0, 0, 0))
 
         # Draw label
-        label_text = config.FONTS[16].render(self.label, True, self.color, (0, 0, 0))
+        label_text = game.textcache.render(self.label, 16, self.color, (0, 0, 0))
         self.image.blit(label_text, (10, 10))
 
         # Meter position and size
@@ -303,7 +302,7 @@ class StatusMeter(game.Entity):
             pygame.draw.line(self.image, self.color,
                            (tick_x, scale_y), (tick_x, scale_y + 8), 1)
             # Draw label
-            tick_text = config.FONTS[10].render(tick_labels[i], True, self.color, (0, 0, 0))
+            tick_text = game.textcache.render(tick_labels[i], 10, self.color, (0, 0, 0))
             text_x = tick_x - tick_text.get_width() // 2
             self.image.blit(tick_text, (text_x, scale_y + 10))
 
@@ -312,8 +311,7 @@ class StatusMeter(game.Entity):
                         (meter_x, scale_y), (meter_x + meter_width, scale_y), 1)
 
         # Draw current value
-        value_text = config.FONTS[14].render(f"{self.value}/{self.max_val}",
-                                             True, self.color, (0, 0, 0))
+        value_text = game.textcache.render(f"{self.value}/{self.max_val}", 14, self.color, (0, 0, 0))
         self.image.blit(value_text, (meter_x + meter_width + 10, meter_y))
 
         # Draw status text
@@ -338,7 +336,7 @@ class StatusMeter(game.Entity):
                 status = "NORMAL"
                 status_color = self.color
 
-        status_text = config.FONTS[14].render(status, True, status_color, (0, 0, 0))
+        status_text = game.textcache.render(status, 14, status_color, (0, 0, 0))
         self.image.blit(status_text, (10, 100))
 
         # Draw description based on meter type
@@ -373,7 +371,7 @@ class StatusMeter(game.Entity):
         desc_y = 130
         for line in desc_lines:
             if line:
-                desc_text = config.FONTS[12].render(line, True, self.color, (0, 0, 0))
+                desc_text = game.textcache.render(line, 12, self.color, (0, 0, 0))
                 self.image.blit(desc_text, (10, desc_y))
             desc_y += 16
 
@@ -381,7 +379,7 @@ class StatusMeter(game.Entity):
         """Update the meter value."""
         self.value = max(0, min(value, self.max_val))
         self._redraw()
-        self.dirty = 2
+        self.dirty = 1
 
 
 class EffectsList(game.Entity):
@@ -412,14 +410,14 @@ class EffectsList(game.Entity):
         self.image.fill((0, 0, 0))
 
         # Draw header
-        header_text = config.FONTS[16].render("ACTIVE EFFECTS", True, self.color, (0, 0, 0))
+        header_text = game.textcache.render("ACTIVE EFFECTS", 16, self.color, (0, 0, 0))
         self.image.blit(header_text, (10, 10))
 
         # Draw separator line
         pygame.draw.line(self.image, self.color, (10, 35), (320, 35), 1)
 
         if not self.effects:
-            no_effects = config.FONTS[14].render("No active effects", True, self.color, (0, 0, 0))
+            no_effects = game.textcache.render("No active effects", 14, self.color, (0, 0, 0))
             self.image.blit(no_effects, (10, 50))
             return
 
@@ -429,11 +427,11 @@ class EffectsList(game.Entity):
             color = self.positive_color if is_positive else self.negative_color
 
             # Draw effect name
-            name_text = config.FONTS[12].render(effect_name, True, color, (0, 0, 0))
+            name_text = game.textcache.render(effect_name, 12, color, (0, 0, 0))
             self.image.blit(name_text, (15, y_offset))
 
             # Draw effect value
-            value_text = config.FONTS[12].render(effect_value, True, color, (0, 0, 0))
+            value_text = game.textcache.render(effect_value, 12, color, (0, 0, 0))
             self.image.blit(value_text, (220, y_offset))
 
             y_offset += 22
@@ -442,10 +440,10 @@ class EffectsList(game.Entity):
         """Add an effect to the list."""
         self.effects.append((name, value, is_positive))
         self._redraw()
-        self.dirty = 2
+        self.dirty = 1
 
     def remove_effect(self, name):
         """Remove an effect by name."""
         self.effects = [(n, v, p) for n, v, p in self.effects if n != name]
         self._redraw()
-        self.dirty = 2
+        self.dirty = 1
@@ -0,0 +1,160 @@
+"""
+Spatial index over a MapGeometry.
+
+A uniform grid laid over the data's extent, sized for about per_cell
+features per cell. Each way is listed in every cell its bounding box
+touches, each POI in the cell it falls in. Both lists are kept CSR-style
+(items sorted by cell, plus each cell's start), so a run of neighbouring
+cells in one grid row is one contiguous slice.
+
+Coordinates are the geometry's own (degrees, relative to its origin).
+
+- ways_in(rect) / pois_in(rect): features intersecting a rectangle, for
+  drawing only what lands on a surface.
+- nearest_poi(x, y): the closest POI, searching outwards cell ring by cell
+  ring, for finding what a tap hit.
+- pois_within(x, y, radius) / ways_within(x, y, radius).
+
+Built once per loaded dataset (Maps.spatial_index); building is a few
+vectorized passes, queries cost in proportion to the cells and features
+near the query rather than to the dataset.
+"""
+
+import math
+import numpy as np
+
+
+class SpatialIndex(object):
+
+    def __init__(self, geometry, per_cell=8):
+        self.geometry = geometry
+        self.way_boxes = way_boxes(geometry)
+        self.poi_xy = np.asarray(geometry.poi_xy, dtype=np.float64)
+        valid = ~np.isnan(self.way_boxes[:, 0])
+
+        corners = [self.way_boxes[valid, :2], self.way_boxes[valid, 2:], self.poi_xy]
+        corners = np.concatenate(corners) if any(len(c) for c in corners) else np.zeros((1, 2))
+        self.x0, self.y0 = corners.min(axis=0)
+        width, height = np.maximum(corners.max(axis=0) - (self.x0, self.y0), 1e-9)
+        cells = max(1, (np.count_nonzero(valid) + len(self.poi_xy)) // per_cell)
+        self.cols = max(1, min(cells, int(math.ceil(math.sqrt(cells * width / height)))))
+        self.rows = max(1, int(math.ceil(cells / self.cols)))
+        self.cell_w = width / self.cols
+        self.cell_h = height / self.rows
+
+        # Ways: one entry per (way, cell its box touches)
+        ways = np.flatnonzero(valid)
+        cx0, cy0 = self._cells(self.way_boxes[ways, 0], self.way_boxes[ways, 1])
+        cx1, cy1 = self._cells(self.way_boxes[ways, 2], self.way_boxes[ways, 3])
+        span_x = cx1 - cx0 + 1
+        spans = span_x * (cy1 - cy0 + 1)
+        k = np.arange(int(spans.sum())) - np.repeat(np.cumsum(spans) - spans, spans)
+        cells = (np.repeat(cy0, spans) + k // np.repeat(span_x, spans)) * self.cols + \
+            np.repeat(cx0, spans) + k % np.repeat(span_x, spans)
+        self.way_items, self.way_starts = self._pack(np.repeat(ways, spans), cells)
+
+        # POIs: one entry each
+        px, py = self._cells(self.poi_xy[:, 0], self.poi_xy[:, 1])
+        self.poi_items, self.poi_starts = self._pack(np.arange(len(self.poi_xy)), py * self.cols + px)
+
+    def _cells(self, x, y):
+        """Cell column and row for coordinates (clamped to the grid)."""
+        cx = np.clip(((np.asarray(x) - self.x0) / self.cell_w).astype(np.int64), 0, self.cols - 1)
+        cy = np.clip(((np.asarray(y) - self.y0) / self.cell_h).astype(np.int64), 0, self.rows - 1)
+        return cx, cy
+
+    def _pack(self, items, cells):
+        order = np.argsort(cells, kind='stable')
+        starts = np.zeros(self.cols * self.rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=self.cols * self.rows), out=starts[1:])
+        return items[order].astype(np.int32), starts
+
+    def _gather(self, items, starts, rect):
+        """Items listed in the cells rect (x0, y0, x1, y1) touches (with repeats)."""
+        if rect[2] < self.x0 or rect[3] < self.y0 or \
+                rect[0] > self.x0 + self.cols * self.cell_w or rect[1] > self.y0 + self.rows * self.cell_h:
+            return items[:0]
+        cx0, cy0 = self._cells(rect[0], rect[1])
+        cx1, cy1 = self._cells(rect[2], rect[3])
+        rows = [items[starts[row * self.cols + cx0]:starts[row * self.cols + cx1 + 1]]
+                for row in range(int(cy0), int(cy1) + 1)]
+        return np.concatenate(rows) if len(rows) > 1 else rows[0]
+
+    def ways_in(self, rect):
+        """Indices (ascending) of the ways whose bounding box intersects rect (x0, y0, x1, y1)."""
+        candidates = np.unique(self._gather(self.way_items, self.way_starts, rect))
+        boxes = self.way_boxes[candidates]
+        hit = (boxes[:, 0] <= rect[2]) & (boxes[:, 2] >= rect[0]) & (boxes[:, 1] <= rect[3]) & (boxes[:, 3] >= rect[1])
+        return candidates[hit]
+
+    def pois_in(self, rect):
+        """Indices (ascending) of the POIs inside rect (x0, y0, x1, y1)."""
+        candidates = np.sort(self._gather(self.poi_items, self.poi_starts, rect))
+        xy = self.poi_xy[candidates]
+        hit = (xy[:, 0] >= rect[0]) & (xy[:, 0] <= rect[2]) & (xy[:, 1] >= rect[1]) & (xy[:, 1] <= rect[3])
+        return candidates[hit]
+
+    def pois_within(self, x, y, radius):
+        """Indices of the POIs within radius of (x, y), nearest first."""
+        candidates = self.pois_in((x - radius, y - radius, x + radius, y + radius))
+        distances = np.hypot(self.poi_xy[candidates, 0] - x, self.poi_xy[candidates, 1] - y)
+        order = np.argsort(distances, kind='stable')
+        return candidates[order][distances[order] <= radius]
+
+    def ways_within(self, x, y, radius):
+        """Indices (ascending) of the ways whose bounding box comes within radius of (x, y)."""
+        candidates = self.ways_in((x - radius, y - radius, x + radius, y + radius))
+        boxes = self.way_boxes[candidates]
+        dx = np.maximum(np.maximum(boxes[:, 0] - x, x - boxes[:, 2]), 0)
+        dy = np.maximum(np.maximum(boxes[:, 1] - y, y - boxes[:, 3]), 0)
+        return candidates[np.hypot(dx, dy) <= radius]
+
+    def nearest_poi(self, x, y, max_distance=None):
+        """(index, distance) of the POI nearest (x, y), or None if there is none within max_distance."""
+        if not len(self.poi_xy):
+            return None
+        cx, cy = (int(value) for value in self._cells(x, y))
+        reach = max(self.cols, self.rows)
+        for ring in range(reach + 1):
+            rect = (self.x0 + (cx - ring) * self.cell_w, self.y0 + (cy - ring) * self.cell_h,
+                    self.x0 + (cx + ring + 1) * self.cell_w, self.y0 + (cy + ring + 1) * self.cell_h)
+            candidates = self._gather(self.poi_items, self.poi_starts, rect)
+            # Everything outside the searched cells is at least this far away
+            # (the grid's own edges don't count: there is nothing beyond them)
+            clear = min(x - rect[0] if cx - ring > 0 else math.inf,
+                        rect[2] - x if cx + ring < self.cols - 1 else math.inf,
+                        y - rect[1] if cy - ring > 0 else math.inf,
+                        rect[3] - y if cy + ring < self.rows - 1 else math.inf)
+            if len(candidates):
+                distances = np.hypot(self.poi_xy[candidates, 0] - x, self.poi_xy[candidates, 1] - y)
+                best = int(np.argmin(distances))
+                if distances[best] <= clear:
+                    return _within(int(candidates[best]), float(distances[best]), max_distance)
+            if max_distance is not None and clear > max_distance:
+                return None
+        return None
+
+    def memory(self):
+        """Bytes held by the index."""
+        return int(self.way_boxes.nbytes + self.way_items.nbytes + self.way_starts.nbytes +
+                   self.poi_items.nbytes + self.poi_starts.nbytes)
+
+
+def _within(index, distance, max_distance):
+    if max_distance is not None and distance > max_distance:
+        return None
+    return index, distance
+
+
+def way_boxes(geometry):
+    """(min x, min y, max x, max y) of each way; NaN for ways without points."""
+    offsets = np.asarray(geometry.way_offsets)
+    boxes = np.full((geometry.way_count, 4), np.nan)
+    nonempty = np.diff(offsets) > 0
+    if nonempty.any():
+        xy = np.asarray(geometry.way_xy, dtype=np.float64)
+        # Empty ways add no points, so each start runs to the next non-empty way's
+        starts = offsets[:-1][nonempty]
+        boxes[nonempty, :2] = np.minimum.reduceat(xy, starts)
+        boxes[nonempty, 2:] = np.maximum.reduceat(xy, starts)
+    return boxes
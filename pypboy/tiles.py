@@ -0,0 +1,323 @@
+"""
+On-disk tile store for map data.
+
+OSM data is fetched and cached in fixed slippy-map tiles (zoom/x/y, the
+same grid as web map tiles) instead of one bounding box per map. A
+requested area is assembled from the tiles covering it; only the tiles not
+on disk yet are downloaded, so moving MAP_FOCUS a few hundred metres, or
+opening the world map after the local one, reuses what is already there.
+
+Each tile is stored as parsed geometry (pypboy.mapcache), plus the raw
+response gzipped when keep_xml is set. Ways crossing a tile edge come with
+both tiles and are merged back into one (geometry.merge).
+
+The store is kept under a size budget: reading a tile bumps its
+modification time, and once the total goes over budget the least recently
+used tiles are deleted.
+
+Tiles older than max_age are revalidated when next used online: the
+request carries the ETag / Last-Modified the tile was stored with, and a
+304 keeps it as is. If the refresh fails the old tile is used.
+
+Seed a region ahead of time, to use the maps offline:
+
+    python -m pypboy.tiles                          # MAP_FOCUS, WORLD_MAP_RADIUS
+    python -m pypboy.tiles --center -118.57,34.39 --radius 0.05
+"""
+
+import asyncio
+import collections
+import gzip
+import math
+import optparse
+import os
+import threading
+import time
+import config
+from game.tasks import run_blocking
+from pypboy.geometry import merge, parse_osm
+from pypboy.mapcache import read_tile, write_atomic, write_geometry
+
+MAX_LATITUDE = 85.0511
+
+
+class TileStore(object):
+
+    def __init__(self, directory, zoom=14, budget=256 * 1024 * 1024, keep_xml=False, fetches=2, max_age=0):
+        self.directory = directory
+        self.zoom = zoom
+        self.budget = budget
+        self.keep_xml = keep_xml
+        self.fetches = fetches
+        self.max_age = max_age  # Seconds before a tile is revalidated; 0 = never
+        self._lock = threading.Lock()
+        self._index = None      # tile path stem -> bytes on disk, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.fetched = 0
+        self.evicted = 0
+        self.revalidated = 0
+
+    def tile(self, lon, lat):
+        """The (x, y) of the tile containing a point."""
+        n = 2 ** self.zoom
+        lat = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, lat)))
+        x = int((lon + 180.0) / 360.0 * n)
+        y = int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)
+        return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+    def tile_bounds(self, x, y):
+        """(west, south, east, north) of a tile."""
+        n = 2 ** self.zoom
+
+        def latitude(row):
+            return math.degrees(math.atan(math.sinh(math.pi * (1 - 2.0 * row / n))))
+
+        return (x / n * 360.0 - 180.0, latitude(y + 1), (x + 1) / n * 360.0 - 180.0, latitude(y))
+
+    def tiles_for(self, bounds):
+        """The tiles covering bounds (west, south, east, north)."""
+        left, top = self.tile(bounds[0], bounds[3])
+        right, bottom = self.tile(bounds[2], bounds[1])
+        return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+
+    def _stem(self, x, y):
+        return os.path.join(self.directory, str(self.zoom), str(x), str(y))
+
+    def get(self, x, y):
+        """A tile's geometry from disk (memory-mapped), or None if it isn't stored."""
+        return self._read(x, y)[0]
+
+    def _read(self, x, y):
+        """(geometry, info) of a stored tile, or (None, None)."""
+        stem = self._stem(x, y)
+        geometry, info = read_tile(stem + '.geo')
+        if geometry is None and os.path.exists(stem + '.osm.gz'):
+            print(f"[Tiles] Re-parsing {stem}.osm.gz")
+            with gzip.open(stem + '.osm.gz', 'rb') as f:
+                geometry = parse_osm(f, _centre(self.tile_bounds(x, y)))
+            # Its validators went with the old file: revalidate by age only
+            info = {'fetched': os.path.getmtime(stem + '.osm.gz')}
+            write_geometry(stem + '.geo', geometry, self.tile_bounds(x, y), info)
+            self._stored(stem)
+        if geometry is None:
+            self.misses += 1
+            return None, None
+        self.hits += 1
+        self._touch(stem)
+        return geometry, info
+
+    def put(self, x, y, fetched):
+        """Parse and store a tile's OSM response (a pypboy.fetch.Fetched); returns its geometry."""
+        stem = self._stem(x, y)
+        bounds = self.tile_bounds(x, y)
+        geometry = parse_osm(fetched.content, _centre(bounds))
+        os.makedirs(os.path.dirname(stem), exist_ok=True)
+        write_geometry(stem + '.geo', geometry, bounds, dict(fetched.validators, fetched=time.time()))
+        if self.keep_xml:
+            write_atomic(stem + '.osm.gz', lambda f: f.write(gzip.compress(fetched.content, 6)))
+        self.fetched += 1
+        self._stored(stem)
+        self.evict()
+        return geometry
+
+    def _refresh(self, x, y, geometry, info, fetched):
+        """The tile after revalidating: unchanged on a 304, else the new response stored."""
+        self.revalidated += 1
+        if not fetched.not_modified:
+            return self.put(x, y, fetched)
+        stem = self._stem(x, y)
+        info = dict(info, fetched=time.time())
+        info.update(fetched.validators)
+        write_geometry(stem + '.geo', geometry, self.tile_bounds(x, y), info)
+        return geometry
+
+    def area(self, bounds, download=None):
+        """The geometry of bounds, relative to its centre.
+
+        Missing tiles are fetched with download(tile_bounds, validators)
+        -> Fetched; without download they raise FileNotFoundError.
+        """
+        return merge(self.load(self.tiles_for(bounds), download), _centre(bounds))
+
+    async def area_async(self, bounds, download):
+        """area() as a coroutine; up to `fetches` missing tiles download at once."""
+        loaded = await self.load_async(self.tiles_for(bounds), download)
+        return await run_blocking(merge, loaded, _centre(bounds))
+
+    def load(self, tiles, download=None):
+        """The geometry of each of tiles ((x, y) pairs), fetching the missing ones as area() does."""
+        loaded, missing, stale = self._lookup(tiles)
+        if missing and download is None:
+            raise FileNotFoundError("%d of %d map tiles not stored" % (len(missing), len(tiles)))
+        for x, y in missing:
+            loaded.append(self.put(x, y, download(self.tile_bounds(x, y))))
+        for x, y, geometry, info in stale:
+            if download is not None:
+                try:
+                    geometry = self._refresh(x, y, geometry, info, download(self.tile_bounds(x, y), info))
+                except Exception as e:
+                    print(f"[Tiles] Keeping stale {self.zoom}/{x}/{y}: {e}")
+            loaded.append(geometry)
+        return loaded
+
+    async def load_async(self, tiles, download):
+        loaded, missing, stale = await run_blocking(self._lookup, tiles)
+        limit = asyncio.Semaphore(self.fetches)
+
+        async def fetch(x, y):
+            async with limit:
+                fetched = await download(self.tile_bounds(x, y))
+            return await run_blocking(self.put, x, y, fetched)
+
+        async def refresh(x, y, geometry, info):
+            try:
+                async with limit:
+                    fetched = await download(self.tile_bounds(x, y), info)
+                return await run_blocking(self._refresh, x, y, geometry, info, fetched)
+            except Exception as e:
+                print(f"[Tiles] Keeping stale {self.zoom}/{x}/{y}: {e}")
+                return geometry
+
+        loaded.extend(await asyncio.gather(*[fetch(x, y) for x, y in missing],
+                                           *[refresh(*tile) for tile in stale]))
+        return loaded
+
+    def _lookup(self, tiles):
+        """Split tiles into stored geometries, missing (x, y)s and stale (x, y, geometry, info)s."""
+        loaded, missing, stale = [], [], []
+        expired = time.time() - self.max_age
+        for x, y in tiles:
+            geometry, info = self._read(x, y)
+            if geometry is None:
+                missing.append((x, y))
+            elif self.max_age and info.get('fetched', 0) < expired:
+                stale.append((x, y, geometry, info))
+            else:
+                loaded.append(geometry)
+        return loaded, missing, stale
+
+    def missing(self, bounds):
+        return [(x, y) for x, y in self.tiles_for(bounds) if not os.path.exists(self._stem(x, y) + '.geo')]
+
+    def seed(self, bounds, download):
+        """Fetch every tile of bounds that isn't stored yet."""
+        missing = self.missing(bounds)
+        total = len(self.tiles_for(bounds))
+        print(f"[Tiles] {total} tiles at zoom {self.zoom}, {len(missing)} to fetch")
+        for i, (x, y) in enumerate(missing):
+            geometry = self.put(x, y, download(self.tile_bounds(x, y)))
+            print(f"[Tiles] {i + 1}/{len(missing)} {self.zoom}/{x}/{y}: {geometry.way_count} ways, {geometry.poi_count} POIs")
+        return len(missing)
+
+    def _load_index(self):
+        """Stored tiles, least recently used first (called with the lock held)."""
+        if self._index is None:
+            tiles = {}
+            for root, dirs, files in os.walk(self.directory):
+                for name in files:
+                    if name.startswith('.tmp-'):
+                        continue
+                    path = os.path.join(root, name)
+                    stem = os.path.join(root, name.split('.', 1)[0])
+                    status = os.stat(path)
+                    used, size = tiles.get(stem, (0, 0))
+                    tiles[stem] = (max(used, status.st_mtime), size + status.st_size)
+            self._index = collections.OrderedDict(
+                (stem, size) for stem, (used, size) in sorted(tiles.items(), key=lambda item: item[1][0])
+            )
+        return self._index
+
+    def _size(self, stem):
+        return sum(os.path.getsize(stem + suffix) for suffix in ('.geo', '.osm.gz') if os.path.exists(stem + suffix))
+
+    def _stored(self, stem):
+        with self._lock:
+            index = self._load_index()
+            index[stem] = self._size(stem)
+            index.move_to_end(stem)
+
+    def _touch(self, stem):
+        # The modification time is the LRU order across runs
+        try:
+            os.utime(stem + '.geo')
+        except OSError:
+            pass
+        with self._lock:
+            index = self._load_index()
+            if stem not in index:
+                index[stem] = self._size(stem)
+            index.move_to_end(stem)
+
+    def usage(self):
+        """Bytes on disk."""
+        with self._lock:
+            return sum(self._load_index().values())
+
+    def evict(self):
+        """Delete least recently used tiles until the store fits the budget."""
+        with self._lock:
+            index = self._load_index()
+            total = sum(index.values())
+            # Never the most recent tile, whatever its size
+            while total > self.budget and len(index) > 1:
+                stem, size = index.popitem(last=False)
+                for suffix in ('.geo', '.osm.gz'):
+                    try:
+                        os.remove(stem + suffix)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                self.evicted += 1
+
+    def stats(self):
+        return {
+            'zoom': self.zoom,
+            'hits': self.hits,
+            'misses': self.misses,
+            'fetched': self.fetched,
+            'evicted': self.evicted,
+            'revalidated': self.revalidated,
+            'bytes': self.usage(),
+            'budget': self.budget,
+        }
+
+    def report(self):
+        stats = self.stats()
+        return "[Tiles] zoom %d: %d hits, %d misses, %d fetched, %d revalidated, %d evicted, %.1f of %.1fMB" % (
+            stats['zoom'], stats['hits'], stats['misses'], stats['fetched'], stats['revalidated'], stats['evicted'],
+            stats['bytes'] / 1048576.0, stats['budget'] / 1048576.0)
+
+
+def _centre(bounds):
+    return ((bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2)
+
+
+store = TileStore(
+    getattr(config, 'MAP_TILE_DIR', 'map_tiles'),
+    zoom=getattr(config, 'MAP_TILE_ZOOM', 14),
+    budget=getattr(config, 'MAP_TILE_BUDGET', 256 * 1024 * 1024),
+    keep_xml=getattr(config, 'MAP_CACHE_XML', False),
+    fetches=getattr(config, 'MAP_TILE_FETCHES', 2),
+    max_age=getattr(config, 'MAP_TILE_MAX_AGE', 0),
+)
+
+
+def main():
+    parser = optparse.OptionParser(usage='python -m pypboy.tiles [--center LON,LAT] [--radius DEGREES] [--zoom Z]')
+    parser.add_option('--center', default=None, help="Centre of the region (default MAP_FOCUS)")
+    parser.add_option('--radius', type='float', default=getattr(config, 'WORLD_MAP_RADIUS', 0.12),
+                      help="Half the region's width, in degrees (default WORLD_MAP_RADIUS)")
+    parser.add_option('--zoom', type='int', default=store.zoom)
+    options, args = parser.parse_args()
+
+    import pypboy.data
+    lon, lat = [float(value) for value in options.center.split(',')] if options.center else config.MAP_FOCUS
+    store.zoom = options.zoom
+    bounds = (lon - options.radius, lat - options.radius, lon + options.radius, lat + options.radius)
+    store.seed(bounds, pypboy.data.Maps().download)
+    print(store.report())
+
+
+if __name__ == '__main__':
+    main()
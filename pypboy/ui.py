@@ -1,7 +1,10 @@
 import game
+import game.clock
+import game.textcache
 import config
 import pygame
 import datetime
+import numpy as np
 
 
 class Header(game.Entity):
@@ -10,7 +13,7 @@ class Header(game.Entity):
         self.headline = headline
         self.title = []
         self.show_date = False  # Only DATA module shows date/time
-        super(Header, self).__init__((config.WIDTH, config.HEIGHT))
+        super(Header, self).__init__((config.WIDTH, 40))
         self.rect[0] = 4
         self._date = None
         self._headline = None
@@ -21,7 +24,7 @@ class Header(game.Entity):
         super(Header, self).update(*args, **kwargs)
 
     def render(self, *args, **kwargs):
-        new_date = datetime.datetime.now().strftime("%d.%m.%y.%H:%M:%S")
+        new_date = datetime.datetime.fromtimestamp(game.clock.time()).strftime("%d.%m.%y.%H:%M:%S")
         # Check if date, headline, title, or show_date changed
         needs_redraw = (new_date != self._date or
                        self.headline != self._headline or
@@ -34,6 +37,7 @@ class Header(game.Entity):
 
             # Only show date/time on DATA module
             if self.show_date:
+                # A new string every second: rendered directly, not through the text cache
                 text = config.FONTS[14].render(new_date, True, (95, 255, 177), (0, 0, 0))
                 self.image.blit(text, ((config.WIDTH - 141), 19))
                 pygame.draw.line(self.image, (95, 255, 177), (config.WIDTH - 148, 15), (config.WIDTH - 13, 15), 2)
@@ -43,20 +47,19 @@ class Header(game.Entity):
             for section in self.title:
                 headerposcount = headerposcount + 8
                 headerposcount_old = headerposcount
-                text = config.FONTS[14].render(section, True, (95, 255, 177), (0, 0, 0))
+                text = game.textcache.render(section, 14, (95, 255, 177), (0, 0, 0))
                 pygame.draw.line(self.image, (95, 255, 177), (config.WIDTH - headerposcount, 15), (config.WIDTH - headerposcount, 35), 2)	#End of title Verticle bar
                 headerposcount = headerposcount + text.get_width() + 5
                 self.image.blit(text, (config.WIDTH - headerposcount, 19))
                 pygame.draw.line(self.image, (95, 255, 177), (config.WIDTH - headerposcount, 15), (config.WIDTH - headerposcount_old, 15), 2) # Horizontal Bar
             pygame.draw.line(self.image, (95, 255, 177), (5, 15), (config.WIDTH - headerposcount, 15), 2) # Horizontal Bar
-            text = config.FONTS[14].render("  %s  " % self.headline, True, (95, 255, 177), (0, 0, 0))
+            text = game.textcache.render("  %s  " % self.headline, 14, (95, 255, 177), (0, 0, 0))
             self.image.blit(text, (26, 8))
             self._date = new_date
             self._headline = self.headline
             self._title = self.title[:]  # Copy to track changes
             self._show_date = self.show_date
-            
-
+            self.dirty = 1
 
 
         super(Header, self).update(*args, **kwargs)
@@ -66,7 +69,8 @@ class Footer(game.Entity):
 
     def __init__(self):
         self.menu = []
-        super(Footer, self).__init__((config.WIDTH, config.HEIGHT))
+        # Layer 1 keeps the footer above submodule content that reaches into it
+        super(Footer, self).__init__((config.WIDTH, config.HEIGHT), layer=1)
         self.rect[0] = 4
         self.rect[1] = config.HEIGHT - 40
 
@@ -74,7 +78,7 @@ class Footer(game.Entity):
         super(Footer, self).update(*args, **kwargs)
 
     def select(self, module):
-        #self.dirty = 1
+        self.dirty = 1
         self.selected = module
         self.image.fill((0, 0, 0))
         pygame.draw.line(self.image, (95, 255, 177), (5, 2), (5, 20), 2)
@@ -83,13 +87,16 @@ class Footer(game.Entity):
 
         offset = 20
         for m in self.menu:
+            # Pad the label to at least 54px; measuring is cheap, rendering isn't
             padding = 1
-            text_width = 0
-            while text_width < 54:
+            while True:
                 spaces = " ".join([" " for x in range(padding)])
-                text = config.FONTS[12].render("%s%s%s" % (spaces, m, spaces), True, (105, 255, 187), (0, 0, 0))
-                text_width = text.get_size()[0]
+                label = "%s%s%s" % (spaces, m, spaces)
+                if config.FONTS[12].size(label)[0] >= 54:
+                    break
                 padding += 1
+            text = game.textcache.render(label, 12, (105, 255, 187), (0, 0, 0))
+            text_width = text.get_size()[0]
             #print(m+" : "+str(text.get_size()))
             if m == self.selected:
                 pygame.draw.rect(self.image, (95, 255, 177), (offset - 2, 6, (text_width + 3), 26), 2)
@@ -145,11 +152,12 @@ class Menu(game.Entity):
         return False
 
     def redraw(self):
+        self.dirty = 1
         self.image.fill((0, 0, 0))
         self.item_rects = []  # Reset clickable regions
         offset = 5
         for i in range(len(self.items)):
-            text = config.FONTS[14].render(" %s " % self.items[i], True, (105, 255, 187), (0, 0, 0))
+            text = game.textcache.render(" %s " % self.items[i], 14, (105, 255, 187), (0, 0, 0))
             text_size = text.get_size()
 
             # Store clickable rectangle (relative to menu origin)
@@ -169,41 +177,64 @@ class Menu(game.Entity):
 
 
 class Scanlines(game.Entity):
+    """Scrolling bands of colour added to the frame's rows by the engine's post-process pass."""
 
     def __init__(self, width, height, gap, speed, colours, full_push=False):
-        super(Scanlines, self).__init__((width, height))
-        # Create alpha-enabled surface for transparency
-        self.image = pygame.Surface((width, height), pygame.SRCALPHA)
-        self.rect = self.image.get_rect()
+        super(Scanlines, self).__init__((0, 0))
+        self.rect = pygame.Rect(0, 0, width, height)
         self.width = width
         self.height = height
         self.move = gap * len(colours)
         self.gap = gap
         self.colours = colours
-        self.rect[1] = 0
         self.top = 0.0
+        self._previous_top = 0.0    # top before the last update step, for interpolation
         self.speed = speed
         self.full_push = full_push
+        self.scrolling = getattr(config, 'SCANLINES_SCROLL', True)
+        self._row = None  # Last drawn row offset; scrolling dirties only when it changes
+        # RGB of each row of the layer: bands of gap rows cycling through colours
+        self.row_colours = np.zeros((height, 3), dtype=np.uint16)
         colour = 0
-        area = pygame.Rect(0, self.rect[1] * self.speed, self.width, self.gap)
-        while area.top <= self.height - self.gap:
-            self.image.fill(self.colours[colour], area)
-            area.move_ip(0, (self.gap))
+        top = 0
+        while top <= self.height - self.gap:
+            self.row_colours[top:top + self.gap] = self.colours[colour][:3]
+            top += self.gap
             colour += 1
             if colour >= len(self.colours):
                 colour = 0
 
-    def render(self, interval, *args, **kwargs):
-        self.top += self.speed * interval
-        self.rect[1] = self.top
-        self.dirty = 1
+    def add_to_rows(self, sums):
+        """Add this layer's colour at its current offset to each frame row in sums."""
+        top = self.rect[1]
+        start, end = max(0, top), min(len(sums), top + self.height)
+        if start < end:
+            sums[start:end] += self.row_colours[start - top:end - top]
+
+    def update(self, dt=0, *args, **kwargs):
+        self._previous_top = self.top
+        if self.scrolling:
+            self.top += self.speed * dt
         if self.full_push:
             if self.top >= self.height:
                 self.top = 0
         else:
             if (self.top * self.speed) >= self.move:
                 self.top = 0
-        super(Scanlines, self).render(self, *args, **kwargs)
+
+    def render(self, alpha=1.0, *args, **kwargs):
+        top = self.top
+        if top >= self._previous_top:
+            # Between the last two steps (not across a wrap back to 0)
+            top = self._previous_top + (top - self._previous_top) * alpha
+        self.rect[1] = top
+        if self.rect[1] != self._row:
+            self._row = self.rect[1]
+            self.dirty = 1
+        super(Scanlines, self).render(alpha, *args, **kwargs)
+
+    def is_animating(self):
+        return self.scrolling and self.speed != 0
 
 
 class Overlay(game.Entity):
@@ -0,0 +1,131 @@
+"""
+Startup cost report.
+
+With main.py --startup-report, every module imported from then on, every
+asset loaded through an assets.LazyRegistry and every phase wrapped in
+timed() is recorded, and a table in the style of python -X importtime
+(self and cumulative time, nested by depth) is printed once the first
+frame is on screen. Time to the first interactive frame is printed
+regardless.
+"""
+
+import builtins
+import importlib.util
+import sys
+import threading
+import time
+
+enabled = False
+_started = time.perf_counter()
+_original_import = None
+_stack = []     # [name, children seconds] of the imports/phases in progress
+_entries = []   # (kind, name, self seconds, cumulative seconds, depth), in completion order
+_reported = False
+_interactive = False
+
+
+def enable():
+    """Start recording; imports are traced from here on."""
+    global enabled, _original_import
+    if enabled:
+        return
+    enabled = True
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+
+
+def disable():
+    global enabled
+    if not enabled:
+        return
+    enabled = False
+    builtins.__import__ = _original_import
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    absolute = name
+    if level:
+        try:
+            absolute = importlib.util.resolve_name('.' * level + name, (globals or {}).get('__package__'))
+        except (ImportError, ValueError):
+            pass
+    if threading.current_thread() is not threading.main_thread():
+        return _original_import(name, globals, locals, fromlist, level)
+    if absolute in sys.modules:
+        # from package import submodule: the submodule may be the new part
+        module = sys.modules[absolute]
+        missing = [f"{absolute}.{item}" for item in fromlist or () if item != '*' and not hasattr(module, item)]
+        if not missing:
+            return _original_import(name, globals, locals, fromlist, level)
+        absolute = missing[0] if len(missing) == 1 else f"{missing[0]} (+{len(missing) - 1})"
+    with timed('import', absolute):
+        return _original_import(name, globals, locals, fromlist, level)
+
+
+class timed(object):
+    """Context manager recording how long a block took (nested blocks are subtracted from self time)."""
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        # Only the main thread's startup path is measured
+        self.entry = None
+        if enabled and threading.current_thread() is threading.main_thread():
+            self.entry = [self.name, 0.0]
+            _stack.append(self.entry)
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.entry is None or not _stack or _stack[-1] is not self.entry:
+            return False
+        elapsed = time.perf_counter() - self.start
+        _stack.pop()
+        if _stack:
+            _stack[-1][1] += elapsed
+        _entries.append((self.kind, self.name, elapsed - self.entry[1], elapsed, len(_stack)))
+        return False
+
+
+def first_frame():
+    """Call once something is on screen: prints the report the first time (when enabled)."""
+    global _reported
+    if not enabled or _reported:
+        return
+    _reported = True
+    print(report())
+    disable()
+
+
+def interactive_frame(since=None):
+    """Call after each UI frame: the first call prints how long startup took (always)."""
+    global _interactive
+    if _interactive:
+        return
+    _interactive = True
+    now = time.perf_counter()
+    line = f"[Startup] First interactive frame after {(now - _started) * 1000:.0f}ms"
+    if since is not None:
+        line += f" ({(now - since) * 1000:.0f}ms building the UI)"
+    print(line)
+    first_frame()
+
+
+def report(min_ms=1.0):
+    """The recorded entries taking at least min_ms (cumulative), nested like -X importtime."""
+    elapsed = time.perf_counter() - _started
+    lines = [f"[Startup] First frame after {elapsed * 1000:.0f}ms",
+             "[Startup]   self [ms] | cumulative | what"]
+    for kind, name, own, total, depth in _entries:
+        if total * 1000 < min_ms:
+            continue
+        label = name if kind == 'import' else f"{kind} {name}"
+        lines.append(f"[Startup] {own * 1000:9.1f} | {total * 1000:10.1f} | {'  ' * depth}{label}")
+    totals = {}
+    for kind, name, own, total, depth in _entries:
+        totals[kind] = totals.get(kind, 0.0) + own
+    lines.append("[Startup] Totals: " + ", ".join(
+        f"{kind} {seconds * 1000:.0f}ms" for kind, seconds in sorted(totals.items(), key=lambda item: -item[1])))
+    return "\n".join(lines)